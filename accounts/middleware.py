@@ -0,0 +1,23 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.utils.functional import SimpleLazyObject
+
+from .roles import get_role
+
+
+class UserRoleMiddleware:
+    """Attach ``request.role``, resolved from ``request.user`` on first use.
+
+    Resolving may load the user from the session, so async views should not
+    touch it.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        request.role = SimpleLazyObject(lambda: get_role(request))
+        return self.get_response(request)
@@ -20,10 +20,14 @@ class StudentProfile(models.Model):
     class Meta:
         verbose_name = 'Student Profile'
         verbose_name_plural = 'Student Profiles'
+        indexes = [
+            # Keyset pagination of student lists
+            models.Index(fields=['created_at', 'id'], name='student_created_id_idx'),
+        ]
 
 
 class TrainerProfile(models.Model):
-    user = models.OneToOneField(User, on_delete=models.CASCADE)
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='trainer_profile')
     phone = models.CharField(max_length=15, blank=True)
     specialization = models.CharField(max_length=100, blank=True)
     employee_id = models.CharField(max_length=20, unique=True)
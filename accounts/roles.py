@@ -0,0 +1,52 @@
+"""
+The signed-in user's role and active flag.
+
+The role is worked out from the user row and both profiles, which
+``ProfileModelBackend`` loads with the user in one query on every request.
+It is resolved afresh each request rather than cached, so deactivating a
+student or changing a role takes effect on their next request in every
+process.
+"""
+ADMIN = 'admin'
+TRAINER = 'trainer'
+STUDENT = 'student'
+ANONYMOUS = 'anonymous'
+
+
+class Role:
+    def __init__(self, name, active):
+        self.name = name
+        self.active = active
+
+    @property
+    def is_admin(self):
+        return self.name == ADMIN
+
+    @property
+    def is_trainer(self):
+        return self.name == TRAINER
+
+    @property
+    def is_student(self):
+        return self.name == STUDENT
+
+    def __repr__(self):
+        return f'<Role {self.name} active={self.active}>'
+
+
+def resolve_role(user):
+    """Work out the role from the user row; free when profiles are select_related"""
+    if not user.is_authenticated:
+        return Role(ANONYMOUS, False)
+    if user.is_superuser:
+        return Role(ADMIN, user.is_active)
+    if user.is_staff:
+        return Role(TRAINER, user.is_active)
+    if hasattr(user, 'student_profile'):
+        return Role(STUDENT, user.is_active and user.student_profile.is_active)
+    return Role(STUDENT, user.is_active)
+
+
+def get_role(request):
+    """The request user's role; costs no query once ``request.user`` is loaded"""
+    return resolve_role(request.user)
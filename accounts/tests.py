@@ -1,3 +1,32 @@
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from quiz.models import Quiz, QuizAttempt
+from .backends import ProfileModelBackend
+from .models import StudentProfile
+from .roles import resolve_role
+
+
+class RoleTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = User.objects.create_user('student', password='pass')
+        trainer = User.objects.create_user('trainer', password='pass', is_staff=True)
+        cls.quiz = Quiz.objects.create(title='Quiz', description='-', created_by=trainer)
+
+    def test_deactivation_applies_to_signed_in_student(self):
+        self.client.login(username='student', password='pass')
+        self.client.get(reverse('quiz:quiz_list'))
+
+        # A queryset update, as another process would make, with no signals
+        StudentProfile.objects.filter(user=self.student).update(is_active=False)
+        response = self.client.get(reverse('quiz:start_quiz', args=[self.quiz.id]))
+        self.assertRedirects(response, reverse('quiz:quiz_list'))
+        self.assertFalse(QuizAttempt.objects.exists())
+
+    def test_role_of_loaded_user_costs_no_query(self):
+        user = ProfileModelBackend().get_user(self.student.pk)
+        with self.assertNumQueries(0):
+            role = resolve_role(user)
+        self.assertTrue(role.is_student and role.active)
@@ -4,6 +4,7 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 
 from .models import StudentProfile, TrainerProfile
+from .roles import resolve_role
 from .forms import (
     StudentRegistrationForm,
     TrainerRegistrationForm,
@@ -96,13 +97,13 @@ def user_login(request):
         if user is not None:
 
             # 🚫 BLOCK DEACTIVATED STUDENTS
-            if not user.is_staff and not user.is_superuser:
-                if hasattr(user, 'student_profile') and not user.student_profile.is_active:
-                    messages.error(
-                        request,
-                        'Your account has been deactivated. Please contact your trainer.'
-                    )
-                    return redirect('accounts:login')
+            role = resolve_role(user)
+            if role.is_student and not role.active:
+                messages.error(
+                    request,
+                    'Your account has been deactivated. Please contact your trainer.'
+                )
+                return redirect('accounts:login')
 
             login(request, user)
 
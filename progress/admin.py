@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import DailyProgress, OverallProgress
+from .models import DailyProgress, OverallProgress, ProgressJob
 
 @admin.register(DailyProgress)
 class DailyProgressAdmin(admin.ModelAdmin):
@@ -10,4 +10,9 @@ class DailyProgressAdmin(admin.ModelAdmin):
 @admin.register(OverallProgress)
 class OverallProgressAdmin(admin.ModelAdmin):
     list_display = ['student', 'total_quizzes_attempted', 'total_quizzes_passed', 'overall_percentage']
-    search_fields = ['student__username']
\ No newline at end of file
+    search_fields = ['student__username']
+
+@admin.register(ProgressJob)
+class ProgressJobAdmin(admin.ModelAdmin):
+    list_display = ['student', 'enqueued_at']
+    search_fields = ['student__username']
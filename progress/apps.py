@@ -5,4 +5,6 @@ class ProgressConfig(AppConfig):
     name = 'progress'
 
     def ready(self):
-        import progress.models  # Import to register signals
\ No newline at end of file
+        import progress.models  # Import to register signals
+        import progress.snapshot
+        import progress.leaderboard
\ No newline at end of file
@@ -0,0 +1,132 @@
+"""
+Per-quiz leaderboard: top attempts and percentile rank.
+
+The top list reads completed attempts through the
+``(quiz, status, -percentage, time_taken)`` index, so it costs
+O(log n + N). Ranks come from a Fenwick (binary indexed) tree per quiz
+over 0.1%-wide percentage buckets, stored as ``LeaderboardNode`` rows:
+adding an attempt touches at most log2(SIZE) = 10 rows and a lookup reads
+at most 21, one statement each, however many attempts the quiz has.
+
+An attempt joins the tree when ``attempt_completed`` is sent for it (the
+progress ledger guarantees once) and leaves it when deleted. Attempts
+with equal percentages share a rank; the top list breaks ties by time.
+``python manage.py rebuild_leaderboards`` recomputes trees from the
+attempts.
+"""
+from django.db import transaction
+from django.db.models import F, QuerySet
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+
+from quiz.models import Quiz, QuizAttempt
+from .models import LeaderboardNode, ProgressLedger
+from .signals import attempt_completed
+
+BUCKETS = 1001  # 0.0% .. 100.0%
+SIZE = 1024     # tree size: the power of two covering every bucket
+TOP_N = 10
+
+
+def bucket(percentage):
+    # The epsilon keeps float noise such as 69.99999 in the 70.0 bucket
+    return min(max(int(percentage * 10 + 1e-6), 0), BUCKETS - 1)
+
+
+def _update_path(index):
+    while index <= SIZE:
+        yield index
+        index += index & -index
+
+
+def _prefix_path(index):
+    while index > 0:
+        yield index
+        index -= index & -index
+
+
+def add_attempt(quiz_id, percentage, delta=1):
+    """Count (or with delta=-1, uncount) an attempt with this percentage"""
+    nodes = list(_update_path(bucket(percentage) + 1))
+    with transaction.atomic():
+        LeaderboardNode.objects.bulk_create(
+            [LeaderboardNode(quiz_id=quiz_id, node=node) for node in nodes],
+            ignore_conflicts=True
+        )
+        LeaderboardNode.objects.filter(quiz_id=quiz_id, node__in=nodes).update(count=F('count') + delta)
+
+
+def get_standing(attempt):
+    """Rank of the attempt's percentage among the quiz's ranked attempts, or None if there are none.
+
+    ``rank`` is one more than the number of attempts in higher buckets,
+    ``percentile`` the share of attempts below plus half of those level.
+    """
+    index = bucket(attempt.percentage) + 1
+    up_to, below = list(_prefix_path(index)), list(_prefix_path(index - 1))
+    counts = dict(
+        LeaderboardNode.objects.filter(quiz_id=attempt.quiz_id, node__in={SIZE, *up_to, *below})
+        .values_list('node', 'count')
+    )
+    total = counts.get(SIZE, 0)
+    if total <= 0:
+        return None
+
+    at_or_below = sum(counts.get(node, 0) for node in up_to)
+    under = sum(counts.get(node, 0) for node in below)
+    return {
+        'total': total,
+        'rank': total - at_or_below + 1,
+        'percentile': round((under + (at_or_below - under) / 2) / total * 100),
+    }
+
+
+def top_attempts(quiz_id, limit=TOP_N):
+    """The quiz's best completed attempts: highest percentage, then fastest"""
+    return (
+        QuizAttempt.objects
+        .filter(quiz_id=quiz_id, status='completed')
+        .select_related('student')
+        .only('id', 'percentage', 'time_taken', 'student__username',
+              'student__first_name', 'student__last_name')
+        .order_by('-percentage', 'time_taken', 'id')[:limit]
+    )
+
+
+def rebuild_leaderboard(quiz_id):
+    """Recompute a quiz's tree from its attempts that went through the progress ledger"""
+    counts = [0] * (SIZE + 1)
+    percentages = QuizAttempt.objects.filter(
+        quiz_id=quiz_id, status='completed', progress_entry__isnull=False
+    ).values_list('percentage', flat=True)
+    for percentage in percentages.iterator():
+        counts[bucket(percentage) + 1] += 1
+
+    # Standard O(SIZE) Fenwick construction: push each node into its parent
+    for index in range(1, SIZE + 1):
+        parent = index + (index & -index)
+        if parent <= SIZE:
+            counts[parent] += counts[index]
+
+    with transaction.atomic():
+        LeaderboardNode.objects.filter(quiz_id=quiz_id).delete()
+        LeaderboardNode.objects.bulk_create([
+            LeaderboardNode(quiz_id=quiz_id, node=index, count=count)
+            for index, count in enumerate(counts) if index and count
+        ])
+    return counts[SIZE]
+
+
+@receiver(attempt_completed)
+def attempt_ranked(sender, attempt, **kwargs):
+    add_attempt(attempt.quiz_id, attempt.percentage)
+
+
+@receiver(pre_delete, sender=QuizAttempt)
+def attempt_unranked(sender, instance, origin=None, **kwargs):
+    # A quiz being deleted takes its whole tree with it
+    if isinstance(origin, Quiz) or (isinstance(origin, QuerySet) and origin.model is Quiz):
+        return
+    # Only attempts announced as completed (they have a ledger row) were counted
+    if instance.status == 'completed' and ProgressLedger.objects.filter(attempt_id=instance.pk).exists():
+        add_attempt(instance.quiz_id, instance.percentage, delta=-1)
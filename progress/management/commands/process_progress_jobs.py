@@ -0,0 +1,57 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, transaction
+
+from progress.models import ProgressJob, apply_pending_progress, enqueue_progress_update
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Drain queued progress updates (used when PROGRESS_UPDATE_MODE = "queue")'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Jobs claimed per batch')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Drain the queue once and exit')
+
+    def handle(self, *args, **options):
+        while True:
+            # A long-running worker must drop connections that went stale
+            # or outlived CONN_MAX_AGE, as the request cycle does for views
+            close_old_connections()
+            processed = self.drain(options['batch_size'])
+            if options['once'] and not processed:
+                break
+            if not processed:
+                time.sleep(options['interval'])
+
+    def drain(self, batch_size):
+        """Process one batch of jobs, oldest first; returns the number completed"""
+        jobs = list(ProgressJob.objects.values_list('id', 'student_id')[:batch_size])
+        claimed = 0
+        applied = 0
+
+        for job_id, student_id in jobs:
+            # Deleting the row is the claim, so parallel workers never
+            # process the same job twice. It commits together with the
+            # update, so a crash in between leaves the job queued. A submit
+            # that lands after this point simply enqueues a fresh job.
+            try:
+                with transaction.atomic():
+                    if not ProgressJob.objects.filter(pk=job_id).delete()[0]:
+                        continue
+                    applied += apply_pending_progress(student_id)
+                    claimed += 1
+            except Exception:
+                logger.exception('Progress update failed for student %s; re-queued', student_id)
+                # Move the job behind the others so it cannot block the queue
+                with transaction.atomic():
+                    ProgressJob.objects.filter(pk=job_id).delete()
+                    enqueue_progress_update(student_id)
+
+        if claimed:
+            self.stdout.write(f'Processed {claimed} job(s), applied {applied} attempt(s).')
+        return claimed
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from progress.leaderboard import rebuild_leaderboard
+from quiz.models import Quiz
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per-quiz leaderboard trees from completed attempts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('quiz_ids', nargs='*', type=int, help='Quizzes to rebuild (default: all)')
+
+    def handle(self, *args, **options):
+        quizzes = Quiz.objects.order_by('id')
+        if options['quiz_ids']:
+            quizzes = quizzes.filter(id__in=options['quiz_ids'])
+
+        count = 0
+        for quiz_id in quizzes.values_list('id', flat=True).iterator():
+            rebuild_leaderboard(quiz_id)
+            count += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt leaderboards for {count} quiz(zes).'))
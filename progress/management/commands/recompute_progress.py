@@ -0,0 +1,25 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from progress.models import recompute_progress
+from progress.snapshot import invalidate_dashboard
+
+
+class Command(BaseCommand):
+    help = 'Rebuild daily and overall progress from the full attempt history (repair only)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('usernames', nargs='*', help='Students to rebuild (default: every student with attempts)')
+
+    def handle(self, *args, **options):
+        students = User.objects.filter(quiz_attempts__status='completed').distinct()
+        if options['usernames']:
+            students = User.objects.filter(username__in=options['usernames'])
+
+        count = 0
+        for student in students.iterator():
+            recompute_progress(student)
+            invalidate_dashboard(student.id)
+            count += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Recomputed progress for {count} student(s).'))
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def mark_existing_attempts(apps, schema_editor):
+    """Attempts completed before the ledger existed are already in the progress totals"""
+    QuizAttempt = apps.get_model('quiz', 'QuizAttempt')
+    ProgressLedger = apps.get_model('progress', 'ProgressLedger')
+    ProgressLedger.objects.bulk_create(
+        [ProgressLedger(attempt_id=attempt_id)
+         for attempt_id in QuizAttempt.objects.filter(status='completed').values_list('id', flat=True)],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('progress', '0001_initial'),
+        ('quiz', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProgressLedger',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('applied_at', models.DateTimeField(auto_now_add=True)),
+                ('attempt', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='progress_entry', to='quiz.quizattempt')),
+            ],
+        ),
+        migrations.RunPython(mark_existing_attempts, migrations.RunPython.noop),
+    ]
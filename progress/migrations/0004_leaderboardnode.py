@@ -0,0 +1,52 @@
+# Generated by Django 5.2.8 on 2026-10-18 03:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+SIZE = 1024
+
+
+def build_existing_leaderboards(apps, schema_editor):
+    """Fenwick trees for attempts completed before leaderboards existed (as progress.leaderboard)"""
+    QuizAttempt = apps.get_model('quiz', 'QuizAttempt')
+    LeaderboardNode = apps.get_model('progress', 'LeaderboardNode')
+
+    trees = {}
+    for quiz_id, percentage in QuizAttempt.objects.filter(
+            status='completed', progress_entry__isnull=False).values_list('quiz_id', 'percentage').iterator():
+        counts = trees.setdefault(quiz_id, [0] * (SIZE + 1))
+        counts[min(max(int(percentage * 10 + 1e-6), 0), 1000) + 1] += 1
+
+    nodes = []
+    for quiz_id, counts in trees.items():
+        for index in range(1, SIZE + 1):
+            parent = index + (index & -index)
+            if parent <= SIZE:
+                counts[parent] += counts[index]
+        nodes.extend(LeaderboardNode(quiz_id=quiz_id, node=index, count=count)
+                     for index, count in enumerate(counts) if index and count)
+    LeaderboardNode.objects.bulk_create(nodes, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('progress', '0003_progressjob'),
+        ('quiz', '0006_leaderboard_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardNode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('node', models.PositiveSmallIntegerField()),
+                ('count', models.IntegerField(default=0)),
+                ('quiz', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_nodes', to='quiz.quiz')),
+            ],
+            options={
+                'unique_together': {('quiz', 'node')},
+            },
+        ),
+        migrations.RunPython(build_existing_leaderboards, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.8 on 2026-10-18 04:36
+
+from django.db import migrations, models
+from django.db.models import Exists, F, OuterRef, Subquery
+
+
+def record_applied_values(apps, schema_editor):
+    """Existing entries were applied with the attempts' current values"""
+    QuizAttempt = apps.get_model('quiz', 'QuizAttempt')
+    ProgressLedger = apps.get_model('progress', 'ProgressLedger')
+    attempt = QuizAttempt.objects.filter(pk=OuterRef('attempt_id'))
+    ProgressLedger.objects.update(
+        score=Subquery(attempt.values('score')),
+        total_marks=Subquery(attempt.values('total_marks')),
+        time_taken=Subquery(attempt.values('time_taken')),
+        passed=Exists(attempt.filter(percentage__gte=F('quiz__pass_percentage'))),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('progress', '0004_leaderboardnode'),
+        ('quiz', '0006_leaderboard_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='progressledger',
+            name='passed',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='progressledger',
+            name='score',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='progressledger',
+            name='time_taken',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='progressledger',
+            name='total_marks',
+            field=models.FloatField(default=0),
+        ),
+        migrations.RunPython(record_applied_values, migrations.RunPython.noop),
+    ]
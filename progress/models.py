@@ -1,10 +1,17 @@
-from django.db import models
+from collections import defaultdict
+
+from django.db import models, transaction
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.db.models import Case, Count, F, Max, Min, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest, Least, TruncDate
 from django.db.models.signals import post_save
 from django.dispatch import receiver
-from quiz.models import QuizAttempt
+from quiz.models import Quiz, QuizAttempt
 from django.utils import timezone
 
+from .signals import attempt_completed
+
 class DailyProgress(models.Model):
     student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_progress')
     date = models.DateField()
@@ -49,56 +56,323 @@ class OverallProgress(models.Model):
         verbose_name_plural = 'Overall Progress'
 
 
-@receiver(post_save, sender=QuizAttempt)
-def update_progress(sender, instance, created, **kwargs):
-    """Update daily and overall progress when quiz attempt is completed"""
-    if instance.status == 'completed':
-        student = instance.student
-        today = timezone.now().date()
-        
-        # Update daily progress
-        daily_progress, created = DailyProgress.objects.get_or_create(
-            student=student,
-            date=today,
-            defaults={
-                'quizzes_attempted': 0,
-                'quizzes_passed': 0,
-                'quizzes_failed': 0,
-                'total_score': 0,
-                'total_marks': 0,
-                'time_spent': 0,
-            }
+class ProgressLedger(models.Model):
+    """One row per completed attempt already folded into the progress tables.
+
+    It keeps the values that were applied, so a regrade folds in only the
+    difference.
+    """
+    attempt = models.OneToOneField(QuizAttempt, on_delete=models.CASCADE, related_name='progress_entry')
+    score = models.FloatField(default=0)
+    total_marks = models.FloatField(default=0)
+    passed = models.BooleanField(default=False)
+    time_taken = models.IntegerField(default=0)
+    applied_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.attempt} - applied"
+
+
+class LeaderboardNode(models.Model):
+    """One node of a quiz's Fenwick tree over percentage buckets (see progress.leaderboard)"""
+    quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name='leaderboard_nodes')
+    node = models.PositiveSmallIntegerField()
+    count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.quiz} - node {self.node}: {self.count}"
+
+    class Meta:
+        unique_together = ['quiz', 'node']
+
+
+class ProgressJob(models.Model):
+    """Pending progress update for a student, drained by `process_progress_jobs`.
+
+    At most one row exists per student, so a burst of submits by the same
+    student coalesces into a single job.
+    """
+    student = models.OneToOneField(User, on_delete=models.CASCADE, related_name='progress_job')
+    enqueued_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.student.username} - pending"
+
+    class Meta:
+        ordering = ['enqueued_at']
+
+
+def _announce_completed(attempt_ids):
+    """Send attempt_completed for each attempt once the current transaction commits"""
+    def send():
+        for attempt in QuizAttempt.objects.filter(id__in=attempt_ids).select_related('quiz', 'student'):
+            attempt_completed.send(sender=QuizAttempt, attempt=attempt)
+    transaction.on_commit(send)
+
+
+def _running_percentage(score_field, marks_field, score, marks):
+    """SQL expression for the percentage after adding score/marks to the stored totals"""
+    return Case(
+        When(**{f'{marks_field}__gt': -marks},
+             then=(F(score_field) + score) * 100.0 / (F(marks_field) + marks)),
+        default=Value(0.0),
+        output_field=models.FloatField(),
+    )
+
+
+def _ledger_values(score, total_marks, passed, time_taken):
+    return {'score': score, 'total_marks': total_marks, 'passed': bool(passed), 'time_taken': time_taken}
+
+
+def _applied_extreme(aggregate):
+    """UPDATE expression for the max/min percentage over a student's applied attempts"""
+    applied = QuizAttempt.objects.filter(
+        student_id=OuterRef('student_id'), status='completed', progress_entry__isnull=False
+    ).order_by().values('student_id')
+    return Coalesce(Subquery(applied.annotate(value=aggregate('percentage')).values('value')), Value(0.0))
+
+
+def _apply_progress_delta(student_id, day, attempted, passed, score, marks,
+                          time_spent, highest, lowest, last_quiz_date):
+    """Add a batch of completed attempts to the daily and overall rows using F() updates.
+
+    ``highest``/``lowest`` of None re-read the extremes from the applied
+    attempts, for a regrade that may have lowered the best score.
+    """
+    now = timezone.now()
+    failed = attempted - passed
+
+    daily = DailyProgress.objects.filter(student_id=student_id, date=day)
+    daily_delta = {
+        'quizzes_attempted': F('quizzes_attempted') + attempted,
+        'quizzes_passed': F('quizzes_passed') + passed,
+        'quizzes_failed': F('quizzes_failed') + failed,
+        'total_score': F('total_score') + score,
+        'total_marks': F('total_marks') + marks,
+        'average_percentage': _running_percentage('total_score', 'total_marks', score, marks),
+        'time_spent': F('time_spent') + time_spent,
+        'updated_at': now,
+    }
+    if not daily.update(**daily_delta):
+        DailyProgress.objects.get_or_create(student_id=student_id, date=day)
+        daily.update(**daily_delta)
+
+    overall = OverallProgress.objects.filter(student_id=student_id)
+    overall_delta = {
+        'total_quizzes_attempted': F('total_quizzes_attempted') + attempted,
+        'total_quizzes_passed': F('total_quizzes_passed') + passed,
+        'total_quizzes_failed': F('total_quizzes_failed') + failed,
+        'total_score': F('total_score') + score,
+        'total_marks': F('total_marks') + marks,
+        'overall_percentage': _running_percentage('total_score', 'total_marks', score, marks),
+        'total_time_spent': F('total_time_spent') + time_spent,
+        'last_quiz_date': Greatest(Coalesce('last_quiz_date', Value(last_quiz_date)), Value(last_quiz_date)),
+        'updated_at': now,
+    }
+    if highest is None:
+        overall_delta.update(highest_score=_applied_extreme(Max), lowest_score=_applied_extreme(Min))
+    else:
+        overall_delta.update(
+            highest_score=Case(
+                When(total_quizzes_attempted=0, then=Value(highest)),
+                default=Greatest('highest_score', Value(highest)),
+                output_field=models.FloatField(),
+            ),
+            lowest_score=Case(
+                When(total_quizzes_attempted=0, then=Value(lowest)),
+                default=Least('lowest_score', Value(lowest)),
+                output_field=models.FloatField(),
+            ),
         )
-        
-        # Recalculate daily stats
-        today_attempts = QuizAttempt.objects.filter(
-            student=student,
-            status='completed',
-            start_time__date=today
+    if not overall.update(**overall_delta):
+        OverallProgress.objects.get_or_create(student_id=student_id)
+        overall.update(**overall_delta)
+
+
+def recompute_progress(student):
+    """Rebuild a student's progress rows from their full attempt history.
+
+    This is the repair path; the regular submit flow only applies deltas.
+    """
+    completed = QuizAttempt.objects.filter(student=student, status='completed')
+    passed = Count('id', filter=Q(percentage__gte=F('quiz__pass_percentage')))
+
+    with transaction.atomic():
+        DailyProgress.objects.filter(student=student).delete()
+        daily_rows = completed.annotate(day=TruncDate('end_time')).values('day').annotate(
+            attempted=Count('id'),
+            passed=passed,
+            score=Sum('score'),
+            marks=Sum('total_marks'),
+            time_spent=Sum('time_taken'),
+        ).order_by('day')
+        DailyProgress.objects.bulk_create([
+            DailyProgress(
+                student=student,
+                date=row['day'],
+                quizzes_attempted=row['attempted'],
+                quizzes_passed=row['passed'],
+                quizzes_failed=row['attempted'] - row['passed'],
+                total_score=row['score'] or 0,
+                total_marks=row['marks'] or 0,
+                average_percentage=(row['score'] / row['marks'] * 100) if row['marks'] else 0,
+                time_spent=row['time_spent'] or 0,
+            )
+            for row in daily_rows if row['day'] is not None
+        ])
+
+        totals = completed.aggregate(
+            attempted=Count('id'),
+            passed=passed,
+            score=Sum('score'),
+            marks=Sum('total_marks'),
+            time_spent=Sum('time_taken'),
+            highest=Max('percentage'),
+            lowest=Min('percentage'),
+            last_quiz_date=Max('end_time'),
         )
-        
-        daily_progress.quizzes_attempted = today_attempts.count()
-        daily_progress.quizzes_passed = today_attempts.filter(percentage__gte=models.F('quiz__pass_percentage')).count()
-        daily_progress.quizzes_failed = daily_progress.quizzes_attempted - daily_progress.quizzes_passed
-        daily_progress.total_score = today_attempts.aggregate(models.Sum('score'))['score__sum'] or 0
-        daily_progress.total_marks = today_attempts.aggregate(models.Sum('total_marks'))['total_marks__sum'] or 0
-        daily_progress.average_percentage = (daily_progress.total_score / daily_progress.total_marks * 100) if daily_progress.total_marks > 0 else 0
-        daily_progress.time_spent = today_attempts.aggregate(models.Sum('time_taken'))['time_taken__sum'] or 0
-        daily_progress.save()
-        
-        # Update overall progress
-        overall_progress, created = OverallProgress.objects.get_or_create(student=student)
-        
-        all_attempts = QuizAttempt.objects.filter(student=student, status='completed')
-        
-        overall_progress.total_quizzes_attempted = all_attempts.count()
-        overall_progress.total_quizzes_passed = all_attempts.filter(percentage__gte=models.F('quiz__pass_percentage')).count()
-        overall_progress.total_quizzes_failed = overall_progress.total_quizzes_attempted - overall_progress.total_quizzes_passed
-        overall_progress.total_score = all_attempts.aggregate(models.Sum('score'))['score__sum'] or 0
-        overall_progress.total_marks = all_attempts.aggregate(models.Sum('total_marks'))['total_marks__sum'] or 0
+        overall_progress, _ = OverallProgress.objects.get_or_create(student=student)
+        overall_progress.total_quizzes_attempted = totals['attempted']
+        overall_progress.total_quizzes_passed = totals['passed']
+        overall_progress.total_quizzes_failed = totals['attempted'] - totals['passed']
+        overall_progress.total_score = totals['score'] or 0
+        overall_progress.total_marks = totals['marks'] or 0
         overall_progress.overall_percentage = (overall_progress.total_score / overall_progress.total_marks * 100) if overall_progress.total_marks > 0 else 0
-        overall_progress.total_time_spent = all_attempts.aggregate(models.Sum('time_taken'))['time_taken__sum'] or 0
-        overall_progress.highest_score = all_attempts.aggregate(models.Max('percentage'))['percentage__max'] or 0
-        overall_progress.lowest_score = all_attempts.aggregate(models.Min('percentage'))['percentage__min'] or 0
-        overall_progress.last_quiz_date = instance.end_time
-        overall_progress.save()
\ No newline at end of file
+        overall_progress.total_time_spent = totals['time_spent'] or 0
+        overall_progress.highest_score = totals['highest'] or 0
+        overall_progress.lowest_score = totals['lowest'] or 0
+        overall_progress.last_quiz_date = totals['last_quiz_date']
+        overall_progress.save()
+
+        # Record what the rebuilt totals now contain, so later regrades diff against it
+        ProgressLedger.objects.filter(attempt__in=completed).delete()
+        ProgressLedger.objects.bulk_create([
+            ProgressLedger(attempt_id=row['id'], **_ledger_values(
+                row['score'], row['total_marks'], row['percentage'] >= row['quiz__pass_percentage'],
+                row['time_taken'],
+            ))
+            for row in completed.values('id', 'score', 'total_marks', 'percentage', 'time_taken',
+                                        'quiz__pass_percentage')
+        ])
+
+
+def enqueue_progress_update(student_id):
+    """Queue a progress update for the student; a no-op if one is already pending"""
+    ProgressJob.objects.bulk_create([ProgressJob(student_id=student_id)], ignore_conflicts=True)
+
+
+def apply_pending_progress(student_id):
+    """Fold every completed but not yet applied attempt of a student into their progress.
+
+    Returns the number of attempts applied.
+    """
+    with transaction.atomic():
+        pending = list(QuizAttempt.objects.filter(
+            student_id=student_id,
+            status='completed',
+            progress_entry__isnull=True,
+        ).values('id', 'score', 'total_marks', 'percentage', 'time_taken', 'end_time', 'quiz__pass_percentage'))
+        if not pending:
+            return 0
+
+        # Raises IntegrityError (and rolls everything back) if another
+        # process applied any of these attempts in the meantime.
+        for row in pending:
+            row['passed'] = row['percentage'] >= row['quiz__pass_percentage']
+        ProgressLedger.objects.bulk_create([
+            ProgressLedger(attempt_id=row['id'], **_ledger_values(
+                row['score'], row['total_marks'], row['passed'], row['time_taken']
+            ))
+            for row in pending
+        ])
+
+        by_day = defaultdict(list)
+        for row in pending:
+            row['end_time'] = row['end_time'] or timezone.now()
+            by_day[timezone.localdate(row['end_time'])].append(row)
+
+        for day, rows in sorted(by_day.items()):
+            passed = sum(1 for row in rows if row['passed'])
+            _apply_progress_delta(
+                student_id,
+                day,
+                attempted=len(rows),
+                passed=passed,
+                score=sum(row['score'] for row in rows),
+                marks=sum(row['total_marks'] for row in rows),
+                time_spent=sum(row['time_taken'] for row in rows),
+                highest=max(row['percentage'] for row in rows),
+                lowest=min(row['percentage'] for row in rows),
+                last_quiz_date=max(row['end_time'] for row in rows),
+            )
+
+        _announce_completed([row['id'] for row in pending])
+    return len(pending)
+
+
+def _apply_regrade(entry, attempt):
+    """Fold in the difference between an applied attempt and its ledger entry, if any"""
+    values = _ledger_values(attempt.score, attempt.total_marks, attempt.is_passed, attempt.time_taken)
+    if all(getattr(entry, name) == value for name, value in values.items()):
+        return
+
+    end_time = attempt.end_time or entry.applied_at
+    _apply_progress_delta(
+        attempt.student_id,
+        timezone.localdate(end_time),
+        attempted=0,
+        passed=int(values['passed']) - int(entry.passed),
+        score=values['score'] - entry.score,
+        marks=values['total_marks'] - entry.total_marks,
+        time_spent=values['time_taken'] - entry.time_taken,
+        highest=None,
+        lowest=None,
+        last_quiz_date=end_time,
+    )
+    ProgressLedger.objects.filter(pk=entry.pk).update(**values)
+
+
+@receiver(post_save, sender=QuizAttempt)
+def update_progress(sender, instance, created, **kwargs):
+    """Apply a newly completed attempt to daily and overall progress exactly once.
+
+    Saving an attempt that is already applied, e.g. after a regrade, applies
+    only what changed. Regrades are rare, so they are applied inline in
+    both modes.
+    """
+    if instance.status != 'completed':
+        return
+
+    with transaction.atomic():
+        if settings.PROGRESS_UPDATE_MODE == 'queue':
+            entry = ProgressLedger.objects.filter(attempt=instance).first()
+            if entry is None:
+                enqueue_progress_update(instance.student_id)
+                return
+            is_new = False
+        else:
+            entry, is_new = ProgressLedger.objects.get_or_create(
+                attempt=instance,
+                defaults=_ledger_values(instance.score, instance.total_marks, instance.is_passed,
+                                        instance.time_taken),
+            )
+        if not is_new:
+            _apply_regrade(entry, instance)
+            return
+
+        end_time = instance.end_time or timezone.now()
+        passed = 1 if instance.is_passed else 0
+        _apply_progress_delta(
+            instance.student_id,
+            timezone.localdate(end_time),
+            attempted=1,
+            passed=passed,
+            score=instance.score,
+            marks=instance.total_marks,
+            time_spent=instance.time_taken,
+            highest=instance.percentage,
+            lowest=instance.percentage,
+            last_quiz_date=end_time,
+        )
+
+        transaction.on_commit(lambda: attempt_completed.send(sender=QuizAttempt, attempt=instance))
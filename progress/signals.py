@@ -0,0 +1,6 @@
+from django.dispatch import Signal
+
+# Sent once per attempt after it has been folded into the progress tables
+# and the transaction has committed, whether that happened inline or in
+# the process_progress_jobs worker. Keyword argument: ``attempt``.
+attempt_completed = Signal()
@@ -0,0 +1,138 @@
+"""
+Cached student dashboard snapshots.
+
+A snapshot is the fully evaluated dashboard context: progress rows, the
+first page of recent attempts, available quizzes and the chart series.
+It is dropped when one of the student's attempts starts or completes,
+and all snapshots are retired at once when the quiz catalog changes.
+
+Both happen through the cache, so every process that serves dashboards or
+completes attempts must share it (Redis/Memcached). With the per-process
+local memory cache, a change made in one process leaves the others showing
+the old snapshot for up to ``SNAPSHOT_TIMEOUT``. In queue mode that is
+every completion, since ``process_progress_jobs`` sends attempt_completed.
+"""
+import json
+import time
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from quiz.models import Quiz, QuizAttempt
+from quiz.pagination import paginate
+from quiz_app.caching import get_or_build
+
+from .models import DailyProgress, OverallProgress
+from .signals import attempt_completed
+
+SNAPSHOT_TIMEOUT = 60 * 15
+CATALOG_VERSION_KEY = 'dashboard:catalog_version'
+
+
+def _catalog_version():
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        # A timestamp rather than a counter, so losing the key can never
+        # bring back snapshots built under an older catalog.
+        cache.add(CATALOG_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def snapshot_key(student_id):
+    return f'dashboard:{student_id}:{_catalog_version()}'
+
+
+def build_dashboard_context(request, student):
+    overall_progress, _ = OverallProgress.objects.get_or_create(student=student)
+
+    daily_progress = list(DailyProgress.objects.filter(
+        student=student
+    ).order_by('-date')[:30])
+
+    recent_attempts = paginate(
+        request,
+        QuizAttempt.objects.filter(
+            student=student,
+            status='completed',
+            end_time__isnull=False
+        ).select_related('quiz'),
+        'end_time',
+        page_size=10
+    )
+
+    attempted_quiz_ids = QuizAttempt.objects.filter(
+        student=student
+    ).values_list('quiz_id', flat=True)
+
+    available_quizzes = list(Quiz.objects.filter(
+        is_active=True
+    ).exclude(id__in=attempted_quiz_ids)[:5])
+
+    chart_dates = []
+    chart_percentages = []
+
+    for dp in reversed(daily_progress):
+        chart_dates.append(dp.date.strftime('%b %d'))
+        chart_percentages.append(round(dp.average_percentage, 1))
+
+    return {
+        'overall_progress': overall_progress,
+        'daily_progress': daily_progress,
+        'recent_attempts': recent_attempts,
+        'available_quizzes': available_quizzes,
+        'chart_dates': json.dumps(chart_dates),
+        'chart_percentages': json.dumps(chart_percentages),
+    }
+
+
+def get_dashboard_snapshot(request, student):
+    """Return the student's dashboard context from cache, building it if needed"""
+    return get_or_build(
+        snapshot_key(student.id),
+        lambda: build_dashboard_context(request, student),
+        SNAPSHOT_TIMEOUT
+    )
+
+
+def invalidate_dashboard(student_id):
+    cache.delete(snapshot_key(student_id))
+
+
+def retire_all_dashboards():
+    cache.set(CATALOG_VERSION_KEY, time.time_ns(), None)
+
+
+@receiver(post_save, sender=QuizAttempt)
+def attempt_started(sender, instance, created, **kwargs):
+    """A started attempt removes the quiz from the available list"""
+    if created:
+        invalidate_dashboard(instance.student_id)
+
+
+@receiver(attempt_completed)
+def attempt_finished(sender, attempt, **kwargs):
+    invalidate_dashboard(attempt.student_id)
+
+
+@receiver(post_save, sender=Quiz)
+@receiver(post_delete, sender=Quiz)
+def catalog_changed(sender, instance, **kwargs):
+    """Quizzes being created, (de)activated or removed affect every dashboard"""
+    retire_all_dashboards()
+
+
+@checks.register(checks.Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    backend = settings.CACHES.get('default', {}).get('BACKEND', '')
+    if settings.PROGRESS_UPDATE_MODE == 'queue' and backend.endswith('LocMemCache'):
+        return [checks.Warning(
+            'PROGRESS_UPDATE_MODE is "queue" but the default cache is per process.',
+            hint='process_progress_jobs cannot drop the web workers\' dashboard snapshots; '
+                 'use a shared cache such as Redis or Memcached.',
+            id='progress.W001',
+        )]
+    return []
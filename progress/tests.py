@@ -1,3 +1,293 @@
-from django.test import TestCase
+from datetime import datetime, time, timedelta
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from quiz.models import Question, Quiz, QuizAttempt, StudentAnswer
+from . import leaderboard, snapshot
+from .models import (
+    DailyProgress, LeaderboardNode, OverallProgress, ProgressJob, ProgressLedger, apply_pending_progress,
+    recompute_progress,
+)
+
+
+@override_settings(PROGRESS_UPDATE_MODE='queue')
+class ProgressJobTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        trainer = User.objects.create_user('trainer', password='pass', is_staff=True)
+        cls.student = User.objects.create_user('student', password='pass')
+        cls.quiz = Quiz.objects.create(title='Quiz', description='-', created_by=trainer)
+        Question.objects.create(
+            quiz=cls.quiz, question_text='?', option_a='a', option_b='b', option_c='c',
+            option_d='d', correct_answer='A', marks=1, order=0,
+        )
+
+    def complete_attempt(self):
+        attempt = QuizAttempt.objects.create(student=self.student, quiz=self.quiz)
+        StudentAnswer.objects.create(attempt=attempt, question=self.quiz.questions.get(), selected_answer='A')
+        attempt.status = 'completed'
+        attempt.calculate_score()
+        return attempt
+
+    def test_drain_applies_and_removes_job(self):
+        self.complete_attempt()
+        self.assertEqual(ProgressJob.objects.count(), 1)
+
+        call_command('process_progress_jobs', '--once', stdout=StringIO())
+        self.assertFalse(ProgressJob.objects.exists())
+        self.assertEqual(ProgressLedger.objects.count(), 1)
+        self.assertEqual(OverallProgress.objects.get(student=self.student).total_quizzes_passed, 1)
+
+    def test_failed_update_keeps_job(self):
+        self.complete_attempt()
+        with mock.patch('progress.models._apply_progress_delta', side_effect=RuntimeError), \
+                self.assertLogs('progress.management.commands.process_progress_jobs', 'ERROR'):
+            call_command('process_progress_jobs', '--once', stdout=StringIO())
+
+        # The claim rolled back with the update, and the job was re-queued
+        self.assertEqual(list(ProgressJob.objects.values_list('student_id', flat=True)), [self.student.id])
+        self.assertFalse(ProgressLedger.objects.exists())
+
+
+class ProgressDeltaTests(TestCase):
+    """The F() deltas of each submit and regrade add up to a full recompute"""
+
+    DAILY_FIELDS = ('date', 'quizzes_attempted', 'quizzes_passed', 'quizzes_failed', 'total_score',
+                    'total_marks', 'average_percentage', 'time_spent')
+    OVERALL_FIELDS = ('total_quizzes_attempted', 'total_quizzes_passed', 'total_quizzes_failed', 'total_score',
+                      'total_marks', 'overall_percentage', 'total_time_spent', 'highest_score', 'lowest_score',
+                      'last_quiz_date')
+
+    @classmethod
+    def setUpTestData(cls):
+        trainer = User.objects.create_user('trainer', password='pass', is_staff=True)
+        cls.student = User.objects.create_user('student', password='pass')
+        cls.quizzes = []
+        for number in range(3):
+            quiz = Quiz.objects.create(title=f'Quiz {number}', description='-', created_by=trainer)
+            for order, (correct, marks) in enumerate([('A', 1), ('B', 2), ('C', 3)]):
+                Question.objects.create(
+                    quiz=quiz, question_text='?', option_a='a', option_b='b', option_c='c',
+                    option_d='d', correct_answer=correct, marks=marks, order=order,
+                )
+            cls.quizzes.append(quiz)
+
+    def complete(self, quiz, selected, days_ago, time_taken):
+        attempt = QuizAttempt.objects.create(student=self.student, quiz=quiz)
+        for question, answer in zip(quiz.questions.all(), selected):
+            StudentAnswer.objects.create(attempt=attempt, question=question, selected_answer=answer)
+        day = timezone.localdate() - timedelta(days=days_ago)
+        attempt.end_time = timezone.make_aware(datetime.combine(day, time(12)))
+        attempt.time_taken = time_taken
+        attempt.status = 'completed'
+        with self.captureOnCommitCallbacks(execute=True):
+            attempt.calculate_score()
+        return attempt
+
+    def snapshot(self):
+        def rounded(row):
+            return tuple(round(value, 9) if isinstance(value, float) else value for value in row)
+        return (
+            [rounded(row) for row in DailyProgress.objects.filter(student=self.student)
+             .order_by('date').values_list(*self.DAILY_FIELDS)],
+            rounded(OverallProgress.objects.filter(student=self.student).values_list(*self.OVERALL_FIELDS).get()),
+        )
+
+    def assert_matches_recompute(self):
+        incremental = self.snapshot()
+        recompute_progress(self.student)
+        self.assertEqual(incremental, self.snapshot())
+        return incremental
+
+    def complete_all(self):
+        return [
+            self.complete(self.quizzes[0], 'ABC', days_ago=1, time_taken=40),   # 6 of 6, passed
+            self.complete(self.quizzes[1], 'AAA', days_ago=1, time_taken=25),   # 1 of 6, failed
+            self.complete(self.quizzes[2], 'DBD', days_ago=0, time_taken=70),   # 2 of 6, failed
+        ]
+
+    def test_deltas_match_recompute(self):
+        self.complete_all()
+        daily, overall = self.assert_matches_recompute()
+        self.assertEqual([row[1:4] for row in daily], [(2, 1, 1), (1, 0, 1)])
+        self.assertEqual(overall[:3], (3, 1, 2))
+
+    def test_resaved_attempt_is_counted_once(self):
+        attempts = self.complete_all()
+        before = self.snapshot()
+        for attempt in attempts:
+            attempt.save()
+            attempt.calculate_score()
+        self.assertEqual(self.snapshot(), before)
+        self.assertEqual(ProgressLedger.objects.count(), 3)
+
+    def test_regrade_applies_only_the_difference(self):
+        attempts = self.complete_all()
+        # The top attempt drops to 3 of 6 (still a pass) and a failed one rises to 5 of 6
+        for quiz, question_order, correct in [(self.quizzes[0], 2, 'D'), (self.quizzes[2], 2, 'D')]:
+            question = quiz.questions.get(order=question_order)
+            question.correct_answer = correct
+            question.save()
+        for attempt in (attempts[0], attempts[2]):
+            attempt.quiz.refresh_from_db()
+            attempt.calculate_score()
+
+        daily, overall = self.assert_matches_recompute()
+        self.assertEqual([row[1:4] for row in daily], [(2, 1, 1), (1, 1, 0)])
+        self.assertEqual(overall[:3], (3, 2, 1))
+        self.assertAlmostEqual(overall[7], 5 / 6 * 100)
+        self.assertAlmostEqual(overall[8], 1 / 6 * 100)
+
+    @override_settings(PROGRESS_UPDATE_MODE='queue')
+    def test_queued_attempts_and_regrades(self):
+        attempts = self.complete_all()
+        self.assertFalse(OverallProgress.objects.filter(student=self.student, total_quizzes_attempted__gt=0).exists())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(apply_pending_progress(self.student.id), 3)
+            self.assertEqual(apply_pending_progress(self.student.id), 0)
+        ProgressJob.objects.all().delete()
+
+        question = self.quizzes[1].questions.get(order=1)
+        question.correct_answer = 'A'
+        question.save()
+        attempts[1].quiz.refresh_from_db()
+        attempts[1].calculate_score()
+        # Regrades of applied attempts are folded in at once, not queued
+        self.assertFalse(ProgressJob.objects.exists())
+        self.assert_matches_recompute()
+
+
+class LeaderboardTests(TestCase):
+    """The Fenwick tree agrees with counting the attempts directly"""
+
+    @classmethod
+    def setUpTestData(cls):
+        trainer = User.objects.create_user('trainer', password='pass', is_staff=True)
+        cls.quiz = Quiz.objects.create(title='Quiz', description='-', created_by=trainer)
+        cls.students = User.objects.bulk_create([User(username=f'student{n}') for n in range(12)])
+
+    def standing(self, percentage):
+        return leaderboard.get_standing(SimpleNamespace(quiz_id=self.quiz.id, percentage=percentage))
+
+    def expected(self, percentages, percentage):
+        mine = leaderboard.bucket(percentage)
+        buckets = [leaderboard.bucket(p) for p in percentages]
+        below = sum(b < mine for b in buckets)
+        level = sum(b == mine for b in buckets)
+        return {
+            'total': len(buckets),
+            'rank': sum(b > mine for b in buckets) + 1,
+            'percentile': round((below + level / 2) / len(buckets) * 100),
+        }
+
+    def nodes(self):
+        return dict(self.quiz.leaderboard_nodes.filter(count__gt=0).values_list('node', 'count'))
+
+    def complete(self, percentages):
+        attempts = QuizAttempt.objects.bulk_create([
+            QuizAttempt(student=student, quiz=self.quiz, status='completed', percentage=percentage)
+            for student, percentage in zip(self.students, percentages)
+        ])
+        ProgressLedger.objects.bulk_create([ProgressLedger(attempt=attempt) for attempt in attempts])
+        for attempt in attempts:
+            leaderboard.attempt_ranked(sender=QuizAttempt, attempt=attempt)
+        return attempts
+
+    def test_add_and_remove_match_direct_counts(self):
+        percentages = [0, 12.5, 50, 50, 69.99999, 70, 88.8, 100, 100, 33.3]
+        attempts = self.complete(percentages)
+        for percentage in percentages + [1, 99.9]:
+            self.assertEqual(self.standing(percentage), self.expected(percentages, percentage), percentage)
+
+        attempts[2].delete()
+        attempts[7].delete()
+        remaining = [p for index, p in enumerate(percentages) if index not in (2, 7)]
+        for percentage in remaining:
+            self.assertEqual(self.standing(percentage), self.expected(remaining, percentage), percentage)
+
+    def test_rebuild_matches_incremental_tree(self):
+        attempts = self.complete([5, 40.4, 40.4, 77, 100, 0.1])
+        attempts[1].delete()
+        incremental = self.nodes()
+        self.assertEqual(leaderboard.rebuild_leaderboard(self.quiz.id), 5)
+        self.assertEqual(self.nodes(), incremental)
+
+    def test_ties_share_a_rank(self):
+        self.complete([80, 80, 80, 60])
+        self.assertEqual(self.standing(80), {'total': 4, 'rank': 1, 'percentile': 62})
+        self.assertEqual(self.standing(60), {'total': 4, 'rank': 4, 'percentile': 12})
+
+    def test_empty_leaderboard(self):
+        self.assertIsNone(self.standing(50))
+        attempt, = self.complete([50])
+        attempt.delete()
+        self.assertIsNone(self.standing(50))
+        self.assertEqual(leaderboard.rebuild_leaderboard(self.quiz.id), 0)
+
+    def test_deleting_quiz_skips_unranking(self):
+        self.complete([10, 20, 30])
+        with mock.patch.object(leaderboard, 'add_attempt') as add_attempt:
+            self.quiz.delete()
+        add_attempt.assert_not_called()
+        self.assertFalse(LeaderboardNode.objects.exists())
+
+
+class DashboardSnapshotTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        trainer = User.objects.create_user('trainer', password='pass', is_staff=True)
+        cls.student = User.objects.create_user('student', password='pass')
+        cls.quiz = Quiz.objects.create(title='Quiz', description='-', created_by=trainer)
+        Question.objects.create(
+            quiz=cls.quiz, question_text='?', option_a='a', option_b='b', option_c='c',
+            option_d='d', correct_answer='A', marks=1, order=0,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.login(username='student', password='pass')
+
+    def dashboard(self):
+        return self.client.get(reverse('progress:dashboard'))
+
+    def test_warm_dashboard_reads_only_session_and_user(self):
+        self.dashboard()
+        with self.assertNumQueries(2):
+            response = self.dashboard()
+        self.assertEqual(response.context['available_quizzes'], [self.quiz])
+
+    def test_completed_attempt_retires_snapshot(self):
+        self.dashboard()
+        attempt = QuizAttempt.objects.create(student=self.student, quiz=self.quiz)
+        self.dashboard()
+        key = snapshot.snapshot_key(self.student.id)
+        self.assertIsNotNone(cache.get(key))
+
+        StudentAnswer.objects.create(attempt=attempt, question=self.quiz.questions.get(), selected_answer='A')
+        attempt.status = 'completed'
+        attempt.end_time = timezone.now()
+        with self.captureOnCommitCallbacks(execute=True):
+            attempt.calculate_score()
+        self.assertIsNone(cache.get(key))
+        self.assertEqual(self.dashboard().context['overall_progress'].total_quizzes_passed, 1)
+
+    def test_quiz_activation_retires_every_snapshot(self):
+        self.assertEqual(self.dashboard().context['available_quizzes'], [self.quiz])
+        key = snapshot.snapshot_key(self.student.id)
+
+        self.quiz.is_active = False
+        self.quiz.save()
+        self.assertNotEqual(snapshot.snapshot_key(self.student.id), key)
+        self.assertEqual(self.dashboard().context['available_quizzes'], [])
+
+        self.quiz.is_active = True
+        self.quiz.save()
+        self.assertEqual(self.dashboard().context['available_quizzes'], [self.quiz])
@@ -1,52 +1,24 @@
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
-from .models import DailyProgress, OverallProgress
-from quiz.models import QuizAttempt, Quiz
-import json
+from quiz_app.routers import read_from_replica
+from .snapshot import build_dashboard_context, get_dashboard_snapshot
 
 
 @login_required
+@read_from_replica
 def dashboard(request):
     user = request.user
 
     # ✅ Redirect trainers properly
-    if hasattr(user, 'trainer_profile'):
+    if request.role.is_trainer:
         return redirect('trainer:dashboard')
 
     # ✅ Student dashboard logic
-    overall_progress, _ = OverallProgress.objects.get_or_create(student=user)
-
-    daily_progress = DailyProgress.objects.filter(
-        student=user
-    ).order_by('-date')[:30]
-
-    recent_attempts = QuizAttempt.objects.filter(
-        student=user,
-        status='completed'
-    ).select_related('quiz').order_by('-end_time')[:10]
-
-    attempted_quiz_ids = QuizAttempt.objects.filter(
-        student=user
-    ).values_list('quiz_id', flat=True)
-
-    available_quizzes = Quiz.objects.filter(
-        is_active=True
-    ).exclude(id__in=attempted_quiz_ids)[:5]
-
-    chart_dates = []
-    chart_percentages = []
-
-    for dp in reversed(list(daily_progress)):
-        chart_dates.append(dp.date.strftime('%b %d'))
-        chart_percentages.append(round(dp.average_percentage, 1))
-
-    context = {
-        'overall_progress': overall_progress,
-        'daily_progress': daily_progress,
-        'recent_attempts': recent_attempts,
-        'available_quizzes': available_quizzes,
-        'chart_dates': json.dumps(chart_dates),
-        'chart_percentages': json.dumps(chart_percentages),
-    }
+    # The cached snapshot covers the default view; paging through older
+    # attempts (any query string) is built live.
+    if request.GET:
+        context = build_dashboard_context(request, user)
+    else:
+        context = get_dashboard_snapshot(request, user)
 
     return render(request, 'progress/dashboard.html', context)
@@ -0,0 +1,225 @@
+"""
+Write-behind buffer for the answers of in-progress attempts.
+
+With ``ANSWER_WRITE_MODE = 'buffer'`` the answer views do not write to the
+database. Each answer is appended, with the time it was given, to a
+per-attempt journal file in ``ANSWER_BUFFER_DIR`` (fsync'd before the
+response is sent), and the buffered answers reach ``StudentAnswer`` in one
+upsert:
+
+* when the quiz is submitted,
+* once the oldest buffered answer is ``ANSWER_BUFFER_FLUSH_SECONDS`` old,
+  checked on the attempt's next answer and by the checkpoint,
+* on ``python manage.py flush_answer_buffers``, the periodic checkpoint,
+  which also picks up attempts that were abandoned.
+
+The journal is the only copy, shared by every process on the host. A flush
+keeps the newest answer per question and the upsert only replaces a row
+with a newer answer, so replaying an old journal can never undo a later
+one. Journals are deleted only after the upsert has committed.
+"""
+import datetime
+import fcntl
+import glob
+import json
+import logging
+import os
+import time
+
+from django.conf import settings
+from django.db import connection
+
+from .answer_keys import get_answer_key
+from .models import QuizAttempt, StudentAnswer
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_SUFFIX = '.jsonl'
+# A journal claimed by a flush; left behind only if that flush failed
+CLAIMED_SUFFIX = '.flushing'
+
+
+def buffering_enabled():
+    return getattr(settings, 'ANSWER_WRITE_MODE', 'direct') == 'buffer'
+
+
+def _directory():
+    return str(settings.ANSWER_BUFFER_DIR)
+
+
+def _journal_path(attempt_id):
+    return os.path.join(_directory(), f'{attempt_id}{JOURNAL_SUFFIX}')
+
+
+def _read_journal(path, entries):
+    """Merge a journal's answers into ``entries``; skips a line torn by a crash"""
+    try:
+        journal = open(path)
+    except FileNotFoundError:
+        return
+    with journal:
+        # Wait for an append that opened the file before it was claimed
+        fcntl.flock(journal, fcntl.LOCK_SH)
+        for line in journal:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            _merge(entries, record['q'], [record['a'], record['t'], record['at']])
+
+
+def _merge(entries, question_id, entry):
+    if question_id not in entries or entry[2] >= entries[question_id][2]:
+        entries[question_id] = entry
+
+
+def _append(attempt_id, lines):
+    """Append to the attempt's journal and fsync; returns the time of its first line"""
+    path = _journal_path(attempt_id)
+    while True:
+        fd = os.open(path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            # A flush may have claimed the file between open and lock
+            try:
+                current = os.stat(path).st_ino == os.fstat(fd).st_ino
+            except FileNotFoundError:
+                current = False
+            if not current:
+                continue
+            os.write(fd, lines.encode())
+            os.fsync(fd)
+            with os.fdopen(os.dup(fd)) as journal:
+                journal.seek(0)
+                first = json.loads(journal.readline())
+            return first['at']
+        finally:
+            os.close(fd)
+
+
+def buffer_answers(attempt, answers):
+    """Buffer ``{question_id: (selected_answer, time_taken)}`` for an in-progress attempt.
+
+    Answers must already be validated. Flushes the attempt when its oldest
+    buffered answer is due.
+    """
+    now = time.time()
+    os.makedirs(_directory(), exist_ok=True)
+    lines = ''.join(
+        json.dumps({'q': question_id, 'a': selected_answer, 't': time_taken, 'at': now}) + '\n'
+        for question_id, (selected_answer, time_taken) in answers.items()
+    )
+    oldest = _append(attempt.pk, lines)
+    if now - oldest >= settings.ANSWER_BUFFER_FLUSH_SECONDS:
+        flush_attempt(attempt)
+
+
+def _upsert_newer(rows):
+    """Insert answers, replacing an existing row only with a newer answer"""
+    opts = StudentAnswer._meta
+    qn = connection.ops.quote_name
+    columns = [opts.get_field(name).column for name in
+               ('attempt', 'question', 'selected_answer', 'is_correct', 'time_taken', 'answered_at')]
+    table = qn(opts.db_table)
+    updates = ', '.join(f'{qn(column)} = excluded.{qn(column)}' for column in columns[2:])
+    answered_at = qn(columns[-1])
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {table} ({", ".join(qn(column) for column in columns)}) '
+            f'VALUES ({", ".join(["%s"] * len(columns))}) '
+            f'ON CONFLICT ({qn(columns[0])}, {qn(columns[1])}) DO UPDATE SET {updates} '
+            f'WHERE excluded.{answered_at} >= {table}.{answered_at}',
+            rows
+        )
+
+
+def flush_attempt(attempt):
+    """Write the attempt's buffered answers to StudentAnswer in one upsert; returns the count"""
+    path = _journal_path(attempt.pk)
+    # Answers arriving while this runs start a fresh journal
+    try:
+        os.rename(path, f'{path}.{os.getpid()}.{time.time_ns()}{CLAIMED_SUFFIX}')
+    except FileNotFoundError:
+        pass
+    claimed = glob.glob(f'{glob.escape(path)}.*{CLAIMED_SUFFIX}')
+
+    pending = {}
+    for claimed_path in claimed:
+        _read_journal(claimed_path, pending)
+
+    answer_key = get_answer_key(attempt.quiz)
+    adapt = connection.ops.adapt_datetimefield_value
+    # Questions deleted since they were answered have nothing to attach to;
+    # is_correct is graded here because the upsert skips StudentAnswer.save()
+    rows = [
+        (
+            attempt.pk, question_id, selected_answer,
+            selected_answer == answer_key[question_id][0], time_taken,
+            adapt(datetime.datetime.fromtimestamp(answered_at, tz=datetime.timezone.utc)),
+        )
+        for question_id, (selected_answer, time_taken, answered_at) in pending.items()
+        if question_id in answer_key
+    ]
+    if rows:
+        _upsert_newer(rows)
+
+    for claimed_path in claimed:
+        try:
+            os.remove(claimed_path)
+        except FileNotFoundError:
+            pass
+    return len(rows)
+
+
+def discard_buffer(attempt_id):
+    """Drop an attempt's buffered answers without writing them; returns the count"""
+    pending = {}
+    for path in glob.glob(f'{glob.escape(_journal_path(attempt_id))}*'):
+        _read_journal(path, pending)
+        os.remove(path)
+    return len(pending)
+
+
+def _buffered_attempts():
+    """``{attempt_id: (oldest answer time, has a claimed journal)}`` from the journal directory"""
+    found = {}
+    try:
+        names = os.listdir(_directory())
+    except FileNotFoundError:
+        return found
+    for name in names:
+        attempt_id, _, suffix = name.partition('.')
+        if not attempt_id.isdigit():
+            continue
+        entries = {}
+        _read_journal(os.path.join(_directory(), name), entries)
+        oldest = min((entry[2] for entry in entries.values()), default=time.time())
+        previous_oldest, previous_claimed = found.get(int(attempt_id), (oldest, False))
+        found[int(attempt_id)] = (min(oldest, previous_oldest),
+                                  previous_claimed or suffix.endswith(CLAIMED_SUFFIX[1:]))
+    return found
+
+
+def checkpoint(max_age=None):
+    """Flush buffered attempts whose oldest answer is ``max_age`` seconds old (all if None).
+
+    Journals left by a failed flush are always retried. Buffers of attempts
+    that were submitted elsewhere or deleted are discarded. Returns
+    ``(attempts flushed, answers written, answers discarded)``.
+    """
+    buffered = _buffered_attempts()
+    attempts = QuizAttempt.objects.select_related('quiz').in_bulk(list(buffered))
+    now = time.time()
+    flushed = written = discarded = 0
+
+    for attempt_id, (oldest, claimed) in buffered.items():
+        attempt = attempts.get(attempt_id)
+        if attempt is None or attempt.status != 'in_progress':
+            count = discard_buffer(attempt_id)
+            if count:
+                logger.warning('Discarded %s buffered answer(s) of closed attempt %s', count, attempt_id)
+            discarded += count
+        elif max_age is None or claimed or now - oldest >= max_age:
+            written += flush_attempt(attempt)
+            flushed += 1
+    return flushed, written, discarded
@@ -0,0 +1,64 @@
+"""
+Per-process cache of quiz answer keys used for grading.
+
+Entries are keyed by (quiz id, content version). Any change to a quiz's
+questions bumps ``Quiz.content_version``, so other processes stop using
+their old entry as soon as they see the new version; the local entry is
+also dropped right away.
+"""
+import threading
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+_answer_keys = OrderedDict()
+_lock = threading.Lock()
+
+
+def _max_entries():
+    return getattr(settings, 'ANSWER_KEY_CACHE_SIZE', 256)
+
+
+def _cached_answer_key(cache_key):
+    with _lock:
+        answer_key = _answer_keys.get(cache_key)
+        if answer_key is not None:
+            _answer_keys.move_to_end(cache_key)
+        return answer_key
+
+
+def get_answer_key(quiz):
+    """Return ``{question_id: (correct_answer, marks)}`` for the quiz"""
+    cache_key = (quiz.pk, quiz.content_version)
+    answer_key = _cached_answer_key(cache_key)
+    if answer_key is not None:
+        return answer_key
+
+    answer_key = {
+        question_id: (correct_answer, marks)
+        for question_id, correct_answer, marks in quiz.questions.values_list('id', 'correct_answer', 'marks')
+    }
+
+    with _lock:
+        _answer_keys[cache_key] = answer_key
+        _answer_keys.move_to_end(cache_key)
+        while len(_answer_keys) > _max_entries():
+            _answer_keys.popitem(last=False)
+
+    return answer_key
+
+
+async def aget_answer_key(quiz):
+    """Async get_answer_key; only a cache miss leaves the event loop"""
+    answer_key = _cached_answer_key((quiz.pk, quiz.content_version))
+    if answer_key is not None:
+        return answer_key
+    return await sync_to_async(get_answer_key)(quiz)
+
+
+def invalidate_answer_key(quiz_id):
+    """Drop every cached version of a quiz's answer key in this process"""
+    with _lock:
+        for cache_key in [key for key in _answer_keys if key[0] == quiz_id]:
+            del _answer_keys[cache_key]
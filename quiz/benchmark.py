@@ -0,0 +1,475 @@
+"""
+Seeded dataset and view scenarios for ``manage.py bench``.
+
+Each scenario drives one view through the Django test client against a
+throwaway test database; ``run_scenario`` records wall time, query count
+and SQL time for every measured request, optionally from several threads
+at once to reproduce write contention. With ``server='asgi'`` the requests
+go through the project's ASGI application instead, as concurrent tasks on
+one event loop, and the answer-saving scenarios use the async views.
+"""
+import asyncio
+import functools
+import itertools
+import re
+import json
+import random
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIHandler
+from django.http import HttpResponse
+from django.middleware.csrf import CSRF_ALLOWED_CHARS, CSRF_SECRET_LENGTH
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+
+from accounts.models import StudentProfile, TrainerProfile
+from progress.models import recompute_progress
+from trainer.models import rebuild_trainer_stats
+from .models import Question, Quiz, QuizAttempt, StudentAnswer, quiz_totals_expressions
+
+OPTIONS = 'ABCD'
+SERVERS = ('wsgi', 'asgi')
+# Views with an async counterpart used when benchmarking the ASGI path
+ASYNC_VIEWS = {'submit_answer': 'quiz:asubmit_answer', 'submit_quiz': 'quiz:asubmit_quiz'}
+SERVER_TIMING_DB = re.compile(r'db;dur=([\d.]+);desc="(\d+) queries"')
+
+
+class Dataset:
+    """Handles to the seeded rows the scenarios act on, one subject per worker"""
+
+    def __init__(self, trainer, students, open_attempts, submit_quiz, result_attempts, sizes):
+        self.trainer = trainer
+        self.students = students
+        self.open_attempts = open_attempts
+        self.submit_quiz = submit_quiz
+        self.result_attempts = result_attempts
+        self.sizes = sizes
+
+
+def seed(students=200, quizzes=40, questions=10, attempt_rate=0.3, seed_value=1, subjects=1):
+    """Populate the (test) database with a fixed, reproducible dataset.
+
+    Rows are bulk inserted and the derived tables (quiz totals, progress,
+    trainer stats) rebuilt afterwards, as signals do not fire for bulk_create.
+    """
+    rng = random.Random(seed_value)
+    password = make_password('bench')
+    now = timezone.now()
+
+    trainers = User.objects.bulk_create([
+        User(username=f'bench_trainer{n}', password=password, is_staff=True) for n in range(2)
+    ])
+    TrainerProfile.objects.bulk_create([
+        TrainerProfile(user=trainer, employee_id=f'BT{trainer.id:05d}', is_active=True) for trainer in trainers
+    ])
+    learners = User.objects.bulk_create([
+        User(username=f'bench_student{n}', password=password) for n in range(students)
+    ])
+    StudentProfile.objects.bulk_create([
+        StudentProfile(user=learner, enrollment_number=f'BS{learner.id:05d}',
+                       assigned_trainer=trainers[n % len(trainers)])
+        for n, learner in enumerate(learners)
+    ])
+
+    catalog = Quiz.objects.bulk_create([
+        Quiz(title=f'Bench quiz {n}', description='Benchmark quiz', created_by=trainers[n % len(trainers)])
+        for n in range(quizzes)
+    ])
+    Question.objects.bulk_create([
+        Question(quiz=quiz, question_text=f'Question {order}', option_a='a', option_b='b',
+                 option_c='c', option_d='d', correct_answer=rng.choice(OPTIONS),
+                 marks=rng.randint(1, 3), order=order)
+        for quiz in catalog for order in range(questions)
+    ])
+    Quiz.objects.update(**quiz_totals_expressions())
+
+    keys = {}
+    for quiz_id, question_id, correct_answer, marks in Question.objects.values_list(
+            'quiz_id', 'id', 'correct_answer', 'marks'):
+        keys.setdefault(quiz_id, []).append((question_id, correct_answer, marks))
+
+    # Benchmarked students (one per worker) have attempted every quiz (the
+    # heaviest dashboard) except two kept untouched: one to take, one to submit
+    subject_list, take_quiz, submit_quiz = learners[:subjects], catalog[0], catalog[1]
+
+    attempts, picks = [], []
+    for learner in learners:
+        for quiz in catalog:
+            if learner in subject_list and quiz in (take_quiz, submit_quiz):
+                continue
+            if learner not in subject_list and rng.random() >= attempt_rate:
+                continue
+            chosen = [(question_id, rng.choice(OPTIONS), correct, marks)
+                      for question_id, correct, marks in keys[quiz.id]]
+            score = sum(marks for _, selected, correct, marks in chosen if selected == correct)
+            total = sum(marks for _, _, _, marks in chosen)
+            end_time = now - timedelta(days=rng.randint(0, 60), seconds=rng.randint(0, 86399))
+            attempts.append(QuizAttempt(
+                student=learner, quiz=quiz, status='completed', score=score, total_marks=total,
+                percentage=score / total * 100 if total else 0, end_time=end_time,
+                time_taken=rng.randint(60, 900),
+            ))
+            picks.append(chosen)
+
+    attempts = QuizAttempt.objects.bulk_create(attempts)
+    StudentAnswer.objects.bulk_create([
+        StudentAnswer(attempt=attempt, question_id=question_id, selected_answer=selected,
+                      is_correct=selected == correct, time_taken=rng.randint(5, 60))
+        for attempt, chosen in zip(attempts, picks)
+        for question_id, selected, correct, _ in chosen
+    ], batch_size=2000)
+
+    for learner in learners:
+        recompute_progress(learner)
+    for trainer in trainers:
+        rebuild_trainer_stats(trainer)
+
+    return Dataset(
+        trainer=subject_list[0].student_profile.assigned_trainer,
+        students=subject_list,
+        open_attempts=[QuizAttempt.objects.create(student=subject, quiz=take_quiz) for subject in subject_list],
+        submit_quiz=submit_quiz,
+        result_attempts=[
+            QuizAttempt.objects.filter(student=subject, status='completed').latest('end_time')
+            for subject in subject_list
+        ],
+        sizes={
+            'students': students,
+            'quizzes': quizzes,
+            'questions_per_quiz': questions,
+            'attempts': len(attempts),
+            'seed': seed_value,
+        },
+    )
+
+
+class SQLTimer:
+    """execute_wrapper summing the count and duration of executed statements"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - start
+            self.count += 1
+
+
+@functools.cache
+def _asgi_application():
+    return ASGIHandler()
+
+
+class ASGIClient:
+    """Logged-in client calling an ASGI application directly, like a server would.
+
+    Unlike Django's AsyncClient it goes through ``ASGIHandler`` (what
+    ``quiz_app.asgi`` serves, without repeating its setup) itself, so
+    each request gets its own thread-sensitive context as in production,
+    and CSRF is enforced (the client sends a valid token).
+    """
+
+    def __init__(self, user, application):
+        self.application = application
+        login = Client()
+        login.force_login(user)
+        token = get_random_string(CSRF_SECRET_LENGTH, CSRF_ALLOWED_CHARS)
+        cookies = {name: morsel.value for name, morsel in login.cookies.items()}
+        cookies[settings.CSRF_COOKIE_NAME] = token
+        self.headers = [
+            (b'host', b'testserver'),
+            (b'cookie', '; '.join(f'{name}={value}' for name, value in cookies.items()).encode()),
+            (b'x-csrftoken', token.encode()),
+        ]
+
+    async def request(self, method, path, body=b'', content_type=None):
+        headers = list(self.headers)
+        if content_type:
+            headers.append((b'content-type', content_type.encode()))
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+            'method': method, 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+            'query_string': b'', 'root_path': '', 'headers': headers,
+            'client': ('127.0.0.1', 50000), 'server': ('testserver', 80),
+        }
+        pending = [{'type': 'http.request', 'body': body, 'more_body': False}]
+        disconnected = asyncio.Event()
+        start, chunks = {}, []
+
+        async def receive():
+            if pending:
+                return pending.pop()
+            await disconnected.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                start.update(message)
+            else:
+                chunks.append(message.get('body', b''))
+
+        try:
+            await self.application(scope, receive, send)
+        finally:
+            disconnected.set()
+
+        response = HttpResponse(b''.join(chunks), status=start['status'])
+        for name, value in start['headers']:
+            response[name.decode()] = value.decode()
+        return response
+
+    def get(self, path):
+        return self.request('GET', path)
+
+    def post(self, path, data, content_type):
+        return self.request('POST', path, data.encode(), content_type)
+
+
+def _client_for(user, server='wsgi'):
+    if server == 'asgi':
+        return ASGIClient(user, _asgi_application())
+    client = Client()
+    client.force_login(user)
+    return client
+
+
+def _reopen_submit_attempt(student, quiz):
+    """Give the student a fresh, fully answered in-progress attempt to submit"""
+    QuizAttempt.objects.filter(student=student, quiz=quiz).delete()
+    attempt = QuizAttempt.objects.create(student=student, quiz=quiz)
+    StudentAnswer.objects.bulk_create([
+        StudentAnswer(attempt=attempt, question_id=question_id, selected_answer='A',
+                      is_correct=correct_answer == 'A')
+        for question_id, correct_answer in quiz.questions.values_list('id', 'correct_answer')
+    ])
+    return attempt
+
+
+def build_scenarios(data, worker=0, server='wsgi'):
+    """Return {name: (setup, request)} for one worker.
+
+    setup runs untimed and its result is passed to request. For the ASGI
+    server request returns an awaitable.
+    """
+    student_user = data.students[worker]
+    open_attempt = data.open_attempts[worker]
+    result_attempt = data.result_attempts[worker]
+    student = _client_for(student_user, server)
+    trainer = _client_for(data.trainer, server)
+    submit_answer_url, submit_quiz_url = (
+        ('quiz:submit_answer', 'quiz:submit_quiz') if server == 'wsgi'
+        else (ASYNC_VIEWS['submit_answer'], ASYNC_VIEWS['submit_quiz'])
+    )
+    question_ids = list(open_attempt.quiz.questions.values_list('id', flat=True))
+    answer_cycle = itertools.count()
+
+    def submit_answer(_):
+        n = next(answer_cycle)
+        return student.post(
+            reverse(submit_answer_url, args=[open_attempt.id]),
+            json.dumps({
+                'question_id': question_ids[n % len(question_ids)],
+                'answer': OPTIONS[n % len(OPTIONS)],
+                'time_taken': 5,
+            }),
+            content_type='application/json',
+        )
+
+    return {
+        'quiz_list': (None, lambda _: student.get(reverse('quiz:quiz_list'))),
+        'take_quiz': (None, lambda _: student.get(reverse('quiz:take_quiz', args=[open_attempt.id]))),
+        'submit_answer': (None, submit_answer),
+        'submit_quiz': (
+            lambda: _reopen_submit_attempt(student_user, data.submit_quiz),
+            lambda attempt: student.get(reverse(submit_quiz_url, args=[attempt.id])),
+        ),
+        'quiz_result': (None, lambda _: student.get(reverse('quiz:quiz_result', args=[result_attempt.id]))),
+        'progress_dashboard': (None, lambda _: student.get(reverse('progress:dashboard'))),
+        'trainer_dashboard': (None, lambda _: trainer.get(reverse('trainer:dashboard'))),
+    }
+
+
+def percentile(sorted_values, pct):
+    """Linear-interpolated percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = (len(sorted_values) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
+
+
+class Samples:
+    """Measurements collected by one worker"""
+
+    def __init__(self):
+        self.wall = []
+        self.queries = []
+        self.sql = []
+        self.errors = []
+        self.started = None
+        self.finished = None
+
+    def record(self, response, elapsed, queries, sql_seconds):
+        if response.status_code >= 400:
+            self.errors.append(f'HTTP {response.status_code}')
+            return
+        self.wall.append(elapsed * 1000)
+        self.queries.append(queries)
+        self.sql.append(sql_seconds * 1000)
+
+
+def _drive(setup, request, iterations, warmup, samples, barrier=None):
+    for n in range(warmup + iterations):
+        if n == warmup:
+            if barrier is not None:
+                barrier.wait()
+            samples.started = time.perf_counter()
+        timer = SQLTimer()
+        try:
+            state = setup() if setup else None
+            with connection.execute_wrapper(timer):
+                start = time.perf_counter()
+                response = request(state)
+                elapsed = time.perf_counter() - start
+        except Exception as exc:
+            samples.errors.append(f'{type(exc).__name__}: {exc}')
+            continue
+        if n >= warmup or response.status_code >= 400:
+            samples.record(response, elapsed, timer.count, timer.seconds)
+    samples.finished = time.perf_counter()
+
+
+async def _adrive(setup, request, iterations, warmup, samples, barrier):
+    """_drive for one asyncio task; SQL figures come from the Server-Timing header"""
+    for n in range(warmup + iterations):
+        if n == warmup:
+            await barrier.wait()
+            samples.started = time.perf_counter()
+        try:
+            # Not thread-sensitive: setups would otherwise queue on one shared thread
+            state = await sync_to_async(setup, thread_sensitive=False)() if setup else None
+            start = time.perf_counter()
+            response = await request(state)
+            elapsed = time.perf_counter() - start
+        except Exception as exc:
+            samples.errors.append(f'{type(exc).__name__}: {exc}')
+            continue
+        timing = SERVER_TIMING_DB.search(response.get('Server-Timing', ''))
+        queries, sql_ms = (int(timing[2]), float(timing[1])) if timing else (0, 0.0)
+        if n >= warmup or response.status_code >= 400:
+            samples.record(response, elapsed, queries, sql_ms / 1000)
+    samples.finished = time.perf_counter()
+
+
+class ThreadPeak:
+    """Background thread tracking the highest number of live threads"""
+
+    def __init__(self, interval=0.001):
+        self.interval = interval
+        self.peak = threading.active_count()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, threading.active_count())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+
+def _run_wsgi(data, name, iterations, warmup, workers):
+    concurrency = len(workers)
+    if concurrency == 1:
+        _drive(*build_scenarios(data)[name], iterations, warmup, workers[0])
+    else:
+        barrier = threading.Barrier(concurrency)
+        scenarios = [build_scenarios(data, worker)[name] for worker in range(concurrency)]
+
+        def work(scenario, samples):
+            try:
+                _drive(*scenario, iterations, warmup, samples, barrier)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=work, args=(scenario, samples))
+                   for scenario, samples in zip(scenarios, workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+
+def _run_asgi(data, name, iterations, warmup, workers):
+    scenarios = [build_scenarios(data, worker, 'asgi')[name] for worker in range(len(workers))]
+
+    async def main():
+        barrier = asyncio.Barrier(len(workers))
+        await asyncio.gather(*[
+            _adrive(*scenario, iterations, warmup, samples, barrier)
+            for scenario, samples in zip(scenarios, workers)
+        ])
+
+    asyncio.run(main())
+
+
+def run_scenario(data, name, iterations, warmup, concurrency=1, server='wsgi'):
+    """Run a scenario with ``concurrency`` workers and summarise it (times in ms).
+
+    Workers are threads under WSGI and asyncio tasks in one thread under
+    ASGI. Each acts as its own student and makes ``iterations`` measured
+    requests after ``warmup`` unmeasured ones. Failed requests are counted
+    in ``errors`` and left out of the timings; ``peak_threads`` is the most
+    threads the process had alive at once.
+    """
+    cache.clear()
+    workers = [Samples() for _ in range(concurrency)]
+
+    with ThreadPeak() as threads:
+        if server == 'asgi':
+            _run_asgi(data, name, iterations, warmup, workers)
+        else:
+            _run_wsgi(data, name, iterations, warmup, workers)
+
+    wall = sorted(value for samples in workers for value in samples.wall)
+    queries = [value for samples in workers for value in samples.queries]
+    sql = [value for samples in workers for value in samples.sql]
+    errors = [error for samples in workers for error in samples.errors]
+    if not wall:
+        raise RuntimeError(f'every request failed ({errors[0]})')
+
+    started = min(samples.started for samples in workers)
+    finished = max(samples.finished for samples in workers)
+    return {
+        'requests': len(wall),
+        'errors': len(errors),
+        'first_error': errors[0] if errors else None,
+        'throughput_rps': round(len(wall) / (finished - started), 1),
+        'peak_threads': threads.peak,
+        'queries': round(sum(queries) / len(queries), 1),
+        'sql_ms': round(sum(sql) / len(sql), 3),
+        'mean_ms': round(sum(wall) / len(wall), 3),
+        'p50_ms': round(percentile(wall, 50), 3),
+        'p95_ms': round(percentile(wall, 95), 3),
+        'p99_ms': round(percentile(wall, 99), 3),
+    }
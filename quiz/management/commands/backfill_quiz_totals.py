@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from quiz.models import Quiz, quiz_totals_expressions
+
+
+class Command(BaseCommand):
+    help = 'Recompute the stored question count and total marks of every quiz'
+
+    def add_arguments(self, parser):
+        parser.add_argument('quiz_ids', nargs='*', type=int, help='Only these quizzes (default: all)')
+
+    def handle(self, *args, **options):
+        quizzes = Quiz.objects.all()
+        if options['quiz_ids']:
+            quizzes = quizzes.filter(id__in=options['quiz_ids'])
+
+        updated = quizzes.update(**quiz_totals_expressions())
+        self.stdout.write(self.style.SUCCESS(f'Updated totals for {updated} quiz(zes).'))
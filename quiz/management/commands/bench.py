@@ -0,0 +1,161 @@
+import json
+import logging
+import platform
+import sqlite3
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from quiz.benchmark import SERVERS, build_scenarios, run_scenario, seed
+
+
+class Command(BaseCommand):
+    help = ('Benchmark the hot views against a seeded throwaway database and report '
+            'query count, SQL time and p50/p95/p99 latency')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=100, help='Measured requests per view')
+        parser.add_argument('--warmup', type=int, default=10, help='Unmeasured requests per view first')
+        parser.add_argument('--students', type=int, default=200)
+        parser.add_argument('--quizzes', type=int, default=40)
+        parser.add_argument('--questions', type=int, default=10, help='Questions per quiz')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--concurrency', type=int, default=1,
+                            help='Threads per view, each acting as a different student (needs --db-file)')
+        parser.add_argument('--server', choices=SERVERS, default='wsgi',
+                            help='Send requests through the WSGI or the ASGI handler; under ASGI the '
+                                 'workers are asyncio tasks and answer saving uses the async views')
+        parser.add_argument('--db-file', help='Use a file-backed test database at this path instead of '
+                                              'SQLite in memory, so journaling and locking behave as in production')
+        parser.add_argument('--only', nargs='+', metavar='VIEW', help='Only benchmark these views')
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+        parser.add_argument('--baseline', help='Compare against a JSON file written by --output')
+        parser.add_argument('--max-regression', type=float, metavar='PCT',
+                            help='With --baseline, fail if any p95 grows by more than PCT%% '
+                                 'or any view issues more queries')
+
+    def handle(self, *args, **options):
+        if options['quizzes'] < 3:
+            raise CommandError('--quizzes must be at least 3: two quizzes are kept unattempted '
+                               'for take_quiz and submit_quiz')
+
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as baseline_file:
+                baseline = json.load(baseline_file)
+
+        # Keep the per-request log lines out of the report; the timing
+        # middleware itself stays active, as it is in production, and
+        # measures every request so the async driver gets its SQL figures
+        logging.getLogger('quiz_app.requests').setLevel(logging.ERROR)
+        settings.REQUEST_TIMING_SAMPLE_RATE = 1.0
+        # Failed requests are counted in the report instead
+        logging.getLogger('django.request').setLevel(logging.CRITICAL)
+
+        if options['concurrency'] > 1 and not options['db_file'] and connection.vendor == 'sqlite':
+            raise CommandError('--concurrency needs --db-file: the in-memory test database '
+                               'cannot be shared between threads')
+        if options['server'] == 'asgi' and not options['db_file'] and connection.vendor == 'sqlite':
+            raise CommandError('--server asgi needs --db-file: async views query from worker threads')
+        if options['db_file']:
+            connection.settings_dict['TEST']['NAME'] = options['db_file']
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        # Replicas read the throwaway database too, as they do under the test runner
+        for alias in settings.DATABASE_REPLICAS:
+            connections[alias].settings_dict['NAME'] = connection.settings_dict['NAME']
+        try:
+            self.stdout.write('Seeding benchmark data...')
+            data = seed(
+                students=options['students'],
+                quizzes=options['quizzes'],
+                questions=options['questions'],
+                seed_value=options['seed'],
+                subjects=options['concurrency'],
+            )
+            scenarios = build_scenarios(data)
+            names = options['only'] or list(scenarios)
+            unknown = set(names) - set(scenarios)
+            if unknown:
+                raise CommandError(f"Unknown view(s): {', '.join(sorted(unknown))}")
+
+            results = {}
+            for name in names:
+                try:
+                    results[name] = run_scenario(
+                        data, name, options['iterations'], options['warmup'], options['concurrency'],
+                        options['server'],
+                    )
+                except RuntimeError as exc:
+                    raise CommandError(f'{name}: {exc}')
+                self.stdout.write(self._format_row(name, results[name]))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        report = {
+            'meta': {
+                'created_at': timezone.now().isoformat(),
+                'iterations': options['iterations'],
+                'warmup': options['warmup'],
+                'concurrency': options['concurrency'],
+                'server': options['server'],
+                'database': 'file' if options['db_file'] else 'memory',
+                'db_profile': getattr(settings, 'DATABASE_PROFILE', 'default'),
+                'dataset': data.sizes,
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'sqlite': sqlite3.sqlite_version,
+            },
+            'views': results,
+        }
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+        if baseline is not None:
+            regressions = self._compare(baseline, report, options['max_regression'])
+            if regressions:
+                raise CommandError('Regressions against baseline: ' + ', '.join(regressions))
+
+    def _format_row(self, name, result):
+        row = (f"{name:<20} queries={result['queries']:<6} sql={result['sql_ms']:>8.2f}ms  "
+               f"p50={result['p50_ms']:>8.2f}ms  p95={result['p95_ms']:>8.2f}ms  "
+               f"p99={result['p99_ms']:>8.2f}ms  {result['throughput_rps']:>7.1f} req/s  "
+               f"threads={result['peak_threads']}")
+        if result['errors']:
+            row += f"  errors={result['errors']} ({result['first_error']})"
+        return row
+
+    def _compare(self, baseline, report, max_regression):
+        """Print the change from the baseline per view and return the regressions found"""
+        regressions = []
+        self.stdout.write('\nChange from baseline:')
+        for name, result in report['views'].items():
+            before = baseline.get('views', {}).get(name)
+            if before is None:
+                self.stdout.write(f'{name:<20} (not in baseline)')
+                continue
+
+            changes = []
+            for metric in ('p50_ms', 'p95_ms', 'p99_ms'):
+                change = (result[metric] - before[metric]) / before[metric] * 100 if before[metric] else 0.0
+                changes.append(f'{metric[:-3]} {change:+.1f}%')
+            query_change = result['queries'] - before['queries']
+            changes.append(f'queries {query_change:+g}')
+            self.stdout.write(f"{name:<20} {'  '.join(changes)}")
+
+            if max_regression is not None:
+                p95_change = (result['p95_ms'] - before['p95_ms']) / before['p95_ms'] * 100 if before['p95_ms'] else 0.0
+                if p95_change > max_regression:
+                    regressions.append(f'{name} p95 {p95_change:+.1f}%')
+                if query_change > 0:
+                    regressions.append(f'{name} queries {query_change:+g}')
+        return regressions
@@ -0,0 +1,31 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from quiz.answer_buffer import checkpoint
+
+
+class Command(BaseCommand):
+    help = ('Checkpoint buffered answers to the database (used when ANSWER_WRITE_MODE = "buffer"); '
+            'run on every host that serves answers')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Flush every buffered attempt, not only those older than '
+                                 'ANSWER_BUFFER_FLUSH_SECONDS')
+        parser.add_argument('--interval', type=float,
+                            help='Keep running, checkpointing every INTERVAL seconds')
+
+    def handle(self, *args, **options):
+        max_age = None if options['all'] else settings.ANSWER_BUFFER_FLUSH_SECONDS
+        while True:
+            close_old_connections()
+            flushed, written, discarded = checkpoint(max_age)
+            if flushed or discarded:
+                self.stdout.write(f'Flushed {flushed} attempt(s), wrote {written} answer(s), '
+                                  f'discarded {discarded} from closed attempts.')
+            if options['interval'] is None:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:55
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def backfill_totals(apps, schema_editor):
+    Quiz = apps.get_model('quiz', 'Quiz')
+    Question = apps.get_model('quiz', 'Question')
+    questions = Question.objects.filter(quiz=OuterRef('pk')).order_by().values('quiz')
+    Quiz.objects.update(
+        total_questions=Coalesce(Subquery(questions.annotate(count=Count('id')).values('count')), 0),
+        total_marks=Coalesce(Subquery(questions.annotate(marks_sum=Sum('marks')).values('marks_sum')), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0002_quiz_content_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quiz',
+            name='total_marks',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='total_questions',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_totals, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,14 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .answer_keys import get_answer_key, invalidate_answer_key
+from .papers import get_paper
 
 class Quiz(models.Model):
     DIFFICULTY_CHOICES = [
@@ -15,23 +23,42 @@ class Quiz(models.Model):
     difficulty = models.CharField(max_length=10, choices=DIFFICULTY_CHOICES, default='medium')
     is_active = models.BooleanField(default=True)
     pass_percentage = models.IntegerField(default=50, validators=[MinValueValidator(0), MaxValueValidator(100)])
+    content_version = models.PositiveIntegerField(default=1, editable=False,
+                                                  help_text='Bumped whenever a question changes')
+    total_questions = models.PositiveIntegerField(default=0, editable=False)
+    total_marks = models.IntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Maintained with UPDATE ... F() statements; never written back from a
+    # possibly stale instance when the quiz itself is saved.
+    DERIVED_FIELDS = ('content_version', 'total_questions', 'total_marks')
+
     def __str__(self):
         return self.title
 
-    @property
-    def total_questions(self):
-        return self.questions.count()
-
-    @property
-    def total_marks(self):
-        return self.questions.aggregate(models.Sum('marks'))['marks__sum'] or 0
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.DERIVED_FIELDS
+            ]
+        super().save(*args, **kwargs)
 
     class Meta:
         verbose_name_plural = 'Quizzes'
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination of quiz lists
+            models.Index(fields=['created_at', 'id'], name='quiz_created_id_idx'),
+            # Student catalog: active quizzes, newest first. Partial, because
+            # Django filters booleans as a bare "is_active" term, which SQLite
+            # can match to an index condition but not to an index column.
+            models.Index(fields=['created_at', 'id'], condition=models.Q(is_active=True),
+                         name='quiz_active_created_idx'),
+            # Trainer lists: a trainer's quizzes, newest first
+            models.Index(fields=['created_by', 'created_at'], name='quiz_owner_created_idx'),
+        ]
 
 
 class Question(models.Model):
@@ -84,18 +111,52 @@ class QuizAttempt(models.Model):
     def is_passed(self):
         return self.percentage >= self.quiz.pass_percentage
 
+    @property
+    def result_cache_key(self):
+        """Cache key of the rendered result page; changes with the quiz content and pass mark"""
+        return f'quiz_result:{self.pk}:{self.quiz.content_version}:{self.quiz.pass_percentage}'
+
     def calculate_score(self):
-        correct_answers = self.answers.filter(is_correct=True).count()
-        total_questions = self.quiz.questions.count()
-        self.score = self.answers.filter(is_correct=True).aggregate(
-            models.Sum('question__marks'))['question__marks__sum'] or 0
-        self.total_marks = self.quiz.total_marks
+        answer_key = get_answer_key(self.quiz)
+        self.score = 0
+        regraded = {True: [], False: []}
+
+        for answer_id, question_id, selected_answer, is_correct in self.answers.values_list(
+                'id', 'question_id', 'selected_answer', 'is_correct'):
+            correct_answer, marks = answer_key.get(question_id, (None, 0))
+            correct = selected_answer == correct_answer
+            if correct:
+                self.score += marks
+            if correct != is_correct:
+                regraded[correct].append(answer_id)
+
+        # Keep stored flags in line with the key if a question changed after answering
+        for is_correct, answer_ids in regraded.items():
+            if answer_ids:
+                self.answers.filter(id__in=answer_ids).update(is_correct=is_correct)
+
+        self.total_marks = sum(marks for _, marks in answer_key.values())
         self.percentage = (self.score / self.total_marks * 100) if self.total_marks > 0 else 0
         self.save()
+        cache.delete(self.result_cache_key)
 
     class Meta:
         ordering = ['-start_time']
         unique_together = ['student', 'quiz']
+        indexes = [
+            # Keyset pagination of attempt histories
+            models.Index(fields=['end_time', 'id'], name='attempt_end_id_idx'),
+            # Student dashboards and histories: completed attempts by date
+            models.Index(fields=['student', 'status', 'end_time'], name='attempt_student_status_idx'),
+            # Trainer views reach attempts through their quizzes
+            models.Index(fields=['quiz', 'status', 'end_time'], name='attempt_quiz_status_idx'),
+            # Quiz leaderboards: best completed attempts first
+            models.Index(fields=['quiz', 'status', '-percentage', 'time_taken'], name='attempt_leaderboard_idx'),
+        ]
+
+
+# Valid values of StudentAnswer.selected_answer and Question.correct_answer
+ANSWER_OPTIONS = {'A', 'B', 'C', 'D'}
 
 
 class StudentAnswer(models.Model):
@@ -112,11 +173,63 @@ class StudentAnswer(models.Model):
     answered_at = models.DateTimeField(auto_now_add=True)
 
     def save(self, *args, **kwargs):
-        self.is_correct = (self.selected_answer == self.question.correct_answer)
+        answer_key = get_answer_key(self.attempt.quiz)
+        if self.question_id in answer_key:
+            correct_answer = answer_key[self.question_id][0]
+        else:
+            correct_answer = self.question.correct_answer
+        self.is_correct = (self.selected_answer == correct_answer)
         super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.attempt.student.username} - Q{self.question.order}"
 
     class Meta:
-        unique_together = ['attempt', 'question']
\ No newline at end of file
+        unique_together = ['attempt', 'question']
+        indexes = [
+            # Scoring and result pages count an attempt's correct answers
+            models.Index(fields=['attempt', 'is_correct'], name='answer_attempt_correct_idx'),
+        ]
+
+
+def quiz_totals_expressions():
+    """UPDATE expressions recomputing Quiz.total_questions/total_marks from its questions"""
+    questions = Question.objects.filter(quiz=OuterRef('pk')).order_by().values('quiz')
+    return {
+        'total_questions': Coalesce(Subquery(questions.annotate(count=Count('id')).values('count')), 0),
+        'total_marks': Coalesce(Subquery(questions.annotate(marks_sum=Sum('marks')).values('marks_sum')), 0),
+    }
+
+
+def refresh_quiz_totals(quiz_id):
+    """Resync a quiz's stored totals and bump its content version.
+
+    Called for every question change; bulk paths that bypass signals
+    (bulk_create/bulk_update) must call it once themselves.
+    """
+    Quiz.objects.filter(pk=quiz_id).update(
+        content_version=F('content_version') + 1,
+        **quiz_totals_expressions()
+    )
+    invalidate_answer_key(quiz_id)
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def question_changed(sender, instance, **kwargs):
+    """Keep quiz totals and cached answer keys in step with its questions"""
+    refresh_quiz_totals(instance.quiz_id)
+
+
+def warm_paper(quiz_id):
+    """Render and cache the question paper of an active quiz ahead of its first start"""
+    quiz = Quiz.objects.filter(pk=quiz_id, is_active=True).first()
+    if quiz is not None:
+        get_paper(quiz)
+
+
+@receiver(post_save, sender=Quiz)
+def quiz_saved(sender, instance, raw=False, **kwargs):
+    """Warm the paper cache when a quiz is saved active, once its questions are committed"""
+    if instance.is_active and not raw:
+        transaction.on_commit(lambda: warm_paper(instance.pk))
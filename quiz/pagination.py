@@ -0,0 +1,139 @@
+"""
+Keyset (cursor) pagination for list views.
+
+Rows are ordered newest first by ``(field, id)`` and a page is addressed
+by the key of its boundary row instead of an OFFSET, so page 500 is the
+same indexed range scan as page 1. ``field`` must be non-null for every
+row in the queryset. Pass ``tiebreak`` when the index behind ``field``
+belongs to a related table, so both keys come from the same index.
+"""
+import base64
+import binascii
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+class CursorPage:
+    """One page of rows plus the query strings that reach its neighbours"""
+
+    def __init__(self, object_list, next_query=None, prev_query=None):
+        self.object_list = object_list
+        self.next_query = next_query
+        self.prev_query = prev_query
+
+    @property
+    def has_next(self):
+        return self.next_query is not None
+
+    @property
+    def has_previous(self):
+        return self.prev_query is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+
+def _value_of(row, field):
+    if isinstance(row, dict):
+        return row[field]
+    value = row
+    for part in field.split('__'):
+        value = getattr(value, part)
+    return value
+
+
+def _key_of(row, field, tiebreak='id'):
+    return _value_of(row, field), _value_of(row, tiebreak)
+
+
+def _encode(direction, value, pk):
+    raw = f'{direction}|{value.isoformat()}|{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def _decode(cursor):
+    """Return (direction, value, pk) or None for a missing or malformed cursor"""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        direction, value, pk = raw.split('|')
+        value = parse_datetime(value)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if direction not in ('n', 'p') or value is None:
+        return None
+    return direction, value, pk
+
+
+def _page_size(request, default):
+    maximum = getattr(settings, 'PAGINATION_MAX_PAGE_SIZE', 100)
+    try:
+        size = int(request.GET.get('page_size', default))
+    except (TypeError, ValueError):
+        size = default
+    return max(1, min(size, maximum))
+
+
+def _query_with(request, param, cursor):
+    params = request.GET.copy()
+    params[param] = cursor
+    return params.urlencode()
+
+
+def first_page(request, rows, field, has_next, param='cursor'):
+    """Wrap already-fetched newest rows (e.g. from a cached feed) as the first page"""
+    next_query = None
+    if rows and has_next:
+        next_query = _query_with(request, param, _encode('n', *_key_of(rows[-1], field)))
+    return CursorPage(rows, next_query)
+
+
+def paginate(request, queryset, field, param='cursor', page_size=None, tiebreak='id'):
+    """Return a CursorPage of ``queryset`` ordered by ``-field, -tiebreak``.
+
+    ``param`` names the query-string parameter carrying the cursor so that
+    several lists on one page can be paged independently. ``tiebreak`` must
+    be unique per row.
+    """
+    size = _page_size(request, page_size or getattr(settings, 'PAGINATION_PAGE_SIZE', 20))
+    cursor = _decode(request.GET.get(param))
+
+    if cursor is None or cursor[0] == 'n':
+        rows = queryset.order_by(f'-{field}', f'-{tiebreak}')
+        if cursor:
+            _, value, pk = cursor
+            rows = rows.filter(Q(**{f'{field}__lt': value}) | Q(**{field: value, f'{tiebreak}__lt': pk}))
+        rows = list(rows[:size + 1])
+        has_more = len(rows) > size
+        rows = rows[:size]
+        older = has_more
+        newer = cursor is not None
+    else:
+        _, value, pk = cursor
+        rows = queryset.order_by(field, tiebreak).filter(
+            Q(**{f'{field}__gt': value}) | Q(**{field: value, f'{tiebreak}__gt': pk})
+        )
+        rows = list(rows[:size + 1])
+        has_more = len(rows) > size
+        rows = rows[:size]
+        rows.reverse()
+        older = True
+        newer = has_more
+
+    next_query = prev_query = None
+    if rows and older:
+        next_query = _query_with(request, param, _encode('n', *_key_of(rows[-1], field, tiebreak)))
+    if rows and newer:
+        prev_query = _query_with(request, param, _encode('p', *_key_of(rows[0], field, tiebreak)))
+
+    return CursorPage(rows, next_query, prev_query)
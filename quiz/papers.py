@@ -0,0 +1,31 @@
+"""
+Shared, pre-rendered question papers for ``take_quiz``.
+
+The attempt-independent part of the page, the question blocks and the
+per-question time limits, is rendered once per quiz content version and
+kept in the cache, so a burst of students starting the same quiz costs one
+render. Only the page around it (attempt id, CSRF token) is rendered per
+request. Editing a question bumps ``Quiz.content_version``, which moves
+readers to a new key; old versions simply expire.
+"""
+from django.template.loader import render_to_string
+
+from quiz_app.caching import get_or_build
+
+PAPER_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def paper_cache_key(quiz):
+    return f'quiz_paper:{quiz.pk}:{quiz.content_version}'
+
+
+def render_paper(quiz):
+    return render_to_string('quiz/paper_body.html', {
+        'questions': quiz.questions.all(),
+        'total_questions': quiz.total_questions,
+    })
+
+
+def get_paper(quiz):
+    """The rendered paper for the quiz's current content version"""
+    return get_or_build(paper_cache_key(quiz), lambda: render_paper(quiz), PAPER_CACHE_TIMEOUT)
@@ -1,3 +1,551 @@
-from django.test import TestCase
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import F
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils.http import urlencode
+from django.utils import timezone
+
+from accounts.models import StudentProfile
+from . import answer_buffer, answer_keys, papers
+from .models import Question, Quiz, QuizAttempt, StudentAnswer
+from .pagination import _encode
+
+# A "SCAN <table>" plan row walks a whole table or index, including
+# "SCAN <table> USING COVERING INDEX ...", so table access must be a SEARCH
+# bounded by an index. Scans of subquery results are fine.
+TABLE_SCAN = re.compile(r'^SCAN (?!\(|CONSTANT ROW).*$', re.MULTILINE)
+# The one exception: walking an index in ORDER BY order and stopping after
+# LIMIT rows, which reads no more than the page (keyset pagination)
+INDEX_WALK = re.compile(r'^SCAN \w+ USING (COVERING )?INDEX \w+$')
+LIMITED = re.compile(r'\bLIMIT \d+$')
+PLANNED_STATEMENTS = ('SELECT', 'UPDATE', 'DELETE', 'INSERT')
+
+
+class QueryCapture:
+    """execute_wrapper that records every query and write with its parameters"""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if sql.lstrip().upper().startswith(PLANNED_STATEMENTS):
+            self.queries.append((sql, next(iter(params)) if many else params))
+        return execute(sql, params, many, context)
+
+
+class HotQueryPlanTests(TestCase):
+    """Every query issued by the hot views must be answered through an index"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.trainer = User.objects.create_user('trainer', password='pass', is_staff=True)
+        cls.student = User.objects.create_user('student', password='pass')
+        StudentProfile.objects.filter(user=cls.student).update(assigned_trainer=cls.trainer)
+
+        cls.quizzes = []
+        for number in range(3):
+            quiz = Quiz.objects.create(title=f'Quiz {number}', description='-', created_by=cls.trainer)
+            for order in range(4):
+                Question.objects.create(
+                    quiz=quiz, question_text='?', option_a='a', option_b='b',
+                    option_c='c', option_d='d', correct_answer='A', marks=1, order=order,
+                )
+            cls.quizzes.append(quiz)
+
+        cls.attempt = QuizAttempt.objects.create(student=cls.student, quiz=cls.quizzes[0])
+        for question in cls.quizzes[0].questions.all():
+            StudentAnswer.objects.create(attempt=cls.attempt, question=question, selected_answer='A')
+        cls.attempt.status = 'completed'
+        cls.attempt.end_time = timezone.now()
+        cls.attempt.calculate_score()
+
+        cls.open_attempt = QuizAttempt.objects.create(student=cls.student, quiz=cls.quizzes[1])
+
+    def setUp(self):
+        cache.clear()
+
+    def assert_indexed(self, username, url, data=None, **extra):
+        """Request ``url`` (a POST when ``data`` is given) and EXPLAIN every query it ran"""
+        self.client.login(username=username, password='pass')
+        capture = QueryCapture()
+        with connection.execute_wrapper(capture):
+            if data is None:
+                response = self.client.get(url)
+            else:
+                response = self.client.post(url, data, **extra)
+        self.assertLess(response.status_code, 400, url)
+        if hasattr(response, 'streaming_content'):
+            b''.join(response.streaming_content)
+
+        with connection.cursor() as cursor:
+            for sql, params in capture.queries:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+                plan = '\n'.join(row[-1] for row in cursor.fetchall())
+                limited = LIMITED.search(sql.strip()) and 'USE TEMP B-TREE FOR ORDER BY' not in plan
+                for scan in TABLE_SCAN.findall(plan):
+                    self.assertTrue(limited and INDEX_WALK.match(scan), f'{url}\n{sql}\n{plan}')
+
+    def test_student_views(self):
+        quiz = self.quizzes[0]
+        for url in [
+            reverse('quiz:quiz_list'),
+            reverse('quiz:quiz_list') + '?page_size=1',
+            reverse('quiz:quiz_detail', args=[quiz.id]),
+            reverse('quiz:take_quiz', args=[self.open_attempt.id]),
+            reverse('quiz:quiz_result', args=[self.attempt.id]),
+            reverse('progress:dashboard'),
+            reverse('progress:dashboard') + '?page_size=1',
+        ]:
+            with self.subTest(url=url):
+                self.assert_indexed('student', url)
+
+    def test_answer_and_submit(self):
+        questions = list(self.quizzes[1].questions.all())
+        url = reverse('quiz:submit_answer', args=[self.open_attempt.id])
+        for selected in ('B', 'A'):  # the first answer inserts, the second updates
+            with self.subTest(selected=selected):
+                self.assert_indexed('student', url, json.dumps(
+                    {'question_id': questions[0].id, 'answer': selected, 'time_taken': 3}
+                ), content_type='application/json')
+        self.assert_indexed('student', reverse('quiz:submit_quiz', args=[self.open_attempt.id]), {})
+        self.assertEqual(QuizAttempt.objects.get(pk=self.open_attempt.pk).status, 'completed')
+
+    def test_trainer_views(self):
+        profile = StudentProfile.objects.get(user=self.student)
+        for url in [
+            reverse('trainer:dashboard'),
+            reverse('trainer:dashboard') + '?page_size=1',
+            reverse('trainer:manage_quizzes'),
+            reverse('trainer:manage_students'),
+            reverse('trainer:manage_students') + '?' + urlencode({
+                'cursor': _encode('n', profile.created_at, profile.id),
+                'unassigned_cursor': _encode('p', profile.created_at, profile.id),
+            }),
+            reverse('trainer:student_performance', args=[self.student.id]),
+            reverse('trainer:export_results') + '?kind=attempts',
+            reverse('trainer:export_results') + '?kind=answers',
+        ]:
+            with self.subTest(url=url):
+                self.assert_indexed('trainer', url)
+
+
+class AnswerBufferTests(TestCase):
+    """Journal replay, merge and checkpoint of the write-behind answer buffer"""
+
+    @classmethod
+    def setUpTestData(cls):
+        trainer = User.objects.create_user('trainer', password='pass', is_staff=True)
+        cls.student = User.objects.create_user('student', password='pass')
+        cls.quiz = Quiz.objects.create(title='Quiz', description='-', created_by=trainer)
+        cls.questions = [
+            Question.objects.create(
+                quiz=cls.quiz, question_text='?', option_a='a', option_b='b',
+                option_c='c', option_d='d', correct_answer='A', marks=1, order=order,
+            )
+            for order in range(3)
+        ]
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        settings = override_settings(ANSWER_BUFFER_DIR=directory, ANSWER_BUFFER_FLUSH_SECONDS=600)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.directory = directory
+        self.attempt = QuizAttempt.objects.create(student=self.student, quiz=self.quiz)
+
+    def buffer(self, answers, at):
+        with mock.patch.object(answer_buffer.time, 'time', return_value=at):
+            answer_buffer.buffer_answers(self.attempt, answers)
+
+    def stored(self):
+        return {
+            answer.question_id: (answer.selected_answer, answer.is_correct, answer.time_taken)
+            for answer in self.attempt.answers.all()
+        }
+
+    def test_flush_writes_newest_answer_and_removes_journal(self):
+        first, second = self.questions[:2]
+        now = time.time()
+        self.buffer({first.id: ('B', 5), second.id: ('A', 3)}, now - 10)
+        self.buffer({first.id: ('A', 7)}, now)
+
+        self.assertEqual(answer_buffer.flush_attempt(self.attempt), 2)
+        self.assertEqual(self.stored(), {first.id: ('A', True, 7), second.id: ('A', True, 3)})
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_older_answer_never_overwrites_newer_row(self):
+        question = self.questions[0]
+        now = time.time()
+        self.buffer({question.id: ('A', 4)}, now)
+        answer_buffer.flush_attempt(self.attempt)
+
+        self.buffer({question.id: ('C', 9)}, now - 60)
+        self.assertEqual(answer_buffer.flush_attempt(self.attempt), 1)
+        self.assertEqual(self.stored(), {question.id: ('A', True, 4)})
+
+        self.buffer({question.id: ('D', 2)}, now + 60)
+        answer_buffer.flush_attempt(self.attempt)
+        self.assertEqual(self.stored(), {question.id: ('D', False, 2)})
+
+    def test_torn_line_and_claimed_journal_are_replayed(self):
+        first, second = self.questions[:2]
+        self.buffer({first.id: ('B', 1)}, time.time())
+        path = answer_buffer._journal_path(self.attempt.pk)
+        # A flush that failed after claiming, then a crash mid-append
+        os.rename(path, f'{path}.1.1{answer_buffer.CLAIMED_SUFFIX}')
+        self.buffer({second.id: ('C', 2)}, time.time())
+        with open(path, 'a') as journal:
+            journal.write('{"q": %d, "a": "D"' % first.id)
+
+        self.assertEqual(answer_buffer.flush_attempt(self.attempt), 2)
+        self.assertEqual(self.stored(), {first.id: ('B', False, 1), second.id: ('C', False, 2)})
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_buffer_flushes_once_oldest_answer_is_due(self):
+        first, second = self.questions[:2]
+        now = time.time()
+        self.buffer({first.id: ('A', 1)}, now - 601)
+        self.assertEqual(self.stored(), {})
+        self.buffer({second.id: ('B', 1)}, now)
+        self.assertEqual(self.stored(), {first.id: ('A', True, 1), second.id: ('B', False, 1)})
+
+    def test_checkpoint_flushes_due_and_discards_closed_attempts(self):
+        other_quiz = Quiz.objects.create(title='Other', description='-', created_by=self.quiz.created_by)
+        closed = QuizAttempt.objects.create(student=self.student, quiz=other_quiz, status='completed')
+        now = time.time()
+        self.buffer({self.questions[0].id: ('A', 1)}, now - 700)
+        with mock.patch.object(answer_buffer.time, 'time', return_value=now):
+            answer_buffer.buffer_answers(closed, {self.questions[1].id: ('A', 1)})
+
+        with self.assertLogs('quiz.answer_buffer', 'WARNING'):
+            self.assertEqual(answer_buffer.checkpoint(600), (1, 1, 1))
+        self.assertEqual(self.stored(), {self.questions[0].id: ('A', True, 1)})
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_checkpoint_keeps_fresh_buffers_unless_flushing_all(self):
+        self.buffer({self.questions[0].id: ('A', 1)}, time.time())
+        self.assertEqual(answer_buffer.checkpoint(600), (0, 0, 0))
+        self.assertEqual(self.stored(), {})
+        self.assertEqual(answer_buffer.checkpoint(), (1, 1, 0))
+
+    def test_discard_buffer(self):
+        self.buffer({question.id: ('A', 1) for question in self.questions}, time.time())
+        self.assertEqual(answer_buffer.discard_buffer(self.attempt.pk), 3)
+        self.assertEqual(answer_buffer.flush_attempt(self.attempt), 0)
+        self.assertEqual(self.stored(), {})
+
+
+class ResultCacheTests(TestCase):
+    def test_pass_mark_change_rerenders_result(self):
+        trainer = User.objects.create_user('trainer', password='pass', is_staff=True)
+        student = User.objects.create_user('student', password='pass')
+        quiz = Quiz.objects.create(title='Quiz', description='-', created_by=trainer, pass_percentage=50)
+        for order, correct in enumerate('AB'):
+            Question.objects.create(
+                quiz=quiz, question_text='?', option_a='a', option_b='b', option_c='c',
+                option_d='d', correct_answer=correct, marks=1, order=order,
+            )
+        attempt = QuizAttempt.objects.create(student=student, quiz=quiz, status='completed', end_time=timezone.now())
+        StudentAnswer.objects.create(attempt=attempt, question=quiz.questions.get(order=0), selected_answer='A')
+        attempt.calculate_score()
+
+        self.client.login(username='student', password='pass')
+        url = reverse('quiz:quiz_result', args=[attempt.id])
+        self.assertContains(self.client.get(url), 'You Passed')
+        quiz.pass_percentage = 60
+        quiz.save()
+        self.assertNotContains(self.client.get(url), 'You Passed')
+
+
+class AnswerPayloadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        trainer = User.objects.create_user('trainer', password='pass', is_staff=True)
+        student = User.objects.create_user('student', password='pass')
+        quiz = Quiz.objects.create(title='Quiz', description='-', created_by=trainer)
+        cls.question = Question.objects.create(
+            quiz=quiz, question_text='?', option_a='a', option_b='b',
+            option_c='c', option_d='d', correct_answer='A', marks=1,
+        )
+        cls.attempt = QuizAttempt.objects.create(student=student, quiz=quiz)
+
+    def test_malformed_json_is_rejected(self):
+        self.client.login(username='student', password='pass')
+        for name in ('quiz:submit_answer', 'quiz:asubmit_answer'):
+            for body in ('{not json', '[1, 2]'):
+                with self.subTest(view=name, body=body):
+                    response = self.client.post(
+                        reverse(name, args=[self.attempt.id]), body, content_type='application/json'
+                    )
+                    self.assertEqual(response.status_code, 400)
+
+    def test_invalid_answer_is_rejected_in_both_modes(self):
+        self.client.login(username='student', password='pass')
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        valid = {'question_id': self.question.id, 'answer': 'A', 'time_taken': 3}
+        for mode in ('direct', 'buffer'):
+            for name in ('quiz:submit_answer', 'quiz:asubmit_answer'):
+                for change in [
+                    {'answer': None}, {'answer': 'Z'}, {'answer': ['A']},
+                    {'time_taken': 'abc'}, {'time_taken': -5}, {'time_taken': 1e30},
+                ]:
+                    with self.subTest(mode=mode, view=name, change=change), \
+                            self.settings(ANSWER_WRITE_MODE=mode, ANSWER_BUFFER_DIR=directory):
+                        response = self.client.post(
+                            reverse(name, args=[self.attempt.id]), {**valid, **change},
+                            content_type='application/json'
+                        )
+                        self.assertEqual(response.status_code, 400)
+                        self.assertEqual(response.json(), {'error': 'Invalid answer'})
+        self.assertFalse(self.attempt.answers.exists())
+        self.assertEqual(os.listdir(directory), [])
+
+
+
+class BatchAnswerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        trainer = User.objects.create_user('trainer', password='pass', is_staff=True)
+        cls.student = User.objects.create_user('student', password='pass')
+        cls.quiz = Quiz.objects.create(title='Quiz', description='-', created_by=trainer)
+        cls.questions = [
+            Question.objects.create(
+                quiz=cls.quiz, question_text='?', option_a='a', option_b='b',
+                option_c='c', option_d='d', correct_answer='A', marks=1, order=order,
+            )
+            for order in range(2)
+        ]
+        other = Quiz.objects.create(title='Other', description='-', created_by=trainer)
+        cls.foreign_question = Question.objects.create(
+            quiz=other, question_text='?', option_a='a', option_b='b',
+            option_c='c', option_d='d', correct_answer='A', marks=1,
+        )
+
+    def setUp(self):
+        self.attempt = QuizAttempt.objects.create(student=self.student, quiz=self.quiz)
+        self.client.login(username='student', password='pass')
+
+    def post(self, answers):
+        return self.client.post(
+            reverse('quiz:submit_answers', args=[self.attempt.id]),
+            json.dumps({'answers': answers}), content_type='application/json'
+        )
+
+    def stored(self):
+        return {
+            answer.question_id: (answer.selected_answer, answer.is_correct, answer.time_taken)
+            for answer in self.attempt.answers.all()
+        }
+
+    def test_answers_are_graded_and_upserted(self):
+        first, second = self.questions
+        response = self.post([
+            {'question_id': first.id, 'answer': 'A', 'time_taken': 5},
+            {'question_id': second.id, 'answer': 'C', 'time_taken': 7},
+        ])
+        self.assertEqual(response.json(), {'success': True, 'saved': 2})
+        self.assertEqual(self.stored(), {first.id: ('A', True, 5), second.id: ('C', False, 7)})
+
+        self.assertEqual(self.post([{'question_id': first.id, 'answer': 'B', 'time_taken': 9}]).status_code, 200)
+        self.assertEqual(self.stored(), {first.id: ('B', False, 9), second.id: ('C', False, 7)})
+
+    def test_invalid_batches_are_rejected(self):
+        question_id = self.questions[0].id
+        entry = {'question_id': question_id, 'answer': 'A', 'time_taken': 1}
+        for answers in [
+            [entry] * 201,
+            [{**entry, 'question_id': self.foreign_question.id}],
+            [{**entry, 'question_id': 'x'}],
+            [{'answer': 'A'}],
+            [{**entry, 'answer': 'Z'}],
+            [{**entry, 'answer': None}],
+            [{**entry, 'answer': ['A']}],
+            [{**entry, 'time_taken': 'abc'}],
+            [{**entry, 'time_taken': -1}],
+            [{**entry, 'time_taken': 1e30}],
+            ['A'],
+            {'question_id': question_id},
+        ]:
+            with self.subTest(answers=str(answers)[:60]):
+                self.assertEqual(self.post(answers).status_code, 400)
+        self.assertEqual(self.stored(), {})
+
+    def test_non_finite_time_is_rejected(self):
+        body = '{"answers": [{"question_id": %d, "answer": "A", "time_taken": Infinity}]}' % self.questions[0].id
+        response = self.client.post(
+            reverse('quiz:submit_answers', args=[self.attempt.id]), body, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_batch_at_the_cap_is_accepted(self):
+        entry = {'question_id': self.questions[0].id, 'answer': 'A', 'time_taken': 1}
+        self.assertEqual(self.post([entry] * 200).json(), {'success': True, 'saved': 1})
+
+
+class AnswerKeyTests(TestCase):
+    """Cached answer keys follow every question change and stay bounded"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.trainer = User.objects.create_user('trainer', password='pass', is_staff=True)
+        User.objects.create_superuser('admin', password='pass')
+        cls.quizzes = []
+        for number in range(3):
+            quiz = Quiz.objects.create(title=f'Quiz {number}', description='-', created_by=cls.trainer)
+            for order in range(2):
+                Question.objects.create(
+                    quiz=quiz, question_text='?', option_a='a', option_b='b',
+                    option_c='c', option_d='d', correct_answer='A', marks=1, order=order,
+                )
+            cls.quizzes.append(quiz)
+
+    def setUp(self):
+        answer_keys._answer_keys.clear()
+        self.addCleanup(answer_keys._answer_keys.clear)
+
+    def key_of(self, quiz):
+        return answer_keys.get_answer_key(Quiz.objects.get(pk=quiz.pk))
+
+    def assert_refreshed(self, quiz, old_version, expected):
+        self.assertNotIn((quiz.pk, old_version), answer_keys._answer_keys)
+        self.assertEqual({answer for answer, _ in self.key_of(quiz).values()}, expected)
+
+    def test_cached_key_is_reused(self):
+        quiz = Quiz.objects.get(pk=self.quizzes[0].pk)
+        answer_keys.get_answer_key(quiz)
+        with self.assertNumQueries(0):
+            answer_keys.get_answer_key(quiz)
+
+    def test_edit_questions_invalidates(self):
+        quiz = Quiz.objects.get(pk=self.quizzes[0].pk)
+        self.key_of(quiz)
+        data = {f'correct_{question.id}': 'C' for question in quiz.questions.all()}
+        self.client.login(username='trainer', password='pass')
+        self.client.post(reverse('trainer:edit_questions', args=[quiz.id]), data)
+        self.assert_refreshed(quiz, quiz.content_version, {'C'})
+
+    def test_admin_save_and_delete_invalidate(self):
+        quiz = Quiz.objects.get(pk=self.quizzes[0].pk)
+        first, second = quiz.questions.all()
+        self.key_of(quiz)
+        self.client.login(username='admin', password='pass')
+        self.client.post(reverse('admin:quiz_question_change', args=[first.id]), {
+            'quiz': quiz.id, 'question_text': '?', 'option_a': 'a', 'option_b': 'b', 'option_c': 'c',
+            'option_d': 'd', 'correct_answer': 'D', 'marks': 1, 'time_limit': 60, 'order': 0,
+        })
+        self.assert_refreshed(quiz, quiz.content_version, {'A', 'D'})
+
+        quiz.refresh_from_db()
+        self.client.post(reverse('admin:quiz_question_delete', args=[second.id]), {'post': 'yes'})
+        self.assert_refreshed(quiz, quiz.content_version, {'D'})
+
+    def test_stale_version_is_not_served(self):
+        # A change made in another process leaves this process's entry
+        # behind, but the bumped version no longer matches it
+        quiz = self.quizzes[0]
+        self.key_of(quiz)
+        Question.objects.filter(quiz=quiz).update(correct_answer='B')
+        Quiz.objects.filter(pk=quiz.pk).update(content_version=F('content_version') + 1)
+        self.assertEqual({answer for answer, _ in self.key_of(quiz).values()}, {'B'})
+
+    @override_settings(ANSWER_KEY_CACHE_SIZE=2)
+    def test_least_recently_used_key_is_evicted(self):
+        first, second, third = (Quiz.objects.get(pk=quiz.pk) for quiz in self.quizzes)
+        answer_keys.get_answer_key(first)
+        answer_keys.get_answer_key(second)
+        answer_keys.get_answer_key(first)
+        answer_keys.get_answer_key(third)
+        self.assertEqual(
+            list(answer_keys._answer_keys),
+            [(first.pk, first.content_version), (third.pk, third.content_version)],
+        )
+
+
+class PaperCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.trainer = User.objects.create_user('trainer', password='pass', is_staff=True)
+        cls.student = User.objects.create_user('student', password='pass')
+
+    def setUp(self):
+        cache.clear()
+
+    def create_quiz(self, is_active=True):
+        with self.captureOnCommitCallbacks(execute=True):
+            quiz = Quiz.objects.create(title='Quiz', description='-', created_by=self.trainer, is_active=is_active)
+            Question.objects.create(
+                quiz=quiz, question_text='First question?', option_a='a', option_b='b',
+                option_c='c', option_d='d', correct_answer='A', marks=1,
+            )
+        return Quiz.objects.get(pk=quiz.pk)
+
+    def test_saving_an_active_quiz_warms_its_paper(self):
+        quiz = self.create_quiz()
+        self.assertIn('First question?', cache.get(papers.paper_cache_key(quiz)))
+
+        inactive = self.create_quiz(is_active=False)
+        self.assertIsNone(cache.get(papers.paper_cache_key(inactive)))
+
+    def test_paper_is_keyed_on_content_version(self):
+        quiz = self.create_quiz()
+        old_key = papers.paper_cache_key(quiz)
+        question = quiz.questions.get()
+        question.question_text = 'Edited question?'
+        question.save()
+        quiz.refresh_from_db()
+
+        self.assertNotEqual(papers.paper_cache_key(quiz), old_key)
+        self.assertIn('Edited question?', papers.get_paper(quiz))
+        self.assertIn('First question?', cache.get(old_key))
+
+    def test_take_quiz_serves_the_cached_paper(self):
+        quiz = self.create_quiz()
+        attempt = QuizAttempt.objects.create(student=self.student, quiz=quiz)
+        cache.set(papers.paper_cache_key(quiz), '<p>Cached paper</p>')
+
+        self.client.login(username='student', password='pass')
+        with mock.patch.object(papers, 'render_paper') as render_paper:
+            response = self.client.get(reverse('quiz:take_quiz', args=[attempt.id]))
+        render_paper.assert_not_called()
+        self.assertContains(response, '<p>Cached paper</p>')
+        self.assertNotContains(response, 'First question?')
+
+
+class BenchCommandTests(SimpleTestCase):
+    def test_bench_runs(self):
+        # bench creates and destroys its own test database, which cannot
+        # happen inside the test runner's, so it runs in a fresh process
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        output = os.path.join(directory, 'bench.json')
+        subprocess.run(
+            [sys.executable, 'manage.py', 'bench', '--iterations', '1', '--warmup', '0', '--students', '4',
+             '--quizzes', '4', '--questions', '2', '--output', output],
+            cwd=settings.BASE_DIR, check=True, capture_output=True, timeout=120,
+        )
+        with open(output) as report_file:
+            report = json.load(report_file)
+        self.assertEqual(report['meta']['iterations'], 1)
+        for name, result in report['views'].items():
+            self.assertEqual(result['errors'], 0, name)
+            self.assertGreater(result['queries'], 0, name)
+
+    def test_too_few_quizzes_is_rejected(self):
+        with self.assertRaisesMessage(CommandError, '--quizzes must be at least 3'):
+            call_command('bench', iterations=1, warmup=0, quizzes=2)
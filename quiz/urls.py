@@ -9,6 +9,9 @@ urlpatterns = [
     path('<int:quiz_id>/start/', views.start_quiz, name='start_quiz'),
     path('attempt/<int:attempt_id>/', views.take_quiz, name='take_quiz'),
     path('attempt/<int:attempt_id>/submit-answer/', views.submit_answer, name='submit_answer'),
+    path('attempt/<int:attempt_id>/submit-answers/', views.submit_answers, name='submit_answers'),
     path('attempt/<int:attempt_id>/submit/', views.submit_quiz, name='submit_quiz'),
+    path('attempt/<int:attempt_id>/async/submit-answer/', views.asubmit_answer, name='asubmit_answer'),
+    path('attempt/<int:attempt_id>/async/submit/', views.asubmit_quiz, name='asubmit_quiz'),
     path('result/<int:attempt_id>/', views.quiz_result, name='quiz_result'),
 ]
\ No newline at end of file
@@ -1,11 +1,41 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.core.cache import cache
+from django.template.loader import render_to_string
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.utils import timezone
-from django.http import JsonResponse
-from .models import Quiz, Question, QuizAttempt, StudentAnswer
+from django.http import Http404, JsonResponse
+from asgiref.sync import sync_to_async
+from quiz_app.db import serialize_writes
+from quiz_app.routers import read_from_replica
+from progress.leaderboard import get_standing, top_attempts
+from .models import ANSWER_OPTIONS, Quiz, Question, QuizAttempt, StudentAnswer
+from .answer_buffer import buffer_answers, buffering_enabled, flush_attempt
+from .answer_keys import aget_answer_key, get_answer_key
+from .pagination import paginate
+from .papers import get_paper
 import json
 
+# Upper bound on answers accepted in one batch request
+MAX_BATCH_ANSWERS = 200
+# Upper bound on the time_taken reported for one answer, in seconds
+MAX_ANSWER_SECONDS = 60 * 60 * 24
+# Completed attempts never change unless regraded, which clears the entry
+RESULT_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def clean_answer(selected_answer, time_taken):
+    """Return (selected_answer, seconds) for a valid option and time, else None"""
+    if not isinstance(selected_answer, str) or selected_answer not in ANSWER_OPTIONS:
+        return None
+    try:
+        seconds = int(time_taken)
+    except (TypeError, ValueError, OverflowError):
+        return None
+    if not 0 <= seconds <= MAX_ANSWER_SECONDS:
+        return None
+    return selected_answer, seconds
+
 
 # ==============================
 # QUIZ LIST
@@ -21,7 +51,9 @@ def quiz_list(request):
         ).values_list('quiz_id', flat=True)
         quizzes = quizzes.exclude(id__in=attempted_quiz_ids)
 
-    return render(request, 'quiz/quiz_list.html', {'quizzes': quizzes})
+    return render(request, 'quiz/quiz_list.html', {
+        'quizzes': paginate(request, quizzes, 'created_at')
+    })
 
 
 # ==============================
@@ -45,6 +77,7 @@ def quiz_detail(request, quiz_id):
 # START QUIZ
 # ==============================
 @login_required
+@serialize_writes
 def start_quiz(request, quiz_id):
     quiz = get_object_or_404(Quiz, id=quiz_id)
 
@@ -52,7 +85,7 @@ def start_quiz(request, quiz_id):
         messages.error(request, 'Only students can attempt quizzes.')
         return redirect('quiz:quiz_list')
 
-    if hasattr(request.user, 'student_profile') and not request.user.student_profile.is_active:
+    if request.role.is_student and not request.role.active:
         messages.error(request, 'Your account is deactivated.')
         return redirect('quiz:quiz_list')
 
@@ -76,7 +109,7 @@ def start_quiz(request, quiz_id):
 @login_required
 def take_quiz(request, attempt_id):
     attempt = get_object_or_404(
-        QuizAttempt,
+        QuizAttempt.objects.select_related('quiz'),
         id=attempt_id,
         student=request.user
     )
@@ -84,12 +117,10 @@ def take_quiz(request, attempt_id):
     if attempt.status != 'in_progress':
         return redirect('quiz:quiz_result', attempt_id=attempt.id)
 
-    questions = attempt.quiz.questions.all()
-
     return render(request, 'quiz/take_quiz.html', {
         'attempt': attempt,
-        'questions': questions,
-        'total_questions': questions.count()
+        'paper_html': get_paper(attempt.quiz),
+        'total_questions': attempt.quiz.total_questions
     })
 
 
@@ -97,12 +128,13 @@ def take_quiz(request, attempt_id):
 # SAVE ANSWER (AJAX)
 # ==============================
 @login_required
+@serialize_writes
 def submit_answer(request, attempt_id):
     if request.method != 'POST':
         return JsonResponse({'error': 'Invalid request'}, status=400)
 
     attempt = get_object_or_404(
-        QuizAttempt,
+        QuizAttempt.objects.select_related('quiz'),
         id=attempt_id,
         student=request.user
     )
@@ -110,20 +142,35 @@ def submit_answer(request, attempt_id):
     if attempt.status != 'in_progress':
         return JsonResponse({'error': 'Quiz already completed'}, status=400)
 
-    data = json.loads(request.body)
-    question_id = data.get('question_id')
-    selected_answer = data.get('answer')
-    time_taken = data.get('time_taken', 0)
-
-    question = get_object_or_404(
-        Question,
-        id=question_id,
-        quiz=attempt.quiz
-    )
+    try:
+        data = json.loads(request.body)
+        answer = clean_answer(data.get('answer'), data.get('time_taken', 0))
+    except (ValueError, AttributeError):
+        return JsonResponse({'error': 'Invalid payload'}, status=400)
+
+    if answer is None:
+        return JsonResponse({'error': 'Invalid answer'}, status=400)
+    selected_answer, time_taken = answer
+
+    try:
+        question_id = int(data.get('question_id'))
+    except (TypeError, ValueError):
+        raise Http404('Question not found')
+
+    answer_key = get_answer_key(attempt.quiz)
+    if question_id not in answer_key:
+        raise Http404('Question not found')
+
+    if buffering_enabled():
+        buffer_answers(attempt, {question_id: (selected_answer, time_taken)})
+        return JsonResponse({
+            'success': True,
+            'is_correct': selected_answer == answer_key[question_id][0]
+        })
 
     answer, _ = StudentAnswer.objects.update_or_create(
         attempt=attempt,
-        question=question,
+        question_id=question_id,
         defaults={
             'selected_answer': selected_answer,
             'time_taken': time_taken
@@ -136,13 +183,87 @@ def submit_answer(request, attempt_id):
     })
 
 
+# ==============================
+# SAVE ANSWERS IN BULK (AJAX)
+# ==============================
+@login_required
+@serialize_writes
+def submit_answers(request, attempt_id):
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Invalid request'}, status=400)
+
+    attempt = get_object_or_404(
+        QuizAttempt.objects.select_related('quiz'),
+        id=attempt_id,
+        student=request.user
+    )
+
+    if attempt.status != 'in_progress':
+        return JsonResponse({'error': 'Quiz already completed'}, status=400)
+
+    try:
+        items = json.loads(request.body).get('answers')
+    except (ValueError, AttributeError):
+        return JsonResponse({'error': 'Invalid payload'}, status=400)
+
+    if not isinstance(items, list) or len(items) > MAX_BATCH_ANSWERS:
+        return JsonResponse({'error': 'Invalid payload'}, status=400)
+
+    # Later entries for the same question win
+    submitted = {}
+    for item in items:
+        try:
+            question_id = int(item['question_id'])
+            answer = clean_answer(item['answer'], item.get('time_taken', 0))
+        except (KeyError, TypeError, ValueError, OverflowError):
+            return JsonResponse({'error': 'Invalid answer entry'}, status=400)
+        if answer is None:
+            return JsonResponse({'error': 'Invalid answer entry'}, status=400)
+        submitted[question_id] = answer
+
+    answer_key = get_answer_key(attempt.quiz)
+
+    if not answer_key.keys() >= submitted.keys():
+        return JsonResponse({'error': 'Question not in this quiz'}, status=400)
+
+    if buffering_enabled():
+        buffer_answers(attempt, submitted)
+        return JsonResponse({
+            'success': True,
+            'saved': len(submitted)
+        })
+
+    # bulk_create skips StudentAnswer.save(), so grade here
+    StudentAnswer.objects.bulk_create(
+        [
+            StudentAnswer(
+                attempt=attempt,
+                question_id=question_id,
+                selected_answer=selected_answer,
+                is_correct=(selected_answer == answer_key[question_id][0]),
+                time_taken=time_taken
+            )
+            for question_id, (selected_answer, time_taken) in submitted.items()
+        ],
+        update_conflicts=True,
+        unique_fields=['attempt', 'question'],
+        update_fields=['selected_answer', 'is_correct', 'time_taken']
+    )
+
+    return JsonResponse({
+        'success': True,
+        'saved': len(submitted)
+    })
+
+
 # ==============================
 # SUBMIT QUIZ
 # ==============================
 @login_required
+@serialize_writes
 def submit_quiz(request, attempt_id):
     attempt = get_object_or_404(
-        QuizAttempt,
+        QuizAttempt.objects.select_related('quiz'),
         id=attempt_id,
         student=request.user
     )
@@ -150,6 +271,9 @@ def submit_quiz(request, attempt_id):
     if attempt.status != 'in_progress':
         return redirect('quiz:quiz_result', attempt_id=attempt.id)
 
+    if buffering_enabled():
+        flush_attempt(attempt)
+
     attempt.end_time = timezone.now()
     attempt.time_taken = int(
         (attempt.end_time - attempt.start_time).total_seconds()
@@ -163,34 +287,141 @@ def submit_quiz(request, attempt_id):
 
 
 # ==============================
-# QUIZ RESULT ✅ FIXED
+# ASYNC ANSWER SAVING (ASGI)
+# ==============================
+# Same behaviour as submit_answer / submit_quiz. Under ASGI the request
+# waits on the event loop between queries instead of holding a worker
+# thread for its whole duration; under WSGI use the sync views.
+async def aget_student_attempt(request, attempt_id):
+    """The requesting student's attempt with its quiz, or 404"""
+    user = await request.auser()
+    try:
+        return await QuizAttempt.objects.select_related('quiz').aget(id=attempt_id, student_id=user.pk)
+    except QuizAttempt.DoesNotExist:
+        raise Http404('No QuizAttempt matches the given query.')
+
+
+@login_required
+@serialize_writes
+async def asubmit_answer(request, attempt_id):
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Invalid request'}, status=400)
+
+    attempt = await aget_student_attempt(request, attempt_id)
+
+    if attempt.status != 'in_progress':
+        return JsonResponse({'error': 'Quiz already completed'}, status=400)
+
+    try:
+        data = json.loads(request.body)
+        answer = clean_answer(data.get('answer'), data.get('time_taken', 0))
+    except (ValueError, AttributeError):
+        return JsonResponse({'error': 'Invalid payload'}, status=400)
+
+    if answer is None:
+        return JsonResponse({'error': 'Invalid answer'}, status=400)
+    selected_answer, time_taken = answer
+
+    try:
+        question_id = int(data.get('question_id'))
+    except (TypeError, ValueError):
+        raise Http404('Question not found')
+
+    answer_key = await aget_answer_key(attempt.quiz)
+    if question_id not in answer_key:
+        raise Http404('Question not found')
+
+    if buffering_enabled():
+        await sync_to_async(buffer_answers)(attempt, {question_id: (selected_answer, time_taken)})
+        return JsonResponse({
+            'success': True,
+            'is_correct': selected_answer == answer_key[question_id][0]
+        })
+
+    answer, _ = await StudentAnswer.objects.aupdate_or_create(
+        attempt=attempt,
+        question_id=question_id,
+        defaults={
+            'selected_answer': selected_answer,
+            'time_taken': time_taken
+        }
+    )
+
+    return JsonResponse({
+        'success': True,
+        'is_correct': answer.is_correct
+    })
+
+
+@login_required
+@serialize_writes
+async def asubmit_quiz(request, attempt_id):
+    attempt = await aget_student_attempt(request, attempt_id)
+
+    if attempt.status != 'in_progress':
+        return redirect('quiz:quiz_result', attempt_id=attempt.id)
+
+    if buffering_enabled():
+        await sync_to_async(flush_attempt)(attempt)
+
+    attempt.end_time = timezone.now()
+    attempt.time_taken = int(
+        (attempt.end_time - attempt.start_time).total_seconds()
+    )
+    attempt.status = 'completed'
+    # Grading saves the attempt and fires the completion signals; one hop
+    # to a worker thread instead of one per query
+    await sync_to_async(attempt.calculate_score)()
+
+    messages.success(request, 'Quiz submitted successfully!')
+    return redirect('quiz:quiz_result', attempt_id=attempt.id)
+
+
+# ==============================
+# QUIZ RESULT
 # ==============================
 @login_required
+@read_from_replica
 def quiz_result(request, attempt_id):
-    attempt = get_object_or_404(QuizAttempt, id=attempt_id)
+    attempt = get_object_or_404(
+        QuizAttempt.objects.select_related('quiz'),
+        id=attempt_id
+    )
 
-    if attempt.student != request.user and not request.user.is_staff:
+    if attempt.student_id != request.user.id and not request.user.is_staff:
         return redirect('quiz:quiz_list')
 
     if attempt.status != 'completed':
         return redirect('quiz:quiz_list')
 
-    # ✅ FIX: ORM queries in VIEW, not template
-    correct_count = attempt.answers.filter(is_correct=True).count()
-    incorrect_count = attempt.answers.filter(is_correct=False).count()
-
-    questions_with_answers = []
-    for question in attempt.quiz.questions.all():
-        answer = attempt.answers.filter(question=question).first()
-        questions_with_answers.append({
-            'question': question,
-            'answer': answer
+    result_html = cache.get(attempt.result_cache_key)
+
+    if result_html is None:
+        # One query for answers, one for questions, joined in memory
+        answers = {answer.question_id: answer for answer in attempt.answers.all()}
+        correct_count = sum(1 for answer in answers.values() if answer.is_correct)
+
+        questions_with_answers = [
+            {
+                'question': question,
+                'answer': answers.get(question.id)
+            }
+            for question in attempt.quiz.questions.all()
+        ]
+
+        result_html = render_to_string('quiz/result_body.html', {
+            'attempt': attempt,
+            'questions_with_answers': questions_with_answers,
+            'is_passed': attempt.is_passed,
+            'correct_count': correct_count,
+            'incorrect_count': len(answers) - correct_count
         })
+        cache.set(attempt.result_cache_key, result_html, RESULT_CACHE_TIMEOUT)
 
+    # Rankings move with every submit, so they stay out of the cached body
     return render(request, 'quiz/quiz_result.html', {
         'attempt': attempt,
-        'questions_with_answers': questions_with_answers,
-        'is_passed': attempt.is_passed,
-        'correct_count': correct_count,
-        'incorrect_count': incorrect_count
+        'result_html': result_html,
+        'standing': get_standing(attempt),
+        'leaders': top_attempts(attempt.quiz_id)
     })
@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+class QuizAppConfig(AppConfig):
+    name = 'quiz_app'
+    verbose_name = 'Project settings and infrastructure'
+
+    def ready(self):
+        import quiz_app.db  # Import to register the connection hooks
+        import quiz_app.instrumentation
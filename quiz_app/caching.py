@@ -0,0 +1,41 @@
+"""
+Cache helpers shared by the apps.
+"""
+import time
+
+from django.core.cache import cache
+
+# How long a rebuild may hold the lock, and how long other requests wait
+# for it before building the value themselves.
+LOCK_TIMEOUT = 10
+WAIT_INTERVAL = 0.05
+WAIT_ATTEMPTS = 40
+
+
+def get_or_build(key, build, timeout):
+    """Return the cached value for ``key``, building it at most once at a time.
+
+    On a miss only the request that wins the lock runs ``build``; concurrent
+    requests poll for its result instead of stampeding the database. If the
+    builder takes too long they fall back to building the value themselves.
+    """
+    value = cache.get(key)
+    if value is not None:
+        return value
+
+    lock_key = f'{key}:lock'
+    if cache.add(lock_key, 1, LOCK_TIMEOUT):
+        try:
+            value = build()
+            cache.set(key, value, timeout)
+        finally:
+            cache.delete(lock_key)
+        return value
+
+    for _ in range(WAIT_ATTEMPTS):
+        time.sleep(WAIT_INTERVAL)
+        value = cache.get(key)
+        if value is not None:
+            return value
+
+    return build()
@@ -0,0 +1,66 @@
+"""
+SQLite connection tuning and write serialization.
+
+``configure_sqlite`` runs on every new connection (``connection_created``)
+and applies ``settings.SQLITE_PRAGMAS``. ``serialize_writes`` is a view
+decorator that, when ``SQLITE_WRITE_LOCK`` is on, lets only one write view
+per process touch the database at a time, so concurrent writers in the same
+process queue on a lock instead of spinning on SQLite's busy timeout. Async
+views wait for the same lock in a worker thread, keeping the event loop free.
+"""
+import threading
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+_write_lock = threading.Lock()
+
+
+def _lock_timeout():
+    return getattr(settings, 'SQLITE_WRITE_LOCK_TIMEOUT', 20)
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', None)
+    if not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def serialize_writes(view):
+    """Run the view under the process-wide write lock when SQLITE_WRITE_LOCK is set"""
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            if not getattr(settings, 'SQLITE_WRITE_LOCK', False):
+                return await view(request, *args, **kwargs)
+            acquired = await sync_to_async(_write_lock.acquire, thread_sensitive=False)(
+                timeout=_lock_timeout()
+            )
+            try:
+                return await view(request, *args, **kwargs)
+            finally:
+                if acquired:
+                    _write_lock.release()
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not getattr(settings, 'SQLITE_WRITE_LOCK', False):
+            return view(request, *args, **kwargs)
+        # Past the timeout, fall through to SQLite's own busy handling
+        acquired = _write_lock.acquire(timeout=_lock_timeout())
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            if acquired:
+                _write_lock.release()
+    return wrapper
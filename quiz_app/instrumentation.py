@@ -0,0 +1,160 @@
+"""
+Per-request timing: SQL, template rendering and total view time.
+
+Every database connection gets an ``execute_wrapper`` when it opens that
+adds each query to the metrics of the request being handled, found through
+a context variable, so queries an async view runs in a worker thread are
+counted too. ``RequestTimingMiddleware`` and the ``TimedDjangoTemplates``
+backend add the numbers to a ``Server-Timing`` header and one JSON log line
+on the ``quiz_app.requests`` logger. Only a sample of requests is measured in
+detail (``REQUEST_TIMING_SAMPLE_RATE``); requests slower than
+``REQUEST_TIMING_SLOW_MS`` are always logged, as warnings.
+"""
+import json
+import logging
+import random
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.template.backends.django import DjangoTemplates, Template
+
+logger = logging.getLogger('quiz_app.requests')
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+        self._template_depth = 0
+
+    def record_query(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_seconds += time.perf_counter() - start
+            self.queries += 1
+
+
+def record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics.record_query(execute, sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_query_timer(sender, connection, **kwargs):
+    # execute_wrappers outlives close(), so a reconnect must not add it twice
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class TimedTemplate(Template):
+    """Template whose render() time is added to the current request's metrics"""
+
+    def render(self, context=None, request=None):
+        metrics = _current.get()
+        if metrics is None:
+            return super().render(context, request)
+
+        # Only the outermost render counts; nested renders are part of it
+        metrics._template_depth += 1
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics._template_depth -= 1
+            if metrics._template_depth == 0:
+                metrics.template_seconds += time.perf_counter() - start
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """The standard Django template backend, with render timing"""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return TimedTemplate(template.template, self)
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 2)
+
+
+class RequestTimingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'REQUEST_TIMING_SAMPLE_RATE', 0.01)
+        self.slow_ms = getattr(settings, 'REQUEST_TIMING_SLOW_MS', 500)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics, token, start = self.begin()
+        try:
+            response = self.get_response(request)
+        finally:
+            if token is not None:
+                _current.reset(token)
+        return self.finish(request, response, metrics, start)
+
+    async def __acall__(self, request):
+        metrics, token, start = self.begin()
+        try:
+            response = await self.get_response(request)
+        finally:
+            if token is not None:
+                _current.reset(token)
+        return self.finish(request, response, metrics, start)
+
+    def begin(self):
+        sampled = self.sample_rate > 0 and random.random() < self.sample_rate
+        metrics = RequestMetrics() if sampled else None
+        token = _current.set(metrics) if sampled else None
+        return metrics, token, time.perf_counter()
+
+    def finish(self, request, response, metrics, start):
+        total = time.perf_counter() - start
+        slow = total * 1000 >= self.slow_ms
+        if metrics is not None:
+            response['Server-Timing'] = ', '.join([
+                f'db;dur={_ms(metrics.db_seconds)};desc="{metrics.queries} queries"',
+                f'tpl;dur={_ms(metrics.template_seconds)}',
+                f'app;dur={_ms(max(total - metrics.db_seconds - metrics.template_seconds, 0))}',
+                f'total;dur={_ms(total)}',
+            ])
+        if metrics is not None or slow:
+            self.log(request, response, total, metrics, slow)
+        return response
+
+    def log(self, request, response, total, metrics, slow):
+        match = request.resolver_match
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'total_ms': _ms(total),
+        }
+        if metrics is not None:
+            record.update({
+                'queries': metrics.queries,
+                'db_ms': _ms(metrics.db_seconds),
+                'template_ms': _ms(metrics.template_seconds),
+            })
+        logger.log(logging.WARNING if slow else logging.INFO, json.dumps(record))
@@ -0,0 +1,43 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = 'Copy the primary SQLite database onto each replica listed in QUIZ_DB_REPLICAS'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, help='Keep running, syncing every INTERVAL seconds')
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('No replicas configured; set QUIZ_DB_REPLICAS')
+        if connections['default'].vendor != 'sqlite':
+            raise CommandError('Replica syncing only supports SQLite; use the database server\'s replication')
+
+        while True:
+            self.sync()
+            if options['interval'] is None:
+                break
+            time.sleep(options['interval'])
+
+    def sync(self):
+        primary_path = str(connections['default'].settings_dict['NAME'])
+        # The backup API copies a consistent snapshot even while the primary
+        # is being written, and updates the replica file in place so open
+        # reader connections see the new data on their next transaction.
+        primary = sqlite3.connect(primary_path)
+        try:
+            for alias in settings.DATABASE_REPLICAS:
+                replica = sqlite3.connect(str(connections[alias].settings_dict['NAME']))
+                try:
+                    start = time.perf_counter()
+                    primary.backup(replica)
+                finally:
+                    replica.close()
+                self.stdout.write(f'{alias}: synced in {(time.perf_counter() - start) * 1000:.0f} ms')
+        finally:
+            primary.close()
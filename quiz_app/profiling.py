@@ -0,0 +1,104 @@
+"""
+On-demand profiling of live requests.
+
+When ``PROFILING_ENABLED`` is set, ``RequestProfilerMiddleware`` profiles a
+random ``PROFILING_SAMPLE_RATE`` fraction of requests, plus any request from
+a staff user that sends the ``X-Profile: 1`` header. Each profiled request
+writes two files to ``PROFILING_DIR``, named ``<url name>-<timestamp>``:
+
+* ``.prof`` - cProfile stats, for ``python -m pstats`` or snakeviz
+* ``.collapsed`` - stacks sampled every ``PROFILING_INTERVAL_MS`` in the
+  collapsed format read by flamegraph.pl and speedscope
+"""
+import cProfile
+import os
+import random
+import sys
+import threading
+from collections import Counter
+from datetime import datetime
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+HEADER = 'HTTP_X_PROFILE'
+
+
+class StackSampler:
+    """Background thread recording the stack of one thread at a fixed interval.
+
+    Stacks are cut at ``root`` so they start at the profiling middleware
+    rather than at the server's request loop.
+    """
+
+    def __init__(self, thread_id, root, interval):
+        self.thread_id = thread_id
+        self.root = root
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-stack-sampler', daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None and frame is not self.root:
+                code = frame.f_code
+                stack.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+class RequestProfilerMiddleware:
+    def __init__(self, get_response):
+        if not getattr(settings, 'PROFILING_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'PROFILING_SAMPLE_RATE', 0.0)
+        self.interval = getattr(settings, 'PROFILING_INTERVAL_MS', 1) / 1000
+        self.directory = str(settings.PROFILING_DIR)
+        os.makedirs(self.directory, exist_ok=True)
+
+    def wants_profile(self, request):
+        if request.META.get(HEADER) == '1' and request.user.is_staff:
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def __call__(self, request):
+        if not self.wants_profile(request):
+            return self.get_response(request)
+
+        profiler = cProfile.Profile()
+        with StackSampler(threading.get_ident(), sys._getframe(), self.interval) as sampler:
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+
+        match = request.resolver_match
+        name = (match.view_name if match else 'unresolved').replace(':', '.')
+        stem = f"{name}-{datetime.now().strftime('%Y%m%dT%H%M%S%f')}"
+        path = os.path.join(self.directory, stem)
+
+        profiler.dump_stats(f'{path}.prof')
+        with open(f'{path}.collapsed', 'w') as collapsed:
+            collapsed.write(sampler.collapsed())
+
+        if request.user.is_staff:
+            response['X-Profile-Id'] = stem
+        return response
@@ -0,0 +1,119 @@
+"""
+Read-replica routing.
+
+Reads go to a replica only inside views decorated with ``read_from_replica``;
+everything else, and every write, uses ``default``. A session that wrote
+within the last ``STICKY_PRIMARY_SECONDS`` keeps reading from ``default``,
+so a student who has just submitted sees their own result and progress
+rather than a replica that has not caught up yet.
+"""
+import random
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+STICKY_SESSION_KEY = '_primary_until'
+
+_use_replica = ContextVar('use_replica', default=False)
+_wrote = ContextVar('wrote_to_primary', default=None)
+
+
+def _replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = _replicas()
+        if replicas and _use_replica.get():
+            return random.choice(replicas)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        writes = _wrote.get()
+        if writes is not None:
+            writes.append(model._meta.label)
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas are copies of default, so any two objects may be related
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
+
+
+def _on_replica(iterator):
+    """Pull each chunk of a streaming response with replica reads enabled"""
+    iterator = iter(iterator)
+    while True:
+        token = _use_replica.set(True)
+        try:
+            chunk = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            _use_replica.reset(token)
+        yield chunk
+
+
+def read_from_replica(view):
+    """Serve the view's reads from a replica unless the session wrote recently"""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not _replicas() or request.session.get(STICKY_SESSION_KEY, 0) > time.time():
+            return view(request, *args, **kwargs)
+
+        token = _use_replica.set(True)
+        try:
+            response = view(request, *args, **kwargs)
+        finally:
+            _use_replica.reset(token)
+
+        if response.streaming:
+            response.streaming_content = _on_replica(response.streaming_content)
+        return response
+    return wrapper
+
+
+class StickyPrimaryMiddleware:
+    """Pin a session to the primary for a while after any request that wrote"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not _replicas():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        writes = []
+        token = _wrote.set(writes)
+        try:
+            response = self.get_response(request)
+        finally:
+            _wrote.reset(token)
+
+        if writes and hasattr(request, 'session'):
+            request.session[STICKY_SESSION_KEY] = time.time() + settings.STICKY_PRIMARY_SECONDS
+        return response
+
+    async def __acall__(self, request):
+        writes = []
+        token = _wrote.set(writes)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _wrote.reset(token)
+
+        if writes and hasattr(request, 'session'):
+            await request.session.aset(STICKY_SESSION_KEY, time.time() + settings.STICKY_PRIMARY_SECONDS)
+        return response
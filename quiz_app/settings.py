@@ -4,6 +4,7 @@ Django settings for quiz_app project.
 
 from pathlib import Path
 import os
+import sys
 
 # --------------------------------------------------
 # BASE DIRECTORY
@@ -34,6 +35,7 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
 
     # Custom apps
+    'quiz_app',
     'accounts',
     'quiz',
     'progress',
@@ -46,10 +48,14 @@ INSTALLED_APPS = [
 # --------------------------------------------------
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'quiz_app.instrumentation.RequestTimingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'accounts.middleware.UserRoleMiddleware',
+    'quiz_app.routers.StickyPrimaryMiddleware',
+    'quiz_app.profiling.RequestProfilerMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -66,7 +72,8 @@ ROOT_URLCONF = 'quiz_app.urls'
 # --------------------------------------------------
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates plus render timing for RequestTimingMiddleware
+        'BACKEND': 'quiz_app.instrumentation.TimedDjangoTemplates',
 
         # Global templates folder
         'DIRS': [BASE_DIR / 'templates'],
@@ -101,6 +108,147 @@ DATABASES = {
     }
 }
 
+# QUIZ_DB_PROFILE=production tunes SQLite for concurrent exam traffic:
+# WAL journaling and the pragmas below on every connection (see
+# quiz_app/db.py), persistent connections, a 20s busy timeout, and
+# BEGIN IMMEDIATE so a transaction takes the write lock up front instead of
+# failing with "database is locked" when it first writes.
+DATABASE_PROFILE = os.environ.get('QUIZ_DB_PROFILE', 'default')
+SQLITE_PRAGMAS = {}
+
+if DATABASE_PROFILE == 'production':
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'timeout': 20,
+            'transaction_mode': 'IMMEDIATE',
+        },
+    })
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -65536,       # in KiB: 64 MiB page cache
+        'mmap_size': 268435456,     # 256 MiB
+        'temp_store': 'MEMORY',
+    }
+
+# Read replicas: QUIZ_DB_REPLICAS is a comma-separated list of SQLite files
+# kept in sync with `python manage.py sync_sqlite_replicas`. Views decorated
+# with quiz_app.routers.read_from_replica read from them; a session that
+# wrote in the last STICKY_PRIMARY_SECONDS keeps reading from the primary.
+DATABASE_REPLICAS = []
+for number, replica_path in enumerate(filter(None, os.environ.get('QUIZ_DB_REPLICAS', '').split(',')), 1):
+    alias = f'replica{number}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'NAME': replica_path.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['quiz_app.routers.ReplicaRouter']
+STICKY_PRIMARY_SECONDS = 10
+
+# Serialize the answer/submit views inside each process with a lock
+# (quiz_app.db.serialize_writes), so threads queue instead of contending
+# for SQLite's write lock. Only useful with threaded workers.
+SQLITE_WRITE_LOCK = os.environ.get('SQLITE_WRITE_LOCK') == '1'
+SQLITE_WRITE_LOCK_TIMEOUT = 20
+
+
+# --------------------------------------------------
+# CACHE
+# --------------------------------------------------
+# Per-process memory cache, fine for a single process. Point this at
+# Redis/Memcached when running several workers or the queue-mode progress
+# worker: dashboard snapshots are invalidated through the cache, so a
+# per-process cache leaves other processes serving stale ones.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'quiz-app',
+    }
+}
+
+
+# --------------------------------------------------
+# PAGINATION
+# --------------------------------------------------
+# Default and maximum rows per page for cursor-paginated lists;
+# clients may pass ?page_size= up to the maximum.
+PAGINATION_PAGE_SIZE = 20
+PAGINATION_MAX_PAGE_SIZE = 100
+
+
+# --------------------------------------------------
+# PROGRESS TRACKING
+# --------------------------------------------------
+# 'inline' applies progress while the request is handled.
+# 'queue' only records a job; run `python manage.py process_progress_jobs`
+# to drain it in the background.
+PROGRESS_UPDATE_MODE = os.environ.get('PROGRESS_UPDATE_MODE', 'inline')
+
+
+# --------------------------------------------------
+# ANSWER WRITES
+# --------------------------------------------------
+# 'direct' saves every answer to StudentAnswer as it arrives.
+# 'buffer' keeps the answers of in-progress attempts in a per-attempt
+# journal under ANSWER_BUFFER_DIR, writing them in one batch at submit, once
+# the oldest is ANSWER_BUFFER_FLUSH_SECONDS old, or on
+# `python manage.py flush_answer_buffers` (run it periodically).
+ANSWER_WRITE_MODE = os.environ.get('ANSWER_WRITE_MODE', 'direct')
+ANSWER_BUFFER_DIR = os.environ.get('ANSWER_BUFFER_DIR', BASE_DIR / 'answer_buffer')
+ANSWER_BUFFER_FLUSH_SECONDS = int(os.environ.get('ANSWER_BUFFER_FLUSH_SECONDS', 600))
+
+
+# --------------------------------------------------
+# REQUEST TIMING
+# --------------------------------------------------
+# Fraction of requests measured in detail (SQL, templates, Server-Timing
+# header and a log line); set it to 1 to measure every request while
+# developing. Requests slower than REQUEST_TIMING_SLOW_MS are always
+# logged, as warnings.
+REQUEST_TIMING_SAMPLE_RATE = float(os.environ.get('REQUEST_TIMING_SAMPLE_RATE', '0.01'))
+REQUEST_TIMING_SLOW_MS = int(os.environ.get('REQUEST_TIMING_SLOW_MS', '500'))
+
+
+# --------------------------------------------------
+# PROFILING
+# --------------------------------------------------
+# Off unless PROFILING_ENABLED=1. When on, a PROFILING_SAMPLE_RATE fraction
+# of requests, and staff requests sent with the header "X-Profile: 1", write
+# a cProfile .prof file and a sampled .collapsed stack file to PROFILING_DIR.
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED') == '1'
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', '0'))
+PROFILING_INTERVAL_MS = float(os.environ.get('PROFILING_INTERVAL_MS', '1'))
+PROFILING_DIR = os.environ.get('PROFILING_DIR', BASE_DIR / 'profiles')
+
+
+# --------------------------------------------------
+# LOGGING
+# --------------------------------------------------
+# `manage.py test` keeps the per-request timing lines out of its output
+RUNNING_TESTS = len(sys.argv) > 1 and sys.argv[1] == 'test'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'quiz_app.requests': {
+            'handlers': ['console'],
+            'level': os.environ.get('REQUEST_TIMING_LOG_LEVEL', 'WARNING' if RUNNING_TESTS else 'INFO'),
+            'propagate': False,
+        },
+    },
+}
+
 
 # --------------------------------------------------
 # PASSWORD VALIDATION
@@ -151,12 +299,31 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
 
+# --------------------------------------------------
+# REQUEST LIMITS
+# --------------------------------------------------
+# The inline question editor posts 7 fields per question, so allow
+# quizzes of a few hundred questions to be saved in one form.
+DATA_UPLOAD_MAX_NUMBER_FIELDS = 5000
+
+
 # --------------------------------------------------
 # DEFAULT PRIMARY KEY FIELD
 # --------------------------------------------------
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
+# --------------------------------------------------
+# AUTHENTICATION BACKENDS
+# --------------------------------------------------
+# Users are loaded with their student/trainer profile in one query. It is
+# the only backend, so a failed login hashes the password once; sessions
+# recorded against ModelBackend before the switch sign in again.
+AUTHENTICATION_BACKENDS = [
+    'accounts.backends.ProfileModelBackend',
+]
+
+
 # --------------------------------------------------
 # AUTHENTICATION REDIRECTS
 # --------------------------------------------------
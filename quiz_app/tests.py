@@ -0,0 +1,178 @@
+import json
+import os
+import pstats
+import re
+import shutil
+import tempfile
+import threading
+import time
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import router
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from quiz.models import Quiz
+from . import db
+from .routers import STICKY_SESSION_KEY, StickyPrimaryMiddleware, read_from_replica
+
+
+def routed(request):
+    """Report where a Quiz read and a Quiz write would go"""
+    return HttpResponse(f'{router.db_for_read(Quiz)} {router.db_for_write(Quiz)}')
+
+
+def read_only(request):
+    return HttpResponse(router.db_for_read(Quiz))
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'], STICKY_PRIMARY_SECONDS=10)
+class ReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.request = RequestFactory().get('/')
+        self.request.session = {}
+
+    def test_only_reads_in_decorated_views_use_replica(self):
+        self.assertEqual(routed(self.request).content, b'default default')
+        self.assertEqual(read_from_replica(routed)(self.request).content, b'replica1 default')
+        self.assertEqual(Quiz.objects.all().db, 'default')
+
+    def test_streamed_chunks_read_from_replica(self):
+        def stream(request):
+            return StreamingHttpResponse(router.db_for_read(Quiz) for _ in range(2))
+
+        response = read_from_replica(stream)(self.request)
+        self.assertEqual(b''.join(response.streaming_content), b'replica1replica1')
+
+    def test_session_that_wrote_stays_on_primary(self):
+        StickyPrimaryMiddleware(routed)(self.request)
+        self.assertGreater(self.request.session[STICKY_SESSION_KEY], time.time())
+        self.assertEqual(read_from_replica(routed)(self.request).content, b'default default')
+
+        self.request.session[STICKY_SESSION_KEY] = time.time() - 1
+        self.assertEqual(read_from_replica(routed)(self.request).content, b'replica1 default')
+
+    def test_read_only_request_is_not_pinned(self):
+        StickyPrimaryMiddleware(read_from_replica(read_only))(self.request)
+        self.assertNotIn(STICKY_SESSION_KEY, self.request.session)
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas_everything_uses_primary(self):
+        self.assertEqual(read_from_replica(routed)(self.request).content, b'default default')
+        with self.assertRaises(MiddlewareNotUsed):
+            StickyPrimaryMiddleware(routed)
+
+
+class RequestTimingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.create_user('student', password='pass')
+
+    def setUp(self):
+        self.client.login(username='student', password='pass')
+
+    @override_settings(REQUEST_TIMING_SAMPLE_RATE=1.0)
+    def test_sampled_request_gets_server_timing(self):
+        with self.assertLogs('quiz_app.requests', 'INFO') as logs:
+            response = self.client.get(reverse('quiz:quiz_list'))
+        timing = response['Server-Timing']
+        queries = int(re.search(r'db;dur=[\d.]+;desc="(\d+) queries"', timing).group(1))
+        self.assertGreater(queries, 0)
+        for metric in ('tpl', 'app', 'total'):
+            self.assertRegex(timing, rf'\b{metric};dur=[\d.]+')
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual((record['view'], record['status'], record['queries']), ('quiz:quiz_list', 200, queries))
+
+    @override_settings(REQUEST_TIMING_SAMPLE_RATE=0)
+    def test_unsampled_request_is_left_alone(self):
+        self.assertNotIn('Server-Timing', self.client.get(reverse('quiz:quiz_list')))
+
+
+class RequestProfilerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.create_user('student', password='pass')
+        User.objects.create_user('trainer', password='pass', is_staff=True)
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        profiling = override_settings(PROFILING_ENABLED=True, PROFILING_SAMPLE_RATE=0, PROFILING_DIR=self.directory)
+        profiling.enable()
+        self.addCleanup(profiling.disable)
+
+    def get(self, username, **headers):
+        self.client.login(username=username, password='pass')
+        return self.client.get(reverse('quiz:quiz_list'), headers=headers)
+
+    def test_header_is_ignored_for_students(self):
+        response = self.get('student', x_profile='1')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_staff_request_is_profiled_on_demand(self):
+        self.assertNotIn('X-Profile-Id', self.get('trainer'))
+        self.assertEqual(os.listdir(self.directory), [])
+
+        response = self.get('trainer', x_profile='1')
+        stem = response['X-Profile-Id']
+        self.assertTrue(stem.startswith('quiz.quiz_list-'))
+        self.assertEqual(sorted(os.listdir(self.directory)), [f'{stem}.collapsed', f'{stem}.prof'])
+        stats = pstats.Stats(os.path.join(self.directory, f'{stem}.prof'))
+        self.assertTrue(any(name == 'quiz_list' for _, _, name in stats.stats))
+
+
+class SerializeWritesTests(SimpleTestCase):
+    def setUp(self):
+        self.active = 0
+        self.peak = 0
+        self.counter = threading.Lock()
+
+    def view(self, request):
+        with self.counter:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.02)
+        with self.counter:
+            self.active -= 1
+        return HttpResponse()
+
+    def run_threads(self, target, count=4):
+        threads = [threading.Thread(target=target, args=(None,)) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    @override_settings(SQLITE_WRITE_LOCK=True)
+    def test_sync_views_run_one_at_a_time(self):
+        self.run_threads(db.serialize_writes(self.view))
+        self.assertEqual(self.peak, 1)
+
+    @override_settings(SQLITE_WRITE_LOCK=True)
+    def test_async_views_run_one_at_a_time(self):
+        async def view(request):
+            return self.view(request)
+
+        wrapped = db.serialize_writes(view)
+        self.run_threads(lambda request: async_to_sync(wrapped)(request))
+        self.assertEqual(self.peak, 1)
+
+    @override_settings(SQLITE_WRITE_LOCK=False)
+    def test_views_overlap_without_lock(self):
+        self.run_threads(db.serialize_writes(self.view))
+        self.assertGreater(self.peak, 1)
+
+    @override_settings(SQLITE_WRITE_LOCK=True, SQLITE_WRITE_LOCK_TIMEOUT=0.01)
+    def test_view_runs_after_lock_timeout(self):
+        db._write_lock.acquire()
+        try:
+            self.assertEqual(db.serialize_writes(self.view)(None).status_code, 200)
+        finally:
+            db._write_lock.release()
+        self.assertFalse(db._write_lock.locked())
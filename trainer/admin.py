@@ -1,3 +1,16 @@
 from django.contrib import admin
+from .models import ItemAnalysis, TrainerStats
 
-# Register your models here.
+
+@admin.register(TrainerStats)
+class TrainerStatsAdmin(admin.ModelAdmin):
+    list_display = ['trainer', 'total_students', 'active_students', 'total_quizzes', 'total_attempts', 'updated_at']
+    search_fields = ['trainer__username']
+    readonly_fields = ['recent_attempts']
+
+
+@admin.register(ItemAnalysis)
+class ItemAnalysisAdmin(admin.ModelAdmin):
+    list_display = ['quiz', 'attempts', 'content_version', 'updated_at']
+    search_fields = ['quiz__title']
+    readonly_fields = ['sums']
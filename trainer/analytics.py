@@ -0,0 +1,228 @@
+"""
+Item analysis: how hard each question of a quiz is and how well it
+separates students who know the material from those who do not.
+
+For every question, over the quiz's completed attempts:
+
+* the p-value, the share of attempts that got the question right,
+* the point-biserial discrimination, the correlation between getting the
+  question right and the score on the rest of the quiz,
+* how often each option A-D was picked, and how often none was,
+* the mean ``time_taken`` of the attempts that answered it.
+
+A batch of attempts is loaded as an attempts x questions matrix in NumPy
+and reduced, in vectorized passes, to running sums stored on
+``ItemAnalysis``; every statistic above is derived from those sums.
+Completing an attempt queues it in ``PendingItemAttempt`` and the next
+refresh folds only the queued attempts in. Editing the questions bumps
+``Quiz.content_version`` and deleting a completed attempt resets the
+stored version, so either makes the next refresh rebuild from scratch.
+"""
+import numpy as np
+from django.db import connections, transaction
+from django.db.models import Case, F, IntegerField, Value, When
+
+from quiz.models import Question, Quiz, QuizAttempt, StudentAnswer
+from .models import ItemAnalysis, PendingItemAttempt
+
+OPTIONS = ('A', 'B', 'C', 'D')
+# Queued attempts folded in per query, which keeps the IN clause bounded
+REFRESH_BATCH_SIZE = 5000
+
+TOO_EASY = 0.9
+TOO_HARD = 0.2
+WEAK_DISCRIMINATION = 0.2
+
+_OPTION_CODE = Case(
+    *[When(selected_answer=option, then=Value(code)) for code, option in enumerate(OPTIONS)],
+    default=Value(-1),
+    output_field=IntegerField()
+)
+
+
+def _answer_key(quiz):
+    """Question ids in ascending order with their correct option codes and marks"""
+    rows = list(quiz.questions.order_by('id').values_list('id', 'correct_answer', 'marks'))
+    question_ids = np.array([row[0] for row in rows], dtype=np.int64)
+    correct = np.array([OPTIONS.index(row[1]) if row[1] in OPTIONS else -1 for row in rows], dtype=np.int64)
+    marks = np.array([row[2] for row in rows], dtype=np.float64)
+    return question_ids, correct, marks
+
+
+def _empty_sums(k):
+    return {
+        'attempts': 0,
+        'score_sum': 0.0,
+        'score_sq_sum': 0.0,
+        'correct': np.zeros(k),
+        'correct_score': np.zeros(k),
+        'answered': np.zeros(k),
+        'time_sum': np.zeros(k),
+        'options': np.zeros((k, len(OPTIONS))),
+    }
+
+
+def batch_sums(answer_key, attempts):
+    """Reduce the answers of the ``attempts`` queryset to the running sums.
+
+    Answers are graded against ``answer_key`` rather than the stored
+    ``is_correct`` flags, so the sums always match the current questions.
+    """
+    question_ids, correct_codes, marks = answer_key
+    k = len(question_ids)
+    attempt_ids = np.sort(np.fromiter(attempts.values_list('id', flat=True), dtype=np.int64))
+    sums = _empty_sums(k)
+    sums['attempts'] = n = len(attempt_ids)
+    if not n or not k:
+        return sums
+
+    rows = StudentAnswer.objects.filter(
+        attempt__in=attempts, question_id__in=question_ids.tolist()
+    ).order_by().values_list('attempt_id', 'question_id', _OPTION_CODE, 'time_taken')
+    # A plain cursor skips the ORM's per-row conversion, which at this size
+    # costs more than the query itself
+    sql, params = rows.query.sql_with_params()
+    with connections[rows.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        answers = np.array(cursor.fetchall(), dtype=np.int64).reshape(-1, 4)
+    attempt_index = np.searchsorted(attempt_ids, answers[:, 0])
+    question_index = np.searchsorted(question_ids, answers[:, 1])
+    choice, time_taken = answers[:, 2], answers[:, 3]
+
+    correct = np.zeros((n, k), dtype=bool)
+    correct[attempt_index, question_index] = choice == correct_codes[question_index]
+    scores = correct @ marks
+
+    picked = choice >= 0
+    sums.update({
+        'score_sum': float(scores.sum()),
+        'score_sq_sum': float(scores @ scores),
+        'correct': correct.sum(axis=0, dtype=np.float64),
+        'correct_score': scores @ correct,
+        'answered': np.bincount(question_index, minlength=k).astype(np.float64),
+        'time_sum': np.bincount(question_index, weights=time_taken, minlength=k),
+        'options': np.bincount(
+            question_index[picked] * len(OPTIONS) + choice[picked], minlength=k * len(OPTIONS)
+        ).reshape(k, len(OPTIONS)).astype(np.float64),
+    })
+    return sums
+
+
+def _load(analysis, k):
+    sums = _empty_sums(k)
+    sums.update(attempts=analysis.attempts, score_sum=analysis.score_sum, score_sq_sum=analysis.score_sq_sum)
+    for name, values in analysis.sums.items():
+        if name != 'question_ids':
+            sums[name] = np.array(values, dtype=np.float64).reshape(sums[name].shape)
+    return sums
+
+
+def _store(analysis, question_ids, sums):
+    analysis.attempts = sums['attempts']
+    analysis.score_sum = sums['score_sum']
+    analysis.score_sq_sum = sums['score_sq_sum']
+    analysis.sums = {'question_ids': question_ids.tolist()}
+    analysis.sums.update({
+        name: value.tolist() for name, value in sums.items() if isinstance(value, np.ndarray)
+    })
+    analysis.save()
+    return analysis
+
+
+def refresh_item_analysis(quiz, rebuild=False):
+    """Fold the quiz's queued attempts into its analysis, rebuilding when stale; returns it"""
+    if not rebuild:
+        # Nothing to fold: answer the page without opening a write transaction
+        current = ItemAnalysis.objects.filter(quiz=quiz, content_version=F('quiz__content_version')).first()
+        if current is not None and not PendingItemAttempt.objects.filter(quiz=quiz).exists():
+            return current
+
+    with transaction.atomic():
+        queue = PendingItemAttempt.objects.filter(quiz=quiz)
+        # Row lock, so concurrent refreshes of a quiz cannot fold the same
+        # queued attempts twice. SQLite ignores it; there the production
+        # profile's BEGIN IMMEDIATE serializes the whole transaction instead.
+        analysis = ItemAnalysis.objects.select_for_update().filter(quiz=quiz).first()
+        version = Quiz.objects.filter(pk=quiz.pk).values_list('content_version', flat=True).get()
+        answer_key = _answer_key(quiz)
+        # Only attempts already announced by attempt_completed: in queue mode
+        # the rest are queued later, and counting them now would count twice
+        completed = QuizAttempt.objects.filter(quiz=quiz, status='completed', progress_entry__isnull=False)
+
+        if rebuild or analysis is None or analysis.content_version != version:
+            queue.delete()
+            analysis = analysis or ItemAnalysis(quiz=quiz)
+            analysis.content_version = version
+            return _store(analysis, answer_key[0], batch_sums(answer_key, completed))
+
+        sums = _load(analysis, len(answer_key[0]))
+        folded = False
+        while True:
+            attempt_ids = list(queue.values_list('attempt_id', flat=True)[:REFRESH_BATCH_SIZE])
+            if not attempt_ids:
+                break
+            folded = True
+            PendingItemAttempt.objects.filter(attempt_id__in=attempt_ids).delete()
+            batch = batch_sums(answer_key, completed.filter(id__in=attempt_ids))
+            for name, value in batch.items():
+                sums[name] = sums[name] + value
+        if not folded:
+            # Another refresh drained the queue first
+            return analysis
+        return _store(analysis, answer_key[0], sums)
+
+
+def item_statistics(analysis):
+    """``{question_id: statistics}`` derived from the stored sums"""
+    question_ids = analysis.sums.get('question_ids', [])
+    k = len(question_ids)
+    n = analysis.attempts
+    if not k or not n:
+        return {}
+    sums = _load(analysis, k)
+    marks = dict(Question.objects.filter(id__in=question_ids).values_list('id', 'marks'))
+    m = np.array([marks.get(question_id, 0) for question_id in question_ids], dtype=np.float64)
+
+    # Moments of x (right or wrong) and y, the score without this question
+    x = sums['correct']
+    xs = sums['correct_score']
+    y = sums['score_sum'] - m * x
+    yy = sums['score_sq_sum'] - 2 * m * xs + m * m * x
+    xy = xs - m * x
+    spread = (n * x - x * x) * (n * yy - y * y)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        discrimination = np.where(spread > 0, (n * xy - x * y) / np.sqrt(spread), np.nan)
+        mean_time = np.where(sums['answered'] > 0, sums['time_sum'] / sums['answered'], np.nan)
+    p_value = x / n
+    option_rates = sums['options'] / n
+    skipped = 1 - sums['answered'] / n
+
+    return {
+        question_id: {
+            'p_value': float(p_value[j]),
+            'discrimination': None if np.isnan(discrimination[j]) else float(discrimination[j]),
+            'option_rates': dict(zip(OPTIONS, option_rates[j].tolist())),
+            'skipped_rate': float(skipped[j]),
+            'mean_time': None if np.isnan(mean_time[j]) else float(mean_time[j]),
+        }
+        for j, question_id in enumerate(question_ids)
+    }
+
+
+def flags(statistics, correct_answer):
+    """Short labels for questions a trainer should look at"""
+    labels = []
+    if statistics['p_value'] >= TOO_EASY:
+        labels.append('Too easy')
+    elif statistics['p_value'] <= TOO_HARD:
+        labels.append('Too hard')
+    discrimination = statistics['discrimination']
+    rates = statistics['option_rates']
+    key_rate = rates.get(correct_answer, 0)
+    if (discrimination is not None and discrimination < 0) or any(
+        rate > key_rate for option, rate in rates.items() if option != correct_answer
+    ):
+        labels.append('Misleading')
+    elif discrimination is not None and discrimination < WEAK_DISCRIMINATION:
+        labels.append('Weak discrimination')
+    return labels
@@ -0,0 +1,110 @@
+"""
+Streaming exports of attempt and per-answer data for a trainer's quizzes.
+
+Rows are read with ``.iterator(chunk_size=...)`` and encoded one at a time,
+so memory stays flat however many rows there are, and the header goes out
+before the first query runs.
+"""
+import csv
+import json
+
+from quiz.models import QuizAttempt, StudentAnswer
+
+EXPORT_CHUNK_SIZE = 2000
+KINDS = ('attempts', 'answers')
+FORMATS = ('csv', 'ndjson')
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+ATTEMPT_COLUMNS = [
+    'attempt_id', 'quiz_id', 'quiz_title', 'student_id', 'student_username',
+    'status', 'score', 'total_marks', 'percentage', 'start_time', 'end_time',
+    'time_taken',
+]
+ANSWER_COLUMNS = [
+    'answer_id', 'attempt_id', 'quiz_id', 'quiz_title', 'student_id',
+    'student_username', 'question_id', 'question_order', 'selected_answer',
+    'correct_answer', 'is_correct', 'marks', 'time_taken', 'answered_at',
+]
+
+
+class Echo:
+    """File-like object whose write() hands the line back to the csv writer's caller"""
+
+    def write(self, value):
+        return value
+
+
+def _timestamp(value):
+    return value.isoformat() if value else None
+
+
+def attempt_rows(trainer, quiz_id=None):
+    attempts = QuizAttempt.objects.filter(quiz__created_by=trainer)
+    if quiz_id is not None:
+        attempts = attempts.filter(quiz_id=quiz_id)
+    attempts = attempts.select_related('student', 'quiz').only(
+        'status', 'score', 'total_marks', 'percentage', 'start_time', 'end_time', 'time_taken',
+        'student__username', 'quiz__title',
+    ).order_by('id')
+
+    for attempt in attempts.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield [
+            attempt.id, attempt.quiz_id, attempt.quiz.title, attempt.student_id,
+            attempt.student.username, attempt.status, attempt.score, attempt.total_marks,
+            round(attempt.percentage, 2), _timestamp(attempt.start_time),
+            _timestamp(attempt.end_time), attempt.time_taken,
+        ]
+
+
+def answer_rows(trainer, quiz_id=None):
+    answers = StudentAnswer.objects.filter(attempt__quiz__created_by=trainer)
+    if quiz_id is not None:
+        answers = answers.filter(attempt__quiz_id=quiz_id)
+    # Student and quiz hang off the attempt
+    answers = answers.select_related('attempt__student', 'attempt__quiz', 'question').only(
+        'selected_answer', 'is_correct', 'time_taken', 'answered_at',
+        'attempt__student__username', 'attempt__quiz__title',
+        'question__order', 'question__correct_answer', 'question__marks',
+    ).order_by('id')
+
+    for answer in answers.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        attempt = answer.attempt
+        yield [
+            answer.id, answer.attempt_id, attempt.quiz_id, attempt.quiz.title,
+            attempt.student_id, attempt.student.username, answer.question_id,
+            answer.question.order, answer.selected_answer, answer.question.correct_answer,
+            answer.is_correct, answer.question.marks, answer.time_taken,
+            _timestamp(answer.answered_at),
+        ]
+
+
+def _csv_lines(columns, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def _ndjson_lines(columns, rows):
+    for row in rows:
+        yield json.dumps(dict(zip(columns, row))) + '\n'
+
+
+def stream_export(trainer, kind, fmt, quiz_id=None):
+    """Return a generator of encoded lines for the requested export"""
+    if kind not in KINDS:
+        raise ValueError(f'Unsupported export: {kind}')
+    if fmt not in FORMATS:
+        raise ValueError(f'Unsupported format: {fmt}')
+
+    if kind == 'attempts':
+        columns, rows = ATTEMPT_COLUMNS, attempt_rows(trainer, quiz_id)
+    else:
+        columns, rows = ANSWER_COLUMNS, answer_rows(trainer, quiz_id)
+
+    if fmt == 'csv':
+        return _csv_lines(columns, rows)
+    return _ndjson_lines(columns, rows)
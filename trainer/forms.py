@@ -27,4 +27,14 @@ class QuestionForm(forms.ModelForm):
             'marks': forms.NumberInput(attrs={'class': 'form-control', 'min': 1}),
             'time_limit': forms.NumberInput(attrs={'class': 'form-control', 'min': 10, 'placeholder': 'Seconds'}),
             'explanation': forms.Textarea(attrs={'class': 'form-control', 'rows': 2, 'placeholder': 'Optional explanation'}),
-        }
\ No newline at end of file
+        }
+
+class QuestionImportForm(forms.Form):
+    FORMAT_CHOICES = [
+        ('auto', 'Detect from file name'),
+        ('csv', 'CSV'),
+        ('json', 'JSON / JSON lines'),
+    ]
+
+    file = forms.FileField(widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv,.json,.jsonl'}))
+    format = forms.ChoiceField(choices=FORMAT_CHOICES, initial='auto', widget=forms.Select(attrs={'class': 'form-control'}))
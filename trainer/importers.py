@@ -0,0 +1,166 @@
+"""
+Streaming bulk import of questions from CSV or JSON files.
+
+Rows are parsed one at a time, validated with ``QuestionForm`` and inserted
+with chunked ``bulk_create`` inside a single transaction, so memory stays
+bounded by the chunk size whatever the file size. Any invalid row rolls
+the whole import back and is reported with its row number.
+"""
+import csv
+import io
+import json
+
+from django.db import transaction
+from django.db.models import Max
+
+from quiz.models import Question, refresh_quiz_totals
+from .forms import QuestionForm
+
+CHUNK_SIZE = 500
+READ_SIZE = 64 * 1024
+# Longest single JSON value accepted; a longer one is reported as malformed
+MAX_VALUE_SIZE = 1024 * 1024
+MAX_REPORTED_ERRORS = 100
+FORMATS = ('csv', 'json')
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.error_count = 0
+        self.errors = []
+
+    @property
+    def ok(self):
+        return self.error_count == 0
+
+    def add_error(self, row_number, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((row_number, message))
+
+
+class _Rollback(Exception):
+    pass
+
+
+def detect_format(filename):
+    return 'csv' if filename.lower().endswith('.csv') else 'json'
+
+
+def iter_csv_rows(text_file):
+    """Yield (row number, dict) pairs; the header is row 1"""
+    yield from enumerate(csv.DictReader(text_file), start=2)
+
+
+def iter_json_rows(text_file):
+    """Yield (row number, value) for a JSON array or JSON-lines file without loading it whole"""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    eof = False
+    in_array = None
+    row_number = 0
+
+    while True:
+        # Skip whitespace and array punctuation between values
+        while pos < len(buffer) and (buffer[pos].isspace() or buffer[pos] in ',]' or
+                                     (buffer[pos] == '[' and in_array is None)):
+            if buffer[pos] == '[':
+                in_array = True
+            pos += 1
+
+        if pos < len(buffer) and in_array is None:
+            in_array = False
+
+        if pos < len(buffer):
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError as exc:
+                # A value cut short by the end of the buffer fails in its last
+                # token, and no token spans a line break, so an error with a
+                # newline after it is final: stop there instead of reading on.
+                if eof or '\n' in buffer[exc.pos:] or len(buffer) - pos > MAX_VALUE_SIZE:
+                    raise ValueError(f'Malformed JSON after row {row_number}')
+            else:
+                # A value touching the end of the buffer may be cut short
+                # (e.g. a number); decode it again once more text is in.
+                if end < len(buffer) or eof:
+                    row_number += 1
+                    yield row_number, value
+                    pos = end
+                    continue
+
+        if eof:
+            return
+
+        chunk = text_file.read(READ_SIZE)
+        eof = not chunk
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+
+def _rows(binary_file, fmt):
+    text_file = io.TextIOWrapper(binary_file, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        yield from iter_csv_rows(text_file)
+    else:
+        yield from iter_json_rows(text_file)
+
+
+def import_questions(quiz, binary_file, fmt):
+    """Validate and insert every question in the file, or none of them"""
+    if fmt not in FORMATS:
+        raise ValueError(f'Unsupported format: {fmt}')
+
+    result = ImportResult()
+    order = (quiz.questions.aggregate(Max('order'))['order__max'] or 0) + 1
+    chunk = []
+
+    try:
+        with transaction.atomic():
+            try:
+                for row_number, row in _rows(binary_file, fmt):
+                    if not isinstance(row, dict):
+                        result.add_error(row_number, 'Expected an object with question fields')
+                        continue
+
+                    form = QuestionForm(data=row)
+                    if not form.is_valid():
+                        result.add_error(row_number, '; '.join(
+                            f'{field}: {message}'
+                            for field, messages in form.errors.items()
+                            for message in messages
+                        ))
+                        continue
+
+                    if not result.ok:
+                        # Keep validating to report errors, but stop inserting
+                        continue
+
+                    question = form.save(commit=False)
+                    question.quiz = quiz
+                    question.order = order
+                    order += 1
+                    chunk.append(question)
+
+                    if len(chunk) >= CHUNK_SIZE:
+                        Question.objects.bulk_create(chunk)
+                        result.created += len(chunk)
+                        chunk = []
+            except (ValueError, csv.Error) as exc:
+                result.add_error(None, str(exc))
+
+            if not result.ok:
+                raise _Rollback
+
+            if chunk:
+                Question.objects.bulk_create(chunk)
+                result.created += len(chunk)
+
+            # bulk_create skips the Question signals
+            refresh_quiz_totals(quiz.id)
+    except _Rollback:
+        result.created = 0
+
+    return result
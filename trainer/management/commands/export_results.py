@@ -0,0 +1,30 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from trainer.exports import FORMATS, KINDS, stream_export
+
+
+class Command(BaseCommand):
+    help = "Stream a trainer's attempts or per-answer data as CSV or NDJSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument('trainer', help='Username of the trainer')
+        parser.add_argument('--kind', choices=KINDS, default='attempts')
+        parser.add_argument('--format', choices=FORMATS, default='csv')
+        parser.add_argument('--quiz', type=int, help='Only export this quiz')
+        parser.add_argument('--output', help='File to write to (defaults to stdout)')
+
+    def handle(self, *args, **options):
+        try:
+            trainer = User.objects.get(username=options['trainer'], is_staff=True)
+        except User.DoesNotExist:
+            raise CommandError(f"No trainer named {options['trainer']}")
+
+        lines = stream_export(trainer, options['kind'], options['format'], options['quiz'])
+
+        if options['output']:
+            with open(options['output'], 'w', newline='', encoding='utf-8') as output:
+                output.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
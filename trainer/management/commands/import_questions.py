@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from quiz.models import Quiz
+from trainer.importers import FORMATS, detect_format, import_questions
+
+
+class Command(BaseCommand):
+    help = 'Bulk import questions into a quiz from a CSV, JSON or JSON-lines file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('quiz_id', type=int)
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=FORMATS, help='Defaults to the file extension')
+
+    def handle(self, *args, **options):
+        try:
+            quiz = Quiz.objects.get(id=options['quiz_id'])
+        except Quiz.DoesNotExist:
+            raise CommandError(f"Quiz {options['quiz_id']} does not exist")
+
+        fmt = options['format'] or detect_format(options['path'])
+        with open(options['path'], 'rb') as binary_file:
+            result = import_questions(quiz, binary_file, fmt)
+
+        if not result.ok:
+            for row_number, message in result.errors:
+                self.stderr.write(f"row {row_number if row_number is not None else '-'}: {message}")
+            raise CommandError(f'{result.error_count} invalid row(s); nothing was imported')
+
+        self.stdout.write(self.style.SUCCESS(f'Imported {result.created} question(s) into "{quiz.title}".'))
@@ -0,0 +1,23 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from trainer.models import rebuild_trainer_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute the trainer dashboard statistics from the source tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('usernames', nargs='*', help='Trainers to rebuild (default: all trainers)')
+
+    def handle(self, *args, **options):
+        trainers = User.objects.filter(is_staff=True, is_superuser=False)
+        if options['usernames']:
+            trainers = trainers.filter(username__in=options['usernames'])
+
+        count = 0
+        for trainer in trainers.iterator():
+            rebuild_trainer_stats(trainer)
+            count += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt stats for {count} trainer(s).'))
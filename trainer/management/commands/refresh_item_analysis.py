@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from quiz.models import Quiz
+from trainer.analytics import refresh_item_analysis
+
+
+class Command(BaseCommand):
+    help = 'Fold newly completed attempts into the item analysis of each quiz'
+
+    def add_arguments(self, parser):
+        parser.add_argument('quiz_ids', nargs='*', type=int, help='Quizzes to refresh (default: all quizzes)')
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Recompute from every completed attempt instead of folding in new ones')
+
+    def handle(self, *args, **options):
+        quizzes = Quiz.objects.all()
+        if options['quiz_ids']:
+            quizzes = quizzes.filter(pk__in=options['quiz_ids'])
+
+        count = 0
+        for quiz in quizzes.iterator():
+            refresh_item_analysis(quiz, rebuild=options['rebuild'])
+            count += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Refreshed item analysis for {count} quiz(zes).'))
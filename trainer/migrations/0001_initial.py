@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:58
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrainerStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_students', models.IntegerField(default=0)),
+                ('active_students', models.IntegerField(default=0)),
+                ('total_quizzes', models.IntegerField(default=0)),
+                ('total_attempts', models.IntegerField(default=0)),
+                ('recent_attempts', models.JSONField(blank=True, default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('trainer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='trainer_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'Trainer Stats',
+            },
+        ),
+    ]
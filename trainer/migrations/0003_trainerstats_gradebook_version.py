@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 04:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trainer', '0002_item_analysis'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trainerstats',
+            name='gradebook_version',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
@@ -1,3 +1,304 @@
-from django.db import models
+import time
 
-# Create your models here.
+from django.db import models, transaction
+from django.contrib.auth.models import User
+from django.db.models import Count, F, Q
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils.dateparse import parse_datetime
+
+from accounts.models import StudentProfile
+from progress.signals import attempt_completed
+from quiz.models import Quiz, QuizAttempt
+
+
+class TrainerStats(models.Model):
+    """Read model behind the trainer dashboard, kept current by the receivers below"""
+    RECENT_LIMIT = 10
+
+    trainer = models.OneToOneField(User, on_delete=models.CASCADE, related_name='trainer_stats')
+    total_students = models.IntegerField(default=0)
+    active_students = models.IntegerField(default=0)
+    total_quizzes = models.IntegerField(default=0)
+    total_attempts = models.IntegerField(default=0)
+    # Newest completed attempts first, RECENT_LIMIT + 1 entries so the
+    # dashboard knows whether an older page exists
+    recent_attempts = models.JSONField(default=list, blank=True)
+    # Cache version of the trainer's gradebook (see trainer.gradebook); kept
+    # here so a change made in any process moves every worker to a new key
+    gradebook_version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.trainer.username} - Stats"
+
+    def recent_feed(self):
+        """Feed entries shaped like QuizAttempt for the dashboard template"""
+        return [
+            {
+                'id': entry['id'],
+                'student': {'get_full_name': entry['student_name']},
+                'quiz': {'title': entry['quiz_title']},
+                'score': entry['score'],
+                'total_marks': entry['total_marks'],
+                'percentage': entry['percentage'],
+                'is_passed': entry['is_passed'],
+                'end_time': parse_datetime(entry['end_time']),
+            }
+            for entry in self.recent_attempts
+        ]
+
+    class Meta:
+        verbose_name_plural = 'Trainer Stats'
+
+
+class ItemAnalysis(models.Model):
+    """Running sums behind a quiz's item analysis; see trainer.analytics"""
+    quiz = models.OneToOneField(Quiz, on_delete=models.CASCADE, related_name='item_analysis')
+    # Quiz.content_version the sums were built against; 0 forces a rebuild
+    content_version = models.PositiveIntegerField(default=0)
+    attempts = models.IntegerField(default=0)
+    score_sum = models.FloatField(default=0)
+    score_sq_sum = models.FloatField(default=0)
+    # Per-question sums as lists aligned with sums['question_ids']
+    sums = models.JSONField(default=dict, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.quiz.title} - Item Analysis"
+
+    class Meta:
+        verbose_name_plural = 'Item Analyses'
+
+
+class PendingItemAttempt(models.Model):
+    """A completed attempt not yet folded into its quiz's ItemAnalysis"""
+    attempt = models.OneToOneField(QuizAttempt, on_delete=models.CASCADE, related_name='pending_item_analysis')
+    quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name='pending_item_attempts')
+
+
+def _feed_entry(attempt):
+    return {
+        'id': attempt.id,
+        'student_name': attempt.student.get_full_name(),
+        'quiz_title': attempt.quiz.title,
+        'score': attempt.score,
+        'total_marks': attempt.total_marks,
+        'percentage': attempt.percentage,
+        'is_passed': attempt.is_passed,
+        'end_time': attempt.end_time.isoformat(),
+    }
+
+
+def rebuild_trainer_stats(trainer):
+    """Recompute a trainer's stats from the source tables (repair path)"""
+    # Always counted on the primary: the row is kept current by F() deltas
+    # from here on, so counts from a lagging replica would stay wrong
+    students = StudentProfile.objects.using('default').filter(assigned_trainer=trainer).aggregate(
+        total=Count('id'),
+        active=Count('id', filter=Q(is_active=True)),
+    )
+    recent = QuizAttempt.objects.using('default').filter(
+        quiz__created_by=trainer,
+        status='completed',
+        end_time__isnull=False
+    ).select_related('student', 'quiz').order_by('-end_time', '-id')[:TrainerStats.RECENT_LIMIT + 1]
+
+    stats, _ = TrainerStats.objects.update_or_create(
+        trainer=trainer,
+        defaults={
+            'total_students': students['total'],
+            'active_students': students['active'],
+            'total_quizzes': Quiz.objects.using('default').filter(created_by=trainer).count(),
+            'total_attempts': QuizAttempt.objects.using('default').filter(quiz__created_by=trainer).count(),
+            'recent_attempts': [_feed_entry(attempt) for attempt in recent],
+            # A timestamp, so a recreated row never reuses an old gradebook
+            'gradebook_version': time.time_ns(),
+        }
+    )
+    return stats
+
+
+def get_trainer_stats(trainer):
+    try:
+        return TrainerStats.objects.get(trainer=trainer)
+    except TrainerStats.DoesNotExist:
+        return rebuild_trainer_stats(trainer)
+
+
+def _bump(trainer_id, **deltas):
+    """Apply F() deltas to a trainer's stats row; rows are created lazily by get_trainer_stats"""
+    if trainer_id is None:
+        return
+    TrainerStats.objects.filter(trainer_id=trainer_id).update(
+        **{field: F(field) + delta for field, delta in deltas.items() if delta}
+    )
+
+
+def invalidate_gradebook(trainer_id):
+    if trainer_id is not None:
+        TrainerStats.objects.filter(trainer_id=trainer_id).update(gradebook_version=time.time_ns())
+
+
+def _edit_feed(trainer_id, edit):
+    with transaction.atomic():
+        stats = TrainerStats.objects.select_for_update().filter(trainer_id=trainer_id).first()
+        if stats is None:
+            return
+        stats.recent_attempts = edit(stats.recent_attempts)
+        stats.save(update_fields=['recent_attempts', 'updated_at'])
+
+
+# ---- Students assigned / toggled ----
+
+_ASSIGNMENT_FIELDS = ('assigned_trainer_id', 'is_active')
+
+
+def _loaded_assignment(instance):
+    return {name: instance.__dict__[name] for name in _ASSIGNMENT_FIELDS if name in instance.__dict__}
+
+
+@receiver(post_init, sender=StudentProfile)
+def remember_assignment(sender, instance, **kwargs):
+    # Loaded fields only: reading a deferred one would query for every row
+    instance._stats_state = _loaded_assignment(instance)
+
+
+@receiver(pre_save, sender=StudentProfile)
+@receiver(pre_delete, sender=StudentProfile)
+def load_assignment(sender, instance, **kwargs):
+    """Fetch the stored values of fields that were deferred when the profile was loaded"""
+    missing = [name for name in _ASSIGNMENT_FIELDS if name not in instance._stats_state]
+    if missing and not instance._state.adding:
+        instance._stats_state.update(StudentProfile.objects.filter(pk=instance.pk).values(*missing).first() or {})
+
+
+@receiver(post_save, sender=StudentProfile)
+def assignment_saved(sender, instance, created, **kwargs):
+    state = {} if created else instance._stats_state
+    old_trainer, old_active = state.get('assigned_trainer_id'), state.get('is_active', False)
+    # A field that is still deferred was not saved, so it kept its value
+    state = {**state, **_loaded_assignment(instance)}
+    new_trainer, new_active = state.get('assigned_trainer_id'), state.get('is_active', False)
+
+    if old_trainer == new_trainer:
+        _bump(new_trainer, active_students=int(new_active) - int(old_active))
+    else:
+        _bump(old_trainer, total_students=-1, active_students=-int(old_active))
+        _bump(new_trainer, total_students=1, active_students=int(new_active))
+        invalidate_gradebook(old_trainer)
+    invalidate_gradebook(new_trainer)
+
+    instance._stats_state = state
+
+
+@receiver(post_delete, sender=StudentProfile)
+def assignment_deleted(sender, instance, **kwargs):
+    trainer_id, active = instance._stats_state.get('assigned_trainer_id'), instance._stats_state.get('is_active', False)
+    _bump(trainer_id, total_students=-1, active_students=-int(active))
+    invalidate_gradebook(trainer_id)
+
+
+# ---- Quizzes created / deleted ----
+
+@receiver(post_save, sender=Quiz)
+def quiz_created(sender, instance, created, **kwargs):
+    if created:
+        _bump(instance.created_by_id, total_quizzes=1)
+    invalidate_gradebook(instance.created_by_id)
+
+
+@receiver(post_delete, sender=Quiz)
+def quiz_deleted(sender, instance, **kwargs):
+    _bump(instance.created_by_id, total_quizzes=-1)
+    invalidate_gradebook(instance.created_by_id)
+
+
+# ---- Attempts started / completed / deleted ----
+
+@receiver(post_save, sender=QuizAttempt)
+def attempt_started(sender, instance, created, **kwargs):
+    if created:
+        _bump(instance.quiz.created_by_id, total_attempts=1)
+
+
+@receiver(attempt_completed)
+def attempt_finished(sender, attempt, **kwargs):
+    invalidate_gradebook(attempt.quiz.created_by_id)
+    # The feed is keyed on end_time, so attempts without one are left out
+    if attempt.end_time is None:
+        return
+    entry = _feed_entry(attempt)
+
+    def push(feed):
+        feed = [item for item in feed if item['id'] != entry['id']]
+        feed.append(entry)
+        feed.sort(key=lambda item: (item['end_time'], item['id']), reverse=True)
+        return feed[:TrainerStats.RECENT_LIMIT + 1]
+
+    _edit_feed(attempt.quiz.created_by_id, push)
+
+
+def _rebuild_after_delete(origin, quiz_id):
+    """Rebuild the quiz's trainer's stats once the queryset or cascading delete commits.
+
+    One rebuild per trainer replaces the per-attempt updates, which would
+    cost a few queries for every deleted row.
+    """
+    pending = getattr(origin, '_deleted_attempt_trainers', None)
+    if pending is None:
+        pending = origin._deleted_attempt_trainers = {}
+
+        def rebuild():
+            # Trainers deleted along with the attempts have no stats left
+            for stats in TrainerStats.objects.filter(trainer_id__in=set(pending.values())).select_related('trainer'):
+                rebuild_trainer_stats(stats.trainer)
+        transaction.on_commit(rebuild)
+
+    if quiz_id not in pending:
+        # Cascades delete attempts before their quiz, so the quiz is still there
+        pending[quiz_id] = (
+            origin.created_by_id if isinstance(origin, Quiz)
+            else Quiz.objects.filter(pk=quiz_id).values_list('created_by_id', flat=True).first()
+        )
+
+
+@receiver(post_delete, sender=QuizAttempt)
+def attempt_deleted(sender, instance, origin=None, **kwargs):
+    if origin is not None and origin is not instance:
+        _rebuild_after_delete(origin, instance.quiz_id)
+        return
+    trainer_id = Quiz.objects.filter(pk=instance.quiz_id).values_list('created_by_id', flat=True).first()
+    _bump(trainer_id, total_attempts=-1)
+    if instance.status == 'completed':
+        invalidate_gradebook(trainer_id)
+        _edit_feed(trainer_id, lambda feed: [item for item in feed if item['id'] != instance.id])
+
+
+# ---- Student renamed ----
+
+@receiver(post_save, sender=User)
+def student_renamed(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    invalidate_gradebook(
+        StudentProfile.objects.filter(user=instance).values_list('assigned_trainer_id', flat=True).first()
+    )
+
+
+# ---- Item analysis ----
+
+@receiver(attempt_completed)
+def queue_item_analysis(sender, attempt, **kwargs):
+    PendingItemAttempt.objects.bulk_create(
+        [PendingItemAttempt(attempt=attempt, quiz_id=attempt.quiz_id)],
+        ignore_conflicts=True
+    )
+
+
+@receiver(post_delete, sender=QuizAttempt)
+def analysed_attempt_deleted(sender, instance, origin=None, **kwargs):
+    # The sums may already include the attempt, so rebuild them on next refresh;
+    # a quiz being deleted takes its analysis with it
+    if instance.status == 'completed' and not isinstance(origin, Quiz):
+        ItemAnalysis.objects.filter(quiz_id=instance.quiz_id).update(content_version=0)
@@ -1,3 +1,516 @@
-from django.test import TestCase
+import csv
+import importlib
+import io
+import json
+import random
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import StudentProfile
+from progress.models import ProgressLedger, apply_pending_progress
+from quiz.models import Question, Quiz, QuizAttempt, StudentAnswer
+from .analytics import OPTIONS, flags, item_statistics, refresh_item_analysis
+from .exports import ANSWER_COLUMNS, ATTEMPT_COLUMNS
+from .gradebook import get_gradebook, gradebook_version, render_rows
+from .importers import MAX_VALUE_SIZE, import_questions
+from .models import PendingItemAttempt, TrainerStats, get_trainer_stats, rebuild_trainer_stats
+
+
+class ItemAnalysisTests(TestCase):
+    """The statistics derived from the running sums match a direct computation"""
+
+    MARKS = [1, 2, 1, 3]
+    CORRECT = ['A', 'B', 'C', 'D']
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.trainer = User.objects.create_user('trainer', password='pass', is_staff=True)
+        cls.quiz = Quiz.objects.create(title='Quiz', description='-', created_by=cls.trainer)
+        cls.questions = [
+            Question.objects.create(
+                quiz=cls.quiz, question_text='?', option_a='a', option_b='b', option_c='c',
+                option_d='d', correct_answer=correct, marks=marks, order=order,
+            )
+            for order, (correct, marks) in enumerate(zip(cls.CORRECT, cls.MARKS))
+        ]
+        cls.students = User.objects.bulk_create([User(username=f'student{n}') for n in range(40)])
+
+    def complete(self, students, seed):
+        """Complete an attempt per student with random answers; returns the attempts"""
+        rng = random.Random(seed)
+        attempts = QuizAttempt.objects.bulk_create([
+            QuizAttempt(student=student, quiz=self.quiz, status='completed') for student in students
+        ])
+        StudentAnswer.objects.bulk_create([
+            StudentAnswer(
+                attempt=attempt, question=question, selected_answer=rng.choice(OPTIONS),
+                time_taken=rng.randint(1, 60),
+            )
+            for attempt in attempts for question in self.questions
+            # Some questions are skipped
+            if rng.random() < 0.85
+        ])
+        ProgressLedger.objects.bulk_create([ProgressLedger(attempt=attempt) for attempt in attempts])
+        return attempts
+
+    def expected(self):
+        """Statistics computed directly from every completed attempt's answers"""
+        attempts = list(QuizAttempt.objects.filter(quiz=self.quiz, status='completed').values_list('id', flat=True))
+        answers = {
+            (attempt_id, question_id): (selected, time_taken)
+            for attempt_id, question_id, selected, time_taken in StudentAnswer.objects.filter(
+                attempt_id__in=attempts
+            ).values_list('attempt_id', 'question_id', 'selected_answer', 'time_taken')
+        }
+        marks = np.array(self.MARKS, dtype=np.float64)
+        right = np.array([
+            [answers.get((attempt_id, question.id), ('',))[0] == question.correct_answer
+             for question in self.questions]
+            for attempt_id in attempts
+        ], dtype=np.float64)
+        scores = right @ marks
+
+        expected = {}
+        for j, question in enumerate(self.questions):
+            picked = [answers[(attempt_id, question.id)] for attempt_id in attempts
+                      if (attempt_id, question.id) in answers]
+            expected[question.id] = {
+                'p_value': right[:, j].mean(),
+                'discrimination': np.corrcoef(right[:, j], scores - marks[j] * right[:, j])[0, 1],
+                'option_rates': {
+                    option: sum(selected == option for selected, _ in picked) / len(attempts) for option in OPTIONS
+                },
+                'skipped_rate': 1 - len(picked) / len(attempts),
+                'mean_time': np.mean([time_taken for _, time_taken in picked]),
+            }
+        return expected
+
+    def assert_statistics(self, analysis):
+        statistics = item_statistics(analysis)
+        for question_id, expected in self.expected().items():
+            actual = statistics[question_id]
+            for name in ('p_value', 'discrimination', 'skipped_rate', 'mean_time'):
+                self.assertAlmostEqual(actual[name], expected[name], places=9, msg=name)
+            for option in OPTIONS:
+                self.assertAlmostEqual(actual['option_rates'][option], expected['option_rates'][option], places=9)
+
+    def test_rebuild_matches_direct_computation(self):
+        self.complete(self.students, seed=1)
+        analysis = refresh_item_analysis(self.quiz, rebuild=True)
+        self.assertEqual(analysis.attempts, len(self.students))
+        self.assert_statistics(analysis)
+
+    def test_incremental_refresh_matches_rebuild(self):
+        self.complete(self.students[:25], seed=2)
+        refresh_item_analysis(self.quiz)
+        later = self.complete(self.students[25:], seed=3)
+        PendingItemAttempt.objects.bulk_create(
+            [PendingItemAttempt(attempt=attempt, quiz=self.quiz) for attempt in later]
+        )
+
+        analysis = refresh_item_analysis(self.quiz)
+        self.assertEqual(analysis.attempts, len(self.students))
+        self.assertFalse(PendingItemAttempt.objects.exists())
+        self.assert_statistics(analysis)
+        incremental = analysis.sums
+        self.assertEqual(refresh_item_analysis(self.quiz, rebuild=True).sums, incremental)
+
+    def test_constant_answers_have_no_discrimination(self):
+        attempts = self.complete(self.students[:5], seed=4)
+        StudentAnswer.objects.filter(attempt__in=attempts, question=self.questions[0]).delete()
+        StudentAnswer.objects.bulk_create([
+            StudentAnswer(attempt=attempt, question=self.questions[0], selected_answer='A') for attempt in attempts
+        ])
+        statistics = item_statistics(refresh_item_analysis(self.quiz, rebuild=True))
+        self.assertEqual(statistics[self.questions[0].id]['p_value'], 1.0)
+        self.assertIsNone(statistics[self.questions[0].id]['discrimination'])
+        self.assertEqual(flags(statistics[self.questions[0].id], 'A'), ['Too easy'])
+
+    def test_empty_quiz(self):
+        analysis = refresh_item_analysis(self.quiz)
+        self.assertEqual(analysis.attempts, 0)
+        self.assertEqual(item_statistics(analysis), {})
+
+    @override_settings(PROGRESS_UPDATE_MODE='queue')
+    def test_queued_completion_is_counted_once(self):
+        student = self.students[0]
+        attempt = QuizAttempt.objects.create(student=student, quiz=self.quiz)
+        StudentAnswer.objects.create(attempt=attempt, question=self.questions[0], selected_answer='A')
+        attempt.status = 'completed'
+        attempt.save()
+
+        # Completed, but not yet announced by the progress worker
+        self.assertEqual(refresh_item_analysis(self.quiz, rebuild=True).attempts, 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_pending_progress(student.id)
+        self.assertEqual(refresh_item_analysis(self.quiz).attempts, 1)
+        self.assertEqual(refresh_item_analysis(self.quiz).attempts, 1)
+
+    def test_refresh_with_nothing_queued_only_reads(self):
+        self.complete(self.students[:5], seed=5)
+        analysis = refresh_item_analysis(self.quiz)
+        # The analysis row and the queue check; no transaction, no UPDATE
+        with self.assertNumQueries(2):
+            self.assertEqual(refresh_item_analysis(self.quiz).sums, analysis.sums)
+
+        # A content change still rebuilds
+        Quiz.objects.filter(pk=self.quiz.pk).update(content_version=analysis.content_version + 1)
+        self.assertEqual(refresh_item_analysis(self.quiz).content_version, analysis.content_version + 1)
+
+
+class GradebookTests(TestCase):
+    def test_completion_moves_gradebook_to_new_version(self):
+        trainer = User.objects.create_user('trainer', password='pass', is_staff=True)
+        student = User.objects.create_user('student', password='pass')
+        StudentProfile.objects.filter(user=student).update(assigned_trainer=trainer)
+        quiz = Quiz.objects.create(title='Quiz', description='-', created_by=trainer)
+        Question.objects.create(
+            quiz=quiz, question_text='?', option_a='a', option_b='b', option_c='c',
+            option_d='d', correct_answer='A', marks=1, order=0,
+        )
+        version = gradebook_version(trainer)
+        self.assertEqual(get_gradebook(trainer, version)['scores'], [])
+
+        attempt = QuizAttempt.objects.create(student=student, quiz=quiz)
+        StudentAnswer.objects.create(attempt=attempt, question=quiz.questions.get(), selected_answer='A')
+        attempt.status = 'completed'
+        with self.captureOnCommitCallbacks(execute=True):
+            attempt.calculate_score()
+
+        # The version is read from the database, as another process would
+        self.assertNotEqual(gradebook_version(trainer), version)
+        self.assertEqual(get_gradebook(trainer, gradebook_version(trainer))['scores'], [100.0])
+
+    def test_rows_link_to_each_student(self):
+        trainer = User.objects.create_user('trainer', password='pass', is_staff=True)
+        students = [User.objects.create_user(f'student{n}', password='pass') for n in range(2)]
+        StudentProfile.objects.update(assigned_trainer=trainer)
+
+        rows = render_rows(get_gradebook(trainer, gradebook_version(trainer)))
+        for student in students:
+            self.assertIn(f'href="{reverse("trainer:student_performance", args=[student.id])}"', rows)
+
+
+class TrainerStatsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.trainer = User.objects.create_user('trainer', password='pass', is_staff=True)
+        cls.students = [User.objects.create_user(f'student{n}', password='pass') for n in range(3)]
+        StudentProfile.objects.update(assigned_trainer=cls.trainer)
+        cls.quiz = Quiz.objects.create(title='Quiz', description='-', created_by=cls.trainer)
+        Question.objects.create(
+            quiz=cls.quiz, question_text='?', option_a='a', option_b='b', option_c='c',
+            option_d='d', correct_answer='A', marks=1, order=0,
+        )
+
+    def setUp(self):
+        self.stats = get_trainer_stats(self.trainer)
+
+    def assert_stats_match_rebuild(self):
+        stats = TrainerStats.objects.get(pk=self.stats.pk)
+        rebuilt = rebuild_trainer_stats(self.trainer)
+        for field in ('total_students', 'active_students', 'total_quizzes', 'total_attempts', 'recent_attempts'):
+            self.assertEqual(getattr(stats, field), getattr(rebuilt, field), field)
+
+    def test_loading_deferred_profiles_costs_no_extra_query(self):
+        with self.assertNumQueries(1):
+            list(StudentProfile.objects.only('enrollment_number'))
+
+    def test_saving_deferred_profile_keeps_counts(self):
+        profile = StudentProfile.objects.only('id').get(user=self.students[0])
+        profile.is_active = False
+        profile.save()
+        self.assertEqual(TrainerStats.objects.get(pk=self.stats.pk).active_students, 2)
+        self.assert_stats_match_rebuild()
+
+    def test_bulk_attempt_delete_rebuilds_once(self):
+        for student in self.students:
+            QuizAttempt.objects.create(student=student, quiz=self.quiz, status='completed', end_time=timezone.now())
+        self.assertEqual(TrainerStats.objects.get(pk=self.stats.pk).total_attempts, 3)
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            QuizAttempt.objects.filter(quiz=self.quiz).delete()
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(TrainerStats.objects.get(pk=self.stats.pk).total_attempts, 0)
+        self.assert_stats_match_rebuild()
+
+    def test_quiz_delete_cascade_rebuilds_stats(self):
+        QuizAttempt.objects.create(student=self.students[0], quiz=self.quiz)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.quiz.delete()
+        stats = TrainerStats.objects.get(pk=self.stats.pk)
+        self.assertEqual((stats.total_quizzes, stats.total_attempts), (0, 0))
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = User.objects.create_user('student', password='pass')
+        cls.quizzes = {}
+        for username, title in (('trainer', 'Mine'), ('other', 'Theirs')):
+            trainer = User.objects.create_user(username, password='pass', is_staff=True)
+            quiz = Quiz.objects.create(title=title, description='-', created_by=trainer)
+            question = Question.objects.create(
+                quiz=quiz, question_text='?', option_a='a', option_b='b', option_c='c',
+                option_d='d', correct_answer='B', marks=2, order=1,
+            )
+            attempt = QuizAttempt.objects.create(student=cls.student, quiz=quiz)
+            StudentAnswer.objects.create(attempt=attempt, question=question, selected_answer='B', time_taken=4)
+            attempt.status = 'completed'
+            attempt.end_time = timezone.now()
+            attempt.calculate_score()
+            cls.quizzes[title] = quiz
+
+    def setUp(self):
+        self.client.login(username='trainer', password='pass')
+
+    def export(self, **params):
+        response = self.client.get(reverse('trainer:export_results'), params)
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_attempts_csv(self):
+        response, body = self.export(kind='attempts', format='csv')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="attempts.csv"')
+        header, *rows = list(csv.reader(io.StringIO(body)))
+        self.assertEqual(header, ATTEMPT_COLUMNS)
+        self.assertEqual(len(rows), 1)
+        row = dict(zip(header, rows[0]))
+        mine = self.quizzes['Mine']
+        self.assertEqual(
+            (row['quiz_id'], row['quiz_title'], row['student_username'], row['status'], row['score'], row['percentage']),
+            (str(mine.id), 'Mine', 'student', 'completed', '2.0', '100.0'),
+        )
+
+    def test_answers_ndjson_for_one_quiz(self):
+        mine = self.quizzes['Mine']
+        response, body = self.export(kind='answers', format='ndjson', quiz=mine.id)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual(response['Content-Disposition'], f'attachment; filename="answers-quiz-{mine.id}.ndjson"')
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(list(rows[0]), ANSWER_COLUMNS)
+        self.assertEqual(
+            {name: rows[0][name] for name in ('quiz_title', 'student_username', 'selected_answer',
+                                              'correct_answer', 'is_correct', 'marks', 'time_taken')},
+            {'quiz_title': 'Mine', 'student_username': 'student', 'selected_answer': 'B',
+             'correct_answer': 'B', 'is_correct': True, 'marks': 2, 'time_taken': 4},
+        )
+
+    def test_other_trainers_quiz_is_not_exported(self):
+        theirs = self.quizzes['Theirs']
+        for kind in ('attempts', 'answers'):
+            with self.subTest(kind=kind):
+                response = self.client.get(reverse('trainer:export_results'), {'kind': kind, 'quiz': theirs.id})
+                self.assertEqual(response.status_code, 404)
+                _, body = self.export(kind=kind, format='ndjson')
+                self.assertEqual({json.loads(line)['quiz_title'] for line in body.splitlines()}, {'Mine'})
+
+    def test_non_numeric_quiz_is_not_found(self):
+        response = self.client.get(reverse('trainer:export_results') + '?quiz=abc')
+        self.assertEqual(response.status_code, 404)
+
+
+class ImportTests(TestCase):
+    ROWS = [
+        {'question_text': 'One?', 'option_a': 'a', 'option_b': 'b', 'option_c': 'c', 'option_d': 'd',
+         'correct_answer': 'A', 'marks': '2', 'time_limit': '30'},
+        {'question_text': 'Two?', 'option_a': 'a', 'option_b': 'b', 'option_c': 'c', 'option_d': 'd',
+         'correct_answer': 'D', 'marks': '3', 'time_limit': '60', 'explanation': 'Because'},
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        trainer = User.objects.create_user('trainer', password='pass', is_staff=True)
+        cls.quiz = Quiz.objects.create(title='Quiz', description='-', created_by=trainer)
+        Question.objects.create(
+            quiz=cls.quiz, question_text='Existing?', option_a='a', option_b='b', option_c='c',
+            option_d='d', correct_answer='B', marks=1, order=1,
+        )
+
+    @staticmethod
+    def encode(rows, fmt):
+        if fmt == 'csv':
+            text = io.StringIO()
+            writer = csv.DictWriter(text, fieldnames=list(ImportTests.ROWS[1]))
+            writer.writeheader()
+            writer.writerows(rows)
+            return text.getvalue().encode()
+        if fmt == 'jsonl':
+            return '\n'.join(json.dumps(row) for row in rows).encode()
+        return json.dumps(rows, indent=2).encode()
+
+    def run_import(self, data, fmt):
+        self.quiz.refresh_from_db()
+        version = self.quiz.content_version
+        result = import_questions(self.quiz, io.BytesIO(data), 'csv' if fmt == 'csv' else 'json')
+        self.quiz.refresh_from_db()
+        return result, self.quiz.content_version - version
+
+    def test_each_format_imports_every_row(self):
+        for fmt in ('csv', 'json', 'jsonl'):
+            with self.subTest(fmt=fmt):
+                result, bumped = self.run_import(self.encode(self.ROWS, fmt), fmt)
+                self.assertTrue(result.ok, result.errors)
+                self.assertEqual(result.created, 2)
+                self.assertEqual(bumped, 1)
+                imported = self.quiz.questions.filter(order__gt=1).order_by('-order')[:2]
+                self.assertEqual(
+                    [(question.question_text, question.correct_answer, question.marks) for question in imported],
+                    [('Two?', 'D', 3), ('One?', 'A', 2)],
+                )
+                self.assertEqual(self.quiz.total_questions, self.quiz.questions.count())
+                self.assertEqual(self.quiz.total_marks, sum(self.quiz.questions.values_list('marks', flat=True)))
+
+    def test_invalid_row_rolls_back_whole_import(self):
+        missing = {name: value for name, value in self.ROWS[1].items() if name != 'option_b'}
+        for fmt in ('csv', 'json', 'jsonl'):
+            for bad in ({**self.ROWS[1], 'correct_answer': 'E'}, missing):
+                with self.subTest(fmt=fmt, bad=bad):
+                    result, bumped = self.run_import(self.encode([self.ROWS[0], bad, self.ROWS[0]], fmt), fmt)
+                    self.assertFalse(result.ok)
+                    self.assertEqual(result.created, 0)
+                    self.assertEqual(result.errors[0][0], 3 if fmt == 'csv' else 2)
+                    self.assertEqual(bumped, 0)
+                    self.assertEqual((self.quiz.questions.count(), self.quiz.total_questions), (1, 1))
+
+    def test_malformed_json_stops_reading(self):
+        row = json.dumps(self.ROWS[0]).encode()
+        tail = b'\n'.join([row] * (4 * MAX_VALUE_SIZE // len(row)))
+        for data in (row + b'\n{"question_text": }\n' + tail, b'[' + row + b', {"marks": 1,, }, ' + tail + b']'):
+            with self.subTest(data=data[:40]):
+                upload = io.BytesIO(data)
+                with mock.patch.object(upload, 'close'):
+                    result = import_questions(self.quiz, upload, 'json')
+                self.assertEqual(result.errors, [(None, 'Malformed JSON after row 1')])
+                self.assertLess(upload.tell(), len(data) // 2)
+                self.assertEqual(self.quiz.questions.count(), 1)
+
+
+def create_quiz_data(marks, title='Quiz'):
+    """POST data for create_quiz with one question per entry of ``marks``"""
+    data = {
+        'title': title, 'description': '-', 'difficulty': 'easy', 'pass_percentage': 50, 'is_active': 'on',
+        'questions-TOTAL_FORMS': len(marks), 'questions-INITIAL_FORMS': 0,
+        'questions-MIN_NUM_FORMS': 0, 'questions-MAX_NUM_FORMS': 20,
+    }
+    for index, value in enumerate(marks):
+        data.update({
+            f'questions-{index}-{name}': field for name, field in {
+                'question_text': f'Q{index}?', 'option_a': 'a', 'option_b': 'b', 'option_c': 'c',
+                'option_d': 'd', 'correct_answer': 'A', 'marks': value, 'time_limit': 30,
+            }.items()
+        })
+    return data
+
+
+class QuizTotalsTests(TestCase):
+    """Quiz.total_questions/total_marks follow every way questions change"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.trainer = User.objects.create_user('trainer', password='pass', is_staff=True)
+
+    def setUp(self):
+        self.client.login(username='trainer', password='pass')
+
+    def create(self, marks):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('trainer:create_quiz'), create_quiz_data(marks))
+        return Quiz.objects.get(created_by=self.trainer)
+
+    def assert_totals(self, quiz, questions, marks):
+        quiz.refresh_from_db()
+        self.assertEqual((quiz.total_questions, quiz.total_marks), (questions, marks))
+
+    def test_totals_follow_question_changes(self):
+        quiz = self.create([1, 2, 3])
+        self.assert_totals(quiz, 3, 6)
+
+        first = quiz.questions.order_by('order').first()
+        self.client.post(reverse('trainer:edit_questions', args=[quiz.id]), {f'correct_{first.id}': 'B'})
+        self.assert_totals(quiz, 3, 6)
+
+        first.delete()
+        self.assert_totals(quiz, 2, 5)
+
+        Question.objects.create(
+            quiz=quiz, question_text='?', option_a='a', option_b='b', option_c='c',
+            option_d='d', correct_answer='A', marks=4, order=9,
+        )
+        self.assert_totals(quiz, 3, 9)
+
+    def test_quiz_edit_keeps_totals(self):
+        quiz = self.create([2, 2])
+        stale = Quiz.objects.get(pk=quiz.pk)
+        version = stale.content_version
+        quiz.questions.first().delete()
+
+        data = create_quiz_data([], title='Renamed')
+        self.client.post(reverse('trainer:edit_quiz', args=[quiz.id]), data)
+        self.assert_totals(quiz, 1, 2)
+        self.assertEqual(quiz.title, 'Renamed')
+
+        # Saving an instance loaded before the delete writes none of the derived fields
+        stale.title = 'Stale'
+        stale.save()
+        self.assert_totals(quiz, 1, 2)
+        self.assertEqual(quiz.content_version, version + 1)
+
+    def test_migration_backfills_totals(self):
+        quiz = self.create([1, 4])
+        empty = Quiz.objects.create(title='Empty', description='-', created_by=self.trainer)
+        Quiz.objects.filter(pk=quiz.pk).update(total_questions=0, total_marks=0)
+        Quiz.objects.filter(pk=empty.pk).update(total_questions=7, total_marks=7)
+
+        migration = importlib.import_module('quiz.migrations.0003_quiz_stored_totals')
+        migration.backfill_totals(apps, None)
+        self.assert_totals(quiz, 2, 5)
+        self.assert_totals(empty, 0, 0)
+
+
+class QuestionWriteQueryTests(TestCase):
+    """Creating and editing questions costs the same statements however many there are"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.trainer = User.objects.create_user('trainer', password='pass', is_staff=True)
+
+    def setUp(self):
+        self.client.login(username='trainer', password='pass')
+
+    def test_create_quiz_inserts_questions_in_one_statement(self):
+        for count in (1, 10):
+            with self.subTest(count=count):
+                # Session, user, savepoint, quiz, trainer stats (2), questions,
+                # quiz totals, release
+                with self.assertNumQueries(9):
+                    self.client.post(reverse('trainer:create_quiz'), create_quiz_data([1] * count, title=str(count)))
+                self.assertEqual(Quiz.objects.get(title=str(count)).questions.count(), count)
+
+    def test_edit_questions_updates_only_on_change(self):
+        self.client.post(reverse('trainer:create_quiz'), create_quiz_data([1] * 6))
+        quiz = Quiz.objects.get(created_by=self.trainer)
+        questions = list(quiz.questions.order_by('order'))
+        url = reverse('trainer:edit_questions', args=[quiz.id])
+
+        # Resubmitting the current values: session, user, quiz, questions
+        unchanged = {f'correct_{question.id}': question.correct_answer for question in questions}
+        with self.assertNumQueries(4):
+            self.client.post(url, unchanged)
+        self.assertEqual(Quiz.objects.get(pk=quiz.pk).content_version, quiz.content_version)
+
+        # Plus one bulk UPDATE and the quiz version bump in a savepoint
+        for changed in (questions[:1], questions):
+            with self.subTest(changed=len(changed)):
+                with self.assertNumQueries(8):
+                    self.client.post(url, {**unchanged, **{f'correct_{question.id}': 'D' for question in changed}})
+        self.assertEqual(set(quiz.questions.values_list('correct_answer', flat=True)), {'D'})
+        self.assertEqual(Quiz.objects.get(pk=quiz.pk).content_version, quiz.content_version + 2)
@@ -12,10 +12,14 @@ urlpatterns = [
     path('students/', views.manage_students, name='manage_students'),
     path('students/<int:student_id>/assign/', views.assign_student, name='assign_student'),
     path('students/<int:student_id>/toggle/', views.toggle_student_status, name='toggle_student_status'),
+    path('students/gradebook/', views.gradebook, name='gradebook'),
     path('students/<int:student_id>/performance/', views.student_performance, name='student_performance'),
     path(
     'quiz/<int:quiz_id>/questions/edit/',
     views.edit_questions,
     name='edit_questions'
-)
+),
+    path('quiz/<int:quiz_id>/questions/import/', views.import_questions, name='import_questions'),
+    path('quiz/<int:quiz_id>/analysis/', views.item_analysis, name='item_analysis'),
+    path('export/', views.export_results, name='export_results'),
 ]
\ No newline at end of file
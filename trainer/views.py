@@ -2,12 +2,28 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
 from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.forms import formset_factory
 
 from accounts.models import StudentProfile
-from quiz.models import Quiz, Question, QuizAttempt
+from quiz.models import ANSWER_OPTIONS, Quiz, Question, QuizAttempt, refresh_quiz_totals
+from quiz.pagination import first_page, paginate
+from quiz_app.routers import read_from_replica
 from progress.models import DailyProgress, OverallProgress
-from .forms import QuizForm, QuestionForm
+from .forms import QuizForm, QuestionForm, QuestionImportForm
+from .analytics import flags as item_flags, item_statistics, refresh_item_analysis
+from .gradebook import get_gradebook, get_rendered_rows, gradebook_version, write_csv as write_gradebook_csv
+from .exports import CONTENT_TYPES, FORMATS as EXPORT_FORMATS, KINDS as EXPORT_KINDS, stream_export
+from .importers import detect_format, import_questions as import_question_file
+from .models import TrainerStats, get_trainer_stats
+
+# Fields trainers can change from the inline question editor
+QUESTION_EDIT_FIELDS = [
+    'question_text', 'option_a', 'option_b', 'option_c', 'option_d',
+    'correct_answer', 'time_limit',
+]
 
 
 # ==============================
@@ -22,26 +38,38 @@ def is_trainer(user):
 # ==============================
 @login_required
 @user_passes_test(is_trainer)
+@read_from_replica
 def dashboard(request):
     trainer = request.user
-
-    students = User.objects.filter(
-        student_profile__assigned_trainer=trainer
-    )
-
-    quizzes = Quiz.objects.filter(created_by=trainer)
+    stats = get_trainer_stats(trainer)
+
+    # The stats row carries the newest attempts; older pages are queried live
+    if request.GET:
+        recent_attempts = paginate(
+            request,
+            QuizAttempt.objects.filter(
+                quiz__created_by=trainer,
+                status='completed',
+                end_time__isnull=False
+            ).select_related('student', 'quiz'),
+            'end_time',
+            page_size=10
+        )
+    else:
+        feed = stats.recent_feed()
+        recent_attempts = first_page(
+            request,
+            feed[:TrainerStats.RECENT_LIMIT],
+            'end_time',
+            has_next=len(feed) > TrainerStats.RECENT_LIMIT
+        )
 
     context = {
-        'total_students': students.count(),
-        'active_students': students.filter(student_profile__is_active=True).count(),
-        'total_quizzes': quizzes.count(),
-        'total_attempts': QuizAttempt.objects.filter(
-            quiz__created_by=trainer
-        ).count(),
-        'recent_attempts': QuizAttempt.objects.filter(
-            quiz__created_by=trainer,
-            status='completed'
-        ).select_related('student', 'quiz').order_by('-end_time')[:10]
+        'total_students': stats.total_students,
+        'active_students': stats.active_students,
+        'total_quizzes': stats.total_quizzes,
+        'total_attempts': stats.total_attempts,
+        'recent_attempts': recent_attempts
     }
 
     return render(request, 'trainer/dashboard.html', context)
@@ -65,18 +93,22 @@ def create_quiz(request):
         question_formset = QuestionFormSet(request.POST, prefix='questions')
 
         if quiz_form.is_valid() and question_formset.is_valid():
-            quiz = quiz_form.save(commit=False)
-            quiz.created_by = request.user
-            quiz.save()
-
-            order = 1
-            for form in question_formset:
-                if form.cleaned_data and not form.cleaned_data.get('DELETE', False):
-                    question = form.save(commit=False)
-                    question.quiz = quiz
-                    question.order = order
-                    question.save()
-                    order += 1
+            with transaction.atomic():
+                quiz = quiz_form.save(commit=False)
+                quiz.created_by = request.user
+                quiz.save()
+
+                questions = []
+                for form in question_formset:
+                    if form.cleaned_data and not form.cleaned_data.get('DELETE', False):
+                        question = form.save(commit=False)
+                        question.quiz = quiz
+                        question.order = len(questions) + 1
+                        questions.append(question)
+
+                # bulk_create skips the Question signals, so sync totals once
+                Question.objects.bulk_create(questions)
+                refresh_quiz_totals(quiz.id)
 
             messages.success(request, 'Quiz created successfully!')
             return redirect('trainer:manage_quizzes')
@@ -99,10 +131,12 @@ def create_quiz(request):
 def manage_quizzes(request):
     quizzes = Quiz.objects.filter(
         created_by=request.user
+    ).annotate(
+        attempt_count=Count('attempts')
     ).order_by('-created_at')
 
     return render(request, 'trainer/manage_quizzes.html', {
-        'quizzes': quizzes
+        'quizzes': paginate(request, quizzes, 'created_at')
     })
 
 
@@ -160,15 +194,30 @@ def manage_students(request):
         student_profile__assigned_trainer=request.user
     ).select_related('student_profile')
 
+    # student_profile__isnull=False keeps this an inner join, so SQLite can
+    # start from the assigned_trainer index instead of scanning auth_user
     unassigned_students = User.objects.filter(
+        student_profile__isnull=False,
         student_profile__assigned_trainer__isnull=True,
         is_staff=False,
         is_superuser=False
     ).select_related('student_profile')
 
+    # Keyed on the profile's (created_at, id), matching its index
     return render(request, 'trainer/manage_students.html', {
-        'students': assigned_students,
-        'unassigned_students': unassigned_students
+        'students': paginate(
+            request,
+            assigned_students,
+            'student_profile__created_at',
+            tiebreak='student_profile__id'
+        ),
+        'unassigned_students': paginate(
+            request,
+            unassigned_students,
+            'student_profile__created_at',
+            param='unassigned_cursor',
+            tiebreak='student_profile__id'
+        )
     })
 
 
@@ -197,7 +246,7 @@ def assign_student(request, student_id):
 @login_required
 @user_passes_test(is_trainer)
 def toggle_student_status(request, student_id):
-    student = get_object_or_404(User, id=student_id)
+    student = get_object_or_404(User.objects.select_related('student_profile'), id=student_id)
 
     if hasattr(student, 'student_profile') and \
        student.student_profile.assigned_trainer == request.user:
@@ -220,8 +269,9 @@ def toggle_student_status(request, student_id):
 # ==============================
 @login_required
 @user_passes_test(is_trainer)
+@read_from_replica
 def student_performance(request, student_id):
-    student = get_object_or_404(User, id=student_id)
+    student = get_object_or_404(User.objects.select_related('student_profile'), id=student_id)
 
     if hasattr(student, 'student_profile') and \
        student.student_profile.assigned_trainer != request.user:
@@ -232,12 +282,43 @@ def student_performance(request, student_id):
         'student': student,
         'overall_progress': OverallProgress.objects.filter(student=student).first(),
         'daily_progress': DailyProgress.objects.filter(student=student).order_by('-date')[:30],
-        'attempts': QuizAttempt.objects.filter(
-            student=student,
-            status='completed'
-        ).select_related('quiz').order_by('-end_time')[:20]
+        'attempts': paginate(
+            request,
+            QuizAttempt.objects.filter(
+                student=student,
+                status='completed',
+                end_time__isnull=False
+            ).select_related('quiz'),
+            'end_time'
+        )
     })
 
+
+# ==============================
+# GRADEBOOK
+# ==============================
+@login_required
+@user_passes_test(is_trainer)
+def gradebook(request):
+    # Built from the primary: a lagging replica would cache stale scores
+    # under the current version
+    version = gradebook_version(request.user)
+    book = get_gradebook(request.user, version)
+
+    if request.GET.get('format') == 'csv':
+        response = HttpResponse(content_type='text/csv')
+        response['Content-Disposition'] = 'attachment; filename="gradebook.csv"'
+        write_gradebook_csv(book, response)
+        return response
+
+    return render(request, 'trainer/gradebook.html', {
+        'quizzes': book['quizzes'],
+        'student_count': len(book['students']),
+        'score_count': len(book['scores']),
+        'rows': get_rendered_rows(request.user, version, book)
+    })
+
+
 @login_required
 @user_passes_test(is_trainer)
 def edit_questions(request, quiz_id):
@@ -250,15 +331,34 @@ def edit_questions(request, quiz_id):
     questions = quiz.questions.all().order_by('order')
 
     if request.method == 'POST':
+        changed = []
         for q in questions:
-            q.question_text = request.POST.get(f'question_{q.id}')
-            q.option_a = request.POST.get(f'option_a_{q.id}')
-            q.option_b = request.POST.get(f'option_b_{q.id}')
-            q.option_c = request.POST.get(f'option_c_{q.id}')
-            q.option_d = request.POST.get(f'option_d_{q.id}')
-            q.correct_answer = request.POST.get(f'correct_{q.id}')
-            q.time_limit = request.POST.get(f'time_{q.id}')
-            q.save()
+            submitted = {
+                'question_text': request.POST.get(f'question_{q.id}', q.question_text),
+                'option_a': request.POST.get(f'option_a_{q.id}', q.option_a),
+                'option_b': request.POST.get(f'option_b_{q.id}', q.option_b),
+                'option_c': request.POST.get(f'option_c_{q.id}', q.option_c),
+                'option_d': request.POST.get(f'option_d_{q.id}', q.option_d),
+                'correct_answer': request.POST.get(f'correct_{q.id}', q.correct_answer),
+            }
+            if submitted['correct_answer'] not in ANSWER_OPTIONS:
+                submitted['correct_answer'] = q.correct_answer
+            try:
+                submitted['time_limit'] = int(request.POST.get(f'time_{q.id}', q.time_limit))
+            except (TypeError, ValueError):
+                submitted['time_limit'] = q.time_limit
+
+            if any(getattr(q, field) != value for field, value in submitted.items()):
+                for field, value in submitted.items():
+                    setattr(q, field, value)
+                changed.append(q)
+
+        # One UPDATE round for the changed rows; bulk_update skips the
+        # Question signals, so bump the quiz version ourselves.
+        if changed:
+            with transaction.atomic():
+                Question.objects.bulk_update(changed, QUESTION_EDIT_FIELDS, batch_size=500)
+                refresh_quiz_totals(quiz.id)
 
         messages.success(request, 'Questions updated successfully!')
         return redirect('trainer:manage_quizzes')
@@ -267,3 +367,102 @@ def edit_questions(request, quiz_id):
         'quiz': quiz,
         'questions': questions
     })
+
+
+# ==============================
+# BULK IMPORT QUESTIONS
+# ==============================
+@login_required
+@user_passes_test(is_trainer)
+def import_questions(request, quiz_id):
+    quiz = get_object_or_404(
+        Quiz,
+        id=quiz_id,
+        created_by=request.user
+    )
+
+    result = None
+
+    if request.method == 'POST':
+        form = QuestionImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data['file']
+            fmt = form.cleaned_data['format']
+            if fmt == 'auto':
+                fmt = detect_format(upload.name)
+
+            result = import_question_file(quiz, upload.file, fmt)
+
+            if result.ok:
+                messages.success(request, f'Imported {result.created} questions.')
+                return redirect('trainer:edit_quiz', quiz_id=quiz.id)
+    else:
+        form = QuestionImportForm()
+
+    return render(request, 'trainer/import_questions.html', {
+        'quiz': quiz,
+        'form': form,
+        'result': result
+    })
+
+
+# ==============================
+# ITEM ANALYSIS
+# ==============================
+@login_required
+@user_passes_test(is_trainer)
+def item_analysis(request, quiz_id):
+    quiz = get_object_or_404(
+        Quiz,
+        id=quiz_id,
+        created_by=request.user
+    )
+
+    analysis = refresh_item_analysis(quiz)
+    statistics = item_statistics(analysis)
+    items = [
+        {
+            'question': question,
+            'stats': statistics[question.id],
+            'flags': item_flags(statistics[question.id], question.correct_answer),
+        }
+        for question in quiz.questions.all()
+        if question.id in statistics
+    ]
+
+    return render(request, 'trainer/item_analysis.html', {
+        'quiz': quiz,
+        'analysis': analysis,
+        'items': items
+    })
+
+
+# ==============================
+# EXPORT RESULTS
+# ==============================
+@login_required
+@user_passes_test(is_trainer)
+@read_from_replica
+def export_results(request):
+    kind = request.GET.get('kind', 'attempts')
+    fmt = request.GET.get('format', 'csv')
+    if kind not in EXPORT_KINDS or fmt not in EXPORT_FORMATS:
+        raise Http404('Unknown export')
+
+    quiz_id = request.GET.get('quiz')
+    if quiz_id:
+        try:
+            quiz_id = int(quiz_id)
+        except ValueError:
+            raise Http404('Quiz not found')
+        quiz_id = get_object_or_404(Quiz, id=quiz_id, created_by=request.user).id
+    else:
+        quiz_id = None
+
+    response = StreamingHttpResponse(
+        stream_export(request.user, kind, fmt, quiz_id),
+        content_type=CONTENT_TYPES[fmt]
+    )
+    filename = f'{kind}-quiz-{quiz_id}.{fmt}' if quiz_id else f'{kind}.{fmt}'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response